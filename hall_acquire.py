@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+hall_acquire.py
+Acquisition from any number of boards at once, merged onto one clock.
+
+    python hall_acquire.py /dev/ttyACM0 /dev/ttyACM1 --fs 750
+    python hall_acquire.py --standin 3 --seconds 20       # pty boards with skewed clocks
+    python hall_acquire.py --standin 2 --binary --channels 4
+
+Every port is read by its own asyncio task as bytes arrive (loop.add_reader
+on the port's file descriptor; a worker thread where that is unavailable),
+so a slow or absent plot never holds the ports up. The event loop runs in a
+background thread (Acquisition.start) or in the caller's (Acquisition.run).
+
+Each board's t_us is unwrapped (the firmware sends 32 bits, which wrap
+every 71.6 minutes) and mapped to the host's monotonic clock by a
+ClockSync, which estimates the board's clock offset and drift from when its
+samples arrive. The merger interpolates every board onto one grid at fs up
+to the newest time all boards have reached, into a (channels x n)
+RingBuffer; a board silent for STALE_S is left out (NaN) until it resumes.
+
+monitor.py uses this when PORTS is set.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+from collections import deque
+import numpy as np
+from hall_protocol import (FrameDecoder, RingBuffer, counts_to_mv, encode_frames, parse_block,
+                           split_lines, ADC_MAX, VREF_MV)
+
+BAUD = 115200           # USB CDC ignores it, kept for UART bridges
+READ_INTERVAL_S = 0.005 # after bytes arrive, wait this long so each read takes a useful block
+CLOCK_WINDOW_S = 60.0   # device seconds of arrivals in the clock fit
+CLOCK_BINS = 8          # lower-envelope points per fit
+HISTORY_S = 10.0        # aligned history kept per board for interpolation
+MERGE_INTERVAL_S = 0.05 # merger period
+MERGED_S = 60.0         # length of the merged buffer
+DRAIN_BLOCKS = 4096     # merged blocks kept for drain() (oldest dropped beyond this)
+STALE_S = 1.0           # boards silent this long are left out of the merge
+
+# --- Clock alignment ---
+
+class ClockSync:
+    """
+    Maps a board's device time to host time:
+    host = device + offset + drift * (device - ref).
+
+    update() takes the device time of the newest sample in a read and the
+    host time of the read. A sample cannot arrive before it is taken, so
+    host - device is the clock offset plus a non-negative transport delay;
+    its minimum in each span of window / bins device seconds is close to
+    the offset, and a line through the minima of the last `window` gives
+    offset and drift. The smallest transport delay (~1 ms over USB)
+    remains in the offset.
+
+    The minima are kept per span as samples arrive (the newest span still
+    filling), so an update costs O(1) plus a fit through at most bins + 1
+    points, however many reads the window holds.
+    """
+    def __init__(self, window: float = CLOCK_WINDOW_S, bins: int = CLOCK_BINS):
+        self.window = window
+        self.bins = bins
+        self.width = window / bins
+        self.minima = deque()   # [span index, device time, host - device] at each span's minimum
+        self.ref = None
+        self.offset = 0.0
+        self.drift = 0.0
+
+    @property
+    def drift_ppm(self) -> float:
+        """How fast the device clock runs relative to the host, in ppm."""
+        return (1.0 / (1.0 + self.drift) - 1.0) * 1e6
+
+    def update(self, t_dev: float, t_host: float):
+        if self.ref is None:
+            self.ref = t_dev
+        d, o = t_dev - self.ref, t_host - t_dev
+        k = int(d // self.width)
+        if self.minima and self.minima[-1][0] == k:
+            if o < self.minima[-1][2]:
+                self.minima[-1][1:] = d, o
+        else:
+            self.minima.append([k, d, o])
+        while self.minima[0][0] < k - self.bins:
+            self.minima.popleft()
+        self._fit()
+
+    def _fit(self):
+        if len(self.minima) < 2:
+            _, d, o = self.minima[0]
+            self.offset = o - self.drift * d
+            return
+        _, d, o = np.array(self.minima).T
+        self.drift, self.offset = (float(v) for v in np.polyfit(d, o, 1))
+
+    def to_host(self, t_dev):
+        return t_dev + self.offset + self.drift * (t_dev - self.ref)
+
+# --- Boards ---
+
+class Board:
+    """One serial port: bytes -> device-timed samples -> host-aligned history."""
+    def __init__(self, port: str, n_channels: int = 1, fs: float = 750.0, binary: bool = False,
+                 name: str | None = None):
+        self.port = port
+        self.name = name or os.path.basename(port)
+        self.n_channels = int(n_channels)
+        self.fs = float(fs)
+        self.decoder = FrameDecoder(self.n_channels) if binary else None
+        self.pending = b""
+        self.clock = ClockSync()
+        self.history = RingBuffer(int(HISTORY_S * fs), channels=self.n_channels + 1)  # row 0: host time
+        self.wraps = 0
+        self.last_us = None
+        self.last_host = -np.inf
+        self.last_arrival = None
+        self.samples = 0
+        self.error = None
+
+    def unwrap(self, t_us: np.ndarray) -> np.ndarray:
+        """32-bit microsecond timestamps to continuous device seconds."""
+        u = np.asarray(t_us, dtype=np.int64)
+        prev = int(u[0]) if self.last_us is None else self.last_us
+        wraps = self.wraps + np.cumsum(np.diff(u, prepend=prev) < -(1 << 31))
+        self.wraps, self.last_us = int(wraps[-1]), int(u[-1])
+        return (u + (wraps << 32)) * 1e-6
+
+    def feed(self, data: bytes, t_host: float) -> int:
+        """Decode bytes read at host time t_host into the aligned history."""
+        if self.decoder is not None:
+            _, t_us, counts = self.decoder.feed(data)
+            mv = counts_to_mv(counts).T
+        else:
+            block, self.pending = split_lines(self.pending + data)
+            t_s, mv = parse_block(block, self.n_channels)
+            t_us, mv = np.rint(t_s * 1e6), mv.reshape(self.n_channels, -1)
+        if not t_us.size:
+            return 0
+        t_dev = self.unwrap(t_us)
+        self.clock.update(float(t_dev[-1]), t_host)
+        # Keep the history increasing when the clock fit moves between reads
+        t = np.maximum.accumulate(np.maximum(self.clock.to_host(t_dev), self.last_host))
+        self.last_host = float(t[-1])
+        self.history.extend(np.vstack((t, mv)))
+        self.samples += t.size
+        self.last_arrival = t_host
+        return t.size
+
+    async def run(self):
+        """Read the port until cancelled."""
+        import serial
+        loop = asyncio.get_running_loop()
+        try:
+            ser = serial.Serial(self.port, BAUD, timeout=0)
+        except Exception as e:
+            self.error = e
+            return
+        ready = asyncio.Event()
+        try:
+            loop.add_reader(ser.fileno(), ready.set)
+            watched = True
+        except (AttributeError, NotImplementedError, OSError):
+            ser.timeout = 10 * READ_INTERVAL_S
+            watched = False
+        try:
+            while True:
+                if watched:
+                    await ready.wait()
+                    ready.clear()
+                    await asyncio.sleep(READ_INTERVAL_S)
+                    data = ser.read(ser.in_waiting)
+                else:
+                    data = await asyncio.to_thread(ser.read, max(1, ser.in_waiting))
+                if data:
+                    self.feed(data, time.monotonic())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            if watched:
+                loop.remove_reader(ser.fileno())
+            ser.close()
+
+    def stats(self) -> dict:
+        return {"board": self.name, "samples": self.samples,
+                "offset_s": self.clock.offset, "drift_ppm": self.clock.drift_ppm,
+                "wraps": self.wraps, "error": None if self.error is None else repr(self.error),
+                **(self.decoder.stats() if self.decoder is not None else {})}
+
+# --- Merged stream ---
+
+class Acquisition:
+    """
+    Reads every board concurrently and merges them onto one host-time grid
+    at fs (default: the highest board rate). latest() and drain() are safe
+    to call from another thread while the loop runs.
+    """
+    def __init__(self, boards, fs: float | None = None, seconds: float = MERGED_S):
+        self.boards = list(boards)
+        self.fs = float(fs or max(b.fs for b in self.boards))
+        self.n_channels = sum(b.n_channels for b in self.boards)
+        capacity = int(seconds * self.fs)
+        self.values = RingBuffer(capacity, channels=self.n_channels)
+        self.times = RingBuffer(capacity)
+        self.blocks = deque(maxlen=DRAIN_BLOCKS)
+        self.lock = threading.Lock()
+        self.t_next = None
+        self.merged = 0
+        self._loop = None
+        self._stop = None
+        self._thread = None
+        self._started = threading.Event()
+
+    def merge(self, now: float) -> int:
+        """Interpolate every live board onto the grid up to the time all of them have reached."""
+        live = {}
+        for b in self.boards:
+            if b.last_arrival is not None and now - b.last_arrival < STALE_S and len(b.history) > 1:
+                live[b] = b.history.latest()
+        if not live:
+            return 0
+        horizon = min(h[0, -1] for h in live.values())
+        if self.t_next is None:
+            self.t_next = max(h[0, 0] for h in live.values())
+        self.t_next = max(self.t_next, min(h[0, 0] for h in live.values()))
+        n = int(np.floor((horizon - self.t_next) * self.fs)) + 1
+        if n <= 0:
+            return 0
+        grid = self.t_next + np.arange(n) / self.fs
+        X = np.full((self.n_channels, n), np.nan)
+        row = 0
+        for b in self.boards:
+            if b in live:
+                h = live[b]
+                for c in range(b.n_channels):
+                    X[row + c] = np.interp(grid, h[0], h[c + 1], left=np.nan, right=np.nan)
+            row += b.n_channels
+        self.t_next = float(grid[-1]) + 1.0 / self.fs
+        with self.lock:
+            self.values.extend(X)
+            self.times.extend(grid)
+            self.blocks.append((grid, X))
+            self.merged += n
+        return n
+
+    async def _merge_loop(self):
+        while True:
+            await asyncio.sleep(MERGE_INTERVAL_S)
+            self.merge(time.monotonic())
+
+    async def _main(self, seconds: float | None = None):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._started.set()
+        tasks = [asyncio.create_task(b.run()) for b in self.boards]
+        tasks.append(asyncio.create_task(self._merge_loop()))
+        try:
+            await asyncio.wait_for(self._stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self, seconds: float | None = None):
+        """Acquire in this thread until stop() or for `seconds`."""
+        asyncio.run(self._main(seconds))
+        return self
+
+    def start(self, seconds: float | None = None):
+        """Acquire in a background thread."""
+        self._thread = threading.Thread(target=self.run, args=(seconds,), daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join()
+
+    def latest(self, n: int | None = None):
+        """Newest n merged samples as (t_host (n,), values (channels, n))."""
+        with self.lock:
+            return self.times.latest(n), self.values.latest(n)
+
+    def drain(self):
+        """Merged samples since the previous drain() as (t_host, values)."""
+        with self.lock:
+            blocks = list(self.blocks)
+            self.blocks.clear()
+        if not blocks:
+            return np.empty(0), np.empty((self.n_channels, 0))
+        return (np.concatenate([b[0] for b in blocks]),
+                np.concatenate([b[1] for b in blocks], axis=1))
+
+    def stats(self) -> list[dict]:
+        return [b.stats() for b in self.boards]
+
+# --- pty stand-in ---
+
+FIELD_HZ = 7.0      # stand-ins all sample this field, so aligned streams line up
+
+class StandInBoard:
+    """
+    A board on a pseudo-terminal whose clock is offset and runs drift_ppm
+    fast relative to the host. It samples every 1/fs of its own clock and
+    sends the firmware's "t_us,mv" lines (or binary frames) with 32-bit
+    timestamps. Every stand-in samples the same field, a sine at FIELD_HZ in
+    host time, so alignment errors show up as phase differences.
+    """
+    def __init__(self, n_channels: int = 1, fs: float = 750.0, offset_s: float = 0.0,
+                 drift_ppm: float = 0.0, binary: bool = False, block: int = 2, seed: int = 0):
+        import pty
+        import tty
+        self.n_channels = int(n_channels)
+        self.fs = float(fs)
+        self.offset_s = float(offset_s)
+        self.rate = 1.0 + drift_ppm * 1e-6
+        self.binary = binary
+        self.block = int(block)
+        self.rng = np.random.default_rng(seed)
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.sent = 0
+        self.origin = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def host_time(self, t_dev):
+        return self.origin + (t_dev - self.offset_s) / self.rate
+
+    def _payload(self, idx: np.ndarray) -> bytes:
+        t_dev = self.offset_s + idx / self.fs
+        h = self.host_time(t_dev)
+        ch = np.arange(self.n_channels)[:, None]
+        mv = 1650.0 + 600.0 * np.sin(2 * np.pi * FIELD_HZ * h[None, :] + ch * np.pi / 4)
+        mv += self.rng.normal(0, 2.0, mv.shape)
+        t_us = np.rint(t_dev * 1e6).astype(np.int64) & 0xFFFFFFFF
+        if self.binary:
+            counts = np.rint(mv * (ADC_MAX / VREF_MV)).T
+            return encode_frames(idx, t_us, counts)
+        cols = np.column_stack((t_us, np.rint(mv.T).astype(np.int64)))
+        fmt = ",".join(["%d"] * cols.shape[1])
+        return ("\n".join(fmt % tuple(r) for r in cols.tolist()) + "\n").encode()
+
+    def run(self, duration: float | None = None):
+        self.origin = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if duration is not None and now - self.origin >= duration:
+                break
+            due = int((now - self.origin) * self.rate * self.fs) + 1
+            if due - self.sent < self.block:
+                time.sleep(self.block / self.fs / 4)
+                continue
+            os.write(self.master, self._payload(np.arange(self.sent, due)))
+            self.sent = due
+
+    def start(self, **kwargs):
+        self._thread = threading.Thread(target=self.run, kwargs=kwargs, daemon=True)
+        self._thread.start()
+        while self.origin is None:
+            time.sleep(0.001)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+def field_lag(t: np.ndarray, x: np.ndarray, phase: float = 0.0) -> float:
+    """Delay (s) of a stand-in channel against the FIELD_HZ sine it sampled, from its phase."""
+    ok = np.isfinite(x)
+    z = np.mean((x[ok] - x[ok].mean()) * np.exp(-2j * np.pi * FIELD_HZ * t[ok]))
+    err = np.angle(z) - (phase - np.pi / 2)
+    return float(-np.angle(np.exp(1j * err)) / (2 * np.pi * FIELD_HZ))
+
+# --- CLI ---
+
+def report(acq: Acquisition, elapsed: float):
+    for s in acq.stats():
+        line = (f"{s['board']:>14s}  {s['samples'] / elapsed:8.0f} samples/s  "
+                f"offset {s['offset_s']:+14.6f} s  drift {s['drift_ppm']:+8.2f} ppm  wraps {s['wraps']}")
+        if "dropped" in s:
+            line += f"  dropped {s['dropped']}  crc {s['crc_errors']}"
+        if s["error"]:
+            line += f"  ERROR {s['error']}"
+        print(line)
+    print(f"{'merged':>14s}  {acq.merged / elapsed:8.0f} samples/s x {acq.n_channels} channels "
+          f"at {acq.fs:g} Hz")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Read several Hall boards at once on one clock")
+    ap.add_argument("ports", nargs="*", help="serial ports, one per board")
+    ap.add_argument("--channels", type=int, default=1, help="channels per board")
+    ap.add_argument("--fs", type=float, default=750.0, help="board sample rate (and merged rate)")
+    ap.add_argument("--binary", action="store_true", help="boards send hall_protocol frames")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--standin", type=int, default=0, metavar="N",
+                    help="add N pty stand-in boards with offset, drifting clocks")
+    args = ap.parse_args(argv)
+
+    standins = []
+    for i in range(args.standin):
+        # Offsets up to just below the 32-bit wrap, drifts within a crystal's tolerance
+        sb = StandInBoard(args.channels, args.fs, offset_s=(4290.0, 12.5, 1800.0)[i % 3] + i,
+                          drift_ppm=(-40.0, 25.0, 60.0)[i % 3], binary=args.binary, seed=i)
+        standins.append(sb)
+    ports = args.ports + [sb.port for sb in standins]
+    if not ports:
+        ap.error("give serial ports or --standin N")
+    acq = Acquisition([Board(p, args.channels, args.fs, args.binary, name=f"board{i}")
+                       for i, p in enumerate(ports)])
+    for sb in standins:
+        sb.start()
+    t0 = time.monotonic()
+    try:
+        acq.run(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.monotonic() - t0
+    for sb in standins:
+        sb.stop()
+    report(acq, elapsed)
+
+    if standins:
+        t, X = acq.latest()
+        first = len(args.ports) * args.channels
+        for i, sb in enumerate(standins):
+            b = acq.boards[len(args.ports) + i]
+            lag = field_lag(t, X[first + i * args.channels])
+            print(f"{b.name:>14s}  true drift {(sb.rate - 1) * 1e6:+8.2f} ppm  "
+                  f"alignment error {1e3 * lag:+7.3f} ms")
+    return 1 if any(b.error for b in acq.boards) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
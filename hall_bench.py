@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+hall_bench.py
+Headless benchmark and regression suite for the spectral and ingestion hot
+paths, on synthetic signals (Agg backend, no display, no board, PSD cache off).
+
+    welch_psd    monitor.welch_psd, checked against scipy.signal.welch
+    parse_UART   hall_protocol.parse_UART, one line at a time
+    parse_block  hall_protocol.parse_block, the bulk ingestion path
+    load_psd     psd_overlay.load_psd on .xlsx and .hcap PSD tables
+    to_float32   wav_psd._to_float32 for each WAV dtype
+    wav_psd      wav_psd.compute_psd_from_wav end to end (plots included),
+                 the exported PSD checked against scipy.signal.welch in float64
+
+    python hall_bench.py                        # quick sizes, compared to BASELINE_FILE
+    python hall_bench.py --full                 # 10k .. 100M samples, nperseg 256 .. 128000
+    python hall_bench.py --only welch_psd wav_psd --save-baseline
+
+Each case is timed (best of MIN_REPEAT to MAX_REPEAT runs) and then run once more
+under tracemalloc for its peak memory; setup allocations (the input signal,
+the WAV file) are not counted. Throughput is input samples (lines, table
+rows) per second. Error is max |result - reference| / max |reference|.
+
+A case regresses when its error exceeds ERROR_LIMITS, or, against the
+baseline, when its throughput drops by more than THROUGHPUT_TOL, its peak
+memory grows by more than MEMORY_TOL or its error grows ERROR_GROWTH-fold.
+The exit status is 1 on any regression. Baselines are per machine:
+--save-baseline records (or updates) the cases that were run.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+import warnings
+import numpy as np
+
+BASELINE_FILE = "bench_baseline.json"
+QUICK_SIZES = (10_000, 100_000, 1_000_000)
+FULL_SIZES = (10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+QUICK_NPERSEG = (256, 4096)
+FULL_NPERSEG = (256, 4096, 32768, 128000)
+LINE_LIMIT = 10_000_000     # parse_UART / parse_block: larger line lists do not fit in memory
+TABLE_LIMIT = 200_000       # load_psd: PSD tables are nperseg/2+1 rows; larger .xlsx files take minutes to write
+FS = 750.0                  # sample rate of the synthetic signals
+TONES_HZ = (5.0, 15.5, 60.0)
+MIN_REPEAT = 3              # runs per case, more until MIN_TIME...
+MIN_TIME = 0.5
+MAX_REPEAT = 1000           # ...up to this many
+THROUGHPUT_TOL = 0.25       # slower than baseline by more than this fraction regresses (after a re-measure)
+MEMORY_TOL = 0.25           # more peak memory than baseline by this fraction (+1 MB) regresses
+ERROR_GROWTH = 10.0         # error this many times the baseline's (+1e-12) regresses
+ERROR_LIMITS = {            # max relative error against the reference, always checked
+    "welch_psd": 1e-9,
+    "parse_UART": 0.0,
+    "parse_block": 0.0,
+    "load_psd": 1e-12,
+    "to_float32": 1e-7,
+    "wav_psd": 1e-6,
+}
+
+# --- Signals ---
+
+def synthetic(n: int, fs: float = FS, seed: int = 0) -> np.ndarray:
+    """Tones plus white noise, float64 in about [-1, 1]."""
+    t = np.arange(n) / fs
+    x = np.random.default_rng(seed).normal(0, 0.05, n)
+    for f in TONES_HZ:
+        x += 0.25 * np.sin(2 * np.pi * f * t)
+    return x
+
+def rel_error(got, ref) -> float:
+    got, ref = np.asarray(got, dtype=np.float64), np.asarray(ref, dtype=np.float64)
+    if got.shape != ref.shape:
+        return float("inf")
+    return float(np.max(np.abs(got - ref)) / (np.max(np.abs(ref)) or 1.0))
+
+# --- Cases ---
+# Each bench yields (case, n, run, check): run() is the measured call and
+# check(result) its error against the reference. Code after the yield is cleanup.
+
+def bench_welch_psd(sizes, npersegs, tmp):
+    from scipy import signal
+    import monitor
+    for n in sizes:
+        x = synthetic(n)
+        for nperseg in npersegs:
+            if nperseg > n:
+                continue
+            step = int(nperseg * 0.5)
+            def check(out, x=x, nperseg=nperseg, step=step):
+                f_ref, p_ref = signal.welch(x, FS, window=np.hanning(nperseg), nperseg=nperseg,
+                                            noverlap=nperseg - step, detrend="constant",
+                                            scaling="density")
+                return max(rel_error(out[0], f_ref), rel_error(out[1], p_ref))
+            yield (f"welch_psd n={n} nperseg={nperseg}", n,
+                   lambda x=x, nperseg=nperseg: monitor.welch_psd(x, FS, nperseg), check)
+
+def _uart_lines(n: int):
+    t_us = np.arange(n, dtype=np.int64) * 1333
+    mv = np.rint(1650 + 1000 * synthetic(n)).astype(np.int64)
+    return t_us, mv
+
+def bench_parse_UART(sizes, npersegs, tmp):
+    from hall_protocol import parse_UART
+    for n in (s for s in sizes if s <= LINE_LIMIT):
+        t_us, mv = _uart_lines(n)
+        lines = [f"{a},{b}" for a, b in zip(t_us.tolist(), mv.tolist())]
+        parse = parse_UART
+        def check(out, t_us=t_us, mv=mv):
+            t, v = np.array(out).T
+            return max(rel_error(v, mv), rel_error(t, t_us * 1e-6))
+        yield (f"parse_UART n={n}", n, lambda lines=lines: [parse(s) for s in lines], check)
+        del lines
+
+def bench_parse_block(sizes, npersegs, tmp):
+    from hall_protocol import parse_block
+    for n in (s for s in sizes if s <= LINE_LIMIT):
+        t_us, mv = _uart_lines(n)
+        block = "\n".join(f"{a},{b}" for a, b in zip(t_us.tolist(), mv.tolist())).encode()
+        def check(out, t_us=t_us, mv=mv):
+            return max(rel_error(out[1], mv), rel_error(out[0], t_us * 1e-6))
+        yield f"parse_block n={n}", n, lambda block=block: parse_block(block), check
+        del block
+
+def bench_load_psd(sizes, npersegs, tmp):
+    import pandas as pd
+    from pathlib import Path
+    from hallcap import write_psd
+    from psd_overlay import load_psd
+    for n in (s for s in sizes if s <= TABLE_LIMIT):
+        f = np.arange(n) * (FS / 2 / max(n - 1, 1))
+        p = np.abs(synthetic(n, seed=1)) * 1e-3
+        for ext in (".xlsx", ".hcap"):
+            path = Path(tmp, f"table_{n}{ext}")
+            if ext == ".hcap":
+                write_psd(str(path), f, p)
+            else:
+                pd.DataFrame({"Frequency [Hz]": f, "PSD [1/Hz]": p}).to_excel(path, index=False)
+            def check(out, f=f, p=p):
+                return max(rel_error(out[0], f), rel_error(out[1], p))
+            yield f"load_psd{ext} n={n}", n, lambda path=path: load_psd(path), check
+            path.unlink()
+
+def bench_to_float32(sizes, npersegs, tmp):
+    from wav_psd import _to_float32, _wav_scale
+    for n in sizes:
+        x = synthetic(n)
+        for dtype in (np.int16, np.int32, np.uint8, np.float64):
+            dt = np.dtype(dtype)
+            if dt.kind == "f":
+                raw = x
+            else:
+                info = np.iinfo(dt)
+                half = (int(info.max) - int(info.min) + 1) // 2
+                raw = np.clip(np.rint(x * half + (info.min + half)), info.min, info.max).astype(dt)
+            scale, offset = _wav_scale(dt)
+            def check(out, raw=raw, scale=scale, offset=offset):
+                return rel_error(out, raw.astype(np.float64) * scale + offset)
+            yield f"to_float32 {dt.name} n={n}", n, lambda raw=raw: _to_float32(raw), check
+        del x, raw
+
+def bench_wav_psd(sizes, npersegs, tmp):
+    from scipy import signal
+    from scipy.io import wavfile
+    import matplotlib.pyplot as plt
+    from hallcap import read_psd
+    from wav_psd import compute_psd_from_wav, _welch_segment
+    for n in sizes:
+        wav = os.path.join(tmp, f"bench_{n}.wav")
+        wavfile.write(wav, int(FS), np.rint(synthetic(n) * 32767).astype(np.int16))
+        for nperseg in npersegs:
+            if nperseg > n:
+                continue
+            out = os.path.join(tmp, "bench_psd.hcap")
+            def run(wav=wav, nperseg=nperseg, out=out):
+                with warnings.catch_warnings(), contextlib.redirect_stdout(None):
+                    warnings.simplefilter("ignore")     # plt.show() on Agg
+                    compute_psd_from_wav(wav, 0, out, nperseg, streaming=False)
+                plt.close("all")
+                return read_psd(out)
+            def check(got, wav=wav, nperseg=nperseg):
+                data = wavfile.read(wav, mmap=True)[1] / 32768.0
+                seg = _welch_segment(len(data), nperseg)
+                ref = signal.welch(data, FS, window="hann", nperseg=seg, noverlap=seg // 2,
+                                   detrend="constant", scaling="density")
+                return max(rel_error(got[0], ref[0]), rel_error(got[1], ref[1]))
+            yield f"wav_psd n={n} nperseg={nperseg}", n, run, check
+        os.remove(wav)
+
+BENCHES = {
+    "welch_psd": bench_welch_psd,
+    "parse_UART": bench_parse_UART,
+    "parse_block": bench_parse_block,
+    "load_psd": bench_load_psd,
+    "to_float32": bench_to_float32,
+    "wav_psd": bench_wav_psd,
+}
+
+# --- Measurement ---
+
+def measure(run, check) -> dict:
+    """Best time of MIN_REPEAT..MAX_REPEAT runs, then one traced run for the peak memory."""
+    best, total, repeats = float("inf"), 0.0, 0
+    while repeats < MIN_REPEAT or (repeats < MAX_REPEAT and total < MIN_TIME):
+        t0 = time.perf_counter()
+        out = run()
+        dt = time.perf_counter() - t0
+        best, total, repeats = min(best, dt), total + dt, repeats + 1
+        if repeats == 1:
+            error = check(out)
+        del out
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "repeats": repeats, "peak_mb": peak / 1024**2, "error": error}
+
+def regressions(bench: str, result: dict, base: dict | None) -> list[str]:
+    """Why a case regresses (empty when it passes)."""
+    why = []
+    if not result["error"] <= ERROR_LIMITS[bench]:
+        why.append(f"error {result['error']:.2e} > {ERROR_LIMITS[bench]:.0e}")
+    if base is None:
+        return why
+    if result["throughput"] < (1 - THROUGHPUT_TOL) * base["throughput"]:
+        why.append(f"throughput {result['throughput'] / base['throughput'] - 1:+.0%}")
+    if result["peak_mb"] > (1 + MEMORY_TOL) * base["peak_mb"] + 1.0:
+        why.append(f"memory {result['peak_mb']:.1f} MB vs {base['peak_mb']:.1f}")
+    if result["error"] > ERROR_GROWTH * base["error"] + 1e-12:
+        why.append(f"error {result['error']:.2e} vs {base['error']:.2e}")
+    return why
+
+def run_suite(benches, sizes, npersegs, baseline: dict, verbose: bool = True):
+    """Run the selected benches; returns (results by case, failed case names)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import psd_cache
+    psd_cache.CACHE_DIR = "off"
+
+    results, failed = {}, []
+    if verbose:
+        print(f"{'case':40s} {'Ms/s':>9s} {'ms':>9s} {'peak MB':>9s} {'error':>9s}  vs baseline")
+    with tempfile.TemporaryDirectory(prefix="hall_bench_") as tmp:
+        for bench in benches:
+            for case, n, run, check in BENCHES[bench](sizes, npersegs, tmp):
+                base = baseline.get(case)
+                r = measure(run, check)
+                if base and n / r["seconds"] < (1 - THROUGHPUT_TOL) * base["throughput"]:
+                    again = measure(run, check)     # one retry: a busy moment is not a regression
+                    r["seconds"] = min(r["seconds"], again["seconds"])
+                r["throughput"] = n / r["seconds"]
+                results[case] = r
+                why = regressions(bench, r, base)
+                if why:
+                    failed.append(case)
+                if verbose:
+                    vs = "-" if base is None else f"{r['throughput'] / base['throughput'] - 1:+.0%}"
+                    print(f"{case:40s} {r['throughput'] / 1e6:9.3f} {1e3 * r['seconds']:9.2f} "
+                          f"{r['peak_mb']:9.1f} {r['error']:9.1e}  {vs:>6s}"
+                          + (f"  REGRESSION: {'; '.join(why)}" if why else ""))
+    return results, failed
+
+def load_baseline(path: str) -> dict:
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark and regression suite for the PSD and ingestion paths")
+    ap.add_argument("--only", nargs="+", choices=list(BENCHES), help="benches to run (default all)")
+    ap.add_argument("--full", action="store_true", help="every size up to 100M samples and nperseg up to 128000")
+    ap.add_argument("--sizes", type=int, nargs="+", help="sample counts (overrides --full)")
+    ap.add_argument("--nperseg", type=int, nargs="+", help="segment lengths (overrides --full)")
+    ap.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON to compare against")
+    ap.add_argument("--save-baseline", action="store_true", help="record this run's cases in the baseline")
+    ap.add_argument("--json", help="also write this run's results here")
+    args = ap.parse_args(argv)
+
+    sizes = args.sizes or (FULL_SIZES if args.full else QUICK_SIZES)
+    npersegs = args.nperseg or (FULL_NPERSEG if args.full else QUICK_NPERSEG)
+    baseline = load_baseline(args.baseline)
+    results, failed = run_suite(args.only or list(BENCHES), sizes, npersegs,
+                                {} if args.save_baseline else baseline)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=1, sort_keys=True)
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as fh:
+            json.dump(baseline, fh, indent=1, sort_keys=True)
+        print(f"baseline: {len(results)} cases saved to {args.baseline}")
+    if failed:
+        print(f"{len(failed)} of {len(results)} cases regressed")
+        return 1
+    print(f"{len(results)} cases passed" + ("" if baseline else " (no baseline; error limits only)"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+hall_field.py
+Live spatial field map of the Hall array. Each channel is drawn at its
+sensor's position on the board, and every frame shows the field, its
+in-plane gradient and the band-limited RMS of all sensors as heatmaps
+(imshow set_data, blitted).
+
+    python hall_field.py Mark2/Array.kicad_pcb hall_data.hcap             # replay a capture
+    python hall_field.py Mark2/Array.kicad_pcb --port /dev/ttyACM0 --binary
+    python hall_field.py HallArray.kicad_pcb --port A B C --channels 16    # boards via hall_acquire
+    python hall_field.py Mark2/Array.kicad_pcb --ring psm_1a2b3c            # next to monitor.py (SHARED_RING)
+    python hall_field.py Mark2/Array.kicad_pcb --demo                      # synthetic magnet
+    python hall_field.py Mark2/Array.kicad_pcb --write-layout Mark2/hall_layout.csv
+
+The layout is a .kicad_pcb or a CSV (channel,ref,x_mm,y_mm). From a
+.kicad_pcb, the Hall sensor footprints are numbered in reference order
+(U1 is channel 0). A board wired in another order needs a CSV;
+--write-layout gives the KiCad order as a starting point.
+
+The per-sensor quantities use operators built once from the layout, so a
+frame costs a few matrix products:
+    gradient  least-squares plane through each sensor's neighbours
+              (within NEIGHBOUR_PITCH of its local pitch, the distance to
+              its nearest neighbour)
+    heatmap   (pixels x sensors) linear interpolation on a Delaunay
+              triangulation; pixels further than COVER_PITCH local pitches
+              from the nearest sensor stay blank
+"""
+
+import re
+import sys
+import time
+import argparse
+import numpy as np
+from scipy import signal
+from minmax_plot import update_clim
+
+SENSOR_VALUE = "DRV5055"    # footprints whose Value starts with this are Hall sensors
+MID_MV = 1650.0     # DRV5055 output at zero field (VCC / 2 at 3.3 V)
+K = 60.0            # sensitivity mV per mT (DRV5055A1 @3.3v) when the capture has no k
+FS = 750.0          # sample rate for live input and the demo
+BAND_HZ = (1.0, 30.0)   # band of the RMS map
+RMS_S = 1.0         # RMS time constant
+PIXEL_MM = 1.0      # heatmap resolution
+NEIGHBOUR_PITCH = 1.5   # gradient fit radius, in local pitches
+COVER_PITCH = 1.0   # pixels more local pitches than this from the nearest sensor stay blank
+FRAME_INTERVAL_MS = 50
+CLIM_HOLD_S = 5.0   # colour scale peak hold half-life
+RING_SECONDS = 10.0 # with --port, samples the acquisition ring holds
+LAYOUT_DTYPE = np.dtype([("channel", "i4"), ("ref", "U16"), ("x_mm", "f8"), ("y_mm", "f8")])
+
+# --- Layout ---
+
+def layout_from_kicad(path: str, value: str = SENSOR_VALUE) -> np.ndarray:
+    """Hall sensor footprints of a .kicad_pcb (board mm, y down), numbered in reference order."""
+    with open(path, encoding="utf-8") as fh:
+        text = fh.read()
+    rows = []
+    for block in text.split("\n\t(footprint ")[1:]:
+        ref = re.search(r'\(property "Reference" "([^"]+)"', block)
+        val = re.search(r'\(property "Value" "([^"]+)"', block)
+        at = re.search(r"\(at ([-\d.]+) ([-\d.]+)", block)
+        if ref and val and at and val.group(1).startswith(value):
+            rows.append((ref.group(1), float(at.group(1)), float(at.group(2))))
+    if not rows:
+        raise ValueError(f"no {value}* footprints in {path}")
+    rows.sort(key=lambda r: (re.sub(r"\d", "", r[0]), int(re.sub(r"\D", "", r[0]) or 0)))
+    return np.array([(i, *r) for i, r in enumerate(rows)], dtype=LAYOUT_DTYPE)
+
+def load_layout(path: str) -> np.ndarray:
+    """Layout from a .kicad_pcb or a channel,ref,x_mm,y_mm CSV, sorted by channel."""
+    if path.lower().endswith(".kicad_pcb"):
+        return layout_from_kicad(path)
+    table = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="utf-8", ndmin=1)
+    layout = np.empty(table.size, dtype=LAYOUT_DTYPE)
+    for name in LAYOUT_DTYPE.names:
+        layout[name] = table[name]
+    return np.sort(layout, order="channel")
+
+def write_layout(path: str, layout: np.ndarray):
+    np.savetxt(path, layout, fmt=("%d", "%s", "%.4f", "%.4f"), delimiter=",",
+               header=",".join(LAYOUT_DTYPE.names), comments="")
+
+def spacing(xy: np.ndarray) -> np.ndarray:
+    """Distance from each sensor to its nearest neighbour (its local pitch)."""
+    if len(xy) < 2:
+        return np.ones(len(xy))
+    d = np.hypot(*(xy[:, None, :] - xy[None, :, :]).transpose(2, 0, 1))
+    np.fill_diagonal(d, np.inf)
+    return d.min(axis=1)
+
+def gradient_operator(xy: np.ndarray, radius) -> np.ndarray:
+    """
+    (2, n, n) G with G @ B = (dB/dx, dB/dy) at every sensor: the slopes of
+    a least-squares plane through the sensors within `radius` (per sensor).
+    A component the neighbours do not span (a sensor in a single row)
+    comes out 0.
+    """
+    n = len(xy)
+    radius = np.broadcast_to(radius, (n,))
+    G = np.zeros((2, n, n))
+    for i in range(n):
+        nb = np.flatnonzero(np.hypot(*(xy - xy[i]).T) <= radius[i])
+        A = np.column_stack((np.ones(nb.size), xy[nb] - xy[i]))
+        G[:, i, nb] = np.linalg.pinv(A)[1:]
+    return G
+
+def raster_operator(xy: np.ndarray, pixel_mm: float, cover):
+    """
+    Interpolation onto a pixel grid over the sensors' bounding box.
+    Returns W (pixels x sensors), the image shape (ny, nx) and the imshow
+    extent for origin="upper" (board y grows downwards). Rows of W for
+    pixels outside the triangulation or further from their nearest sensor
+    than its `cover` are NaN, so those pixels come out blank. Sensors on a
+    line fall back to the nearest sensor.
+    """
+    from scipy.spatial import Delaunay, QhullError
+    lo, hi = xy.min(axis=0), xy.max(axis=0)
+    nx, ny = np.floor((hi - lo) / pixel_mm + 1e-6).astype(int) + 1
+    gx, gy = lo[0] + pixel_mm * np.arange(nx), lo[1] + pixel_mm * np.arange(ny)
+    X, Y = np.meshgrid(gx, gy)
+    P = np.column_stack((X.ravel(), Y.ravel()))
+    dist = np.hypot(P[:, None, 0] - xy[None, :, 0], P[:, None, 1] - xy[None, :, 1])
+    nearest = dist.argmin(axis=1)
+    W = np.zeros((P.shape[0], len(xy)))
+    try:
+        tri = Delaunay(xy)
+        s = tri.find_simplex(P)
+        inside = np.flatnonzero(s >= 0)
+        T = tri.transform[s[inside]]
+        b = np.einsum("ijk,ik->ij", T[:, :2], P[inside] - T[:, 2])
+        W[inside[:, None], tri.simplices[s[inside]]] = np.column_stack((b, 1 - b.sum(axis=1)))
+        outside = s < 0
+    except QhullError:
+        W[np.arange(P.shape[0]), nearest] = 1.0
+        outside = np.zeros(P.shape[0], dtype=bool)
+    cover = np.broadcast_to(cover, (len(xy),))
+    W[outside | (dist[np.arange(P.shape[0]), nearest] > cover[nearest])] = np.nan
+    h = pixel_mm / 2
+    return W, (ny, nx), (gx[0] - h, gx[-1] + h, gy[-1] + h, gy[0] - h)
+
+# --- Field map ---
+
+class FieldMap:
+    """
+    Field (mT), in-plane gradient (mT/mm) and band-limited RMS (mT) of
+    every sensor from (channels x n) blocks in mV. The field is the mean of
+    the latest block. The RMS is a one-pole mean square of the band-passed
+    field (time constant rms_s), and like the filter state it does not
+    depend on how the stream is split into blocks.
+
+    With tare_s the zero is each sensor's mean over the first tare_s
+    seconds instead of the nominal mid-scale, which removes offsets and the
+    ambient field.
+    """
+    def __init__(self, layout: np.ndarray, fs: float, k: float = K, band=BAND_HZ,
+                 rms_s: float = RMS_S, pixel_mm: float = PIXEL_MM, tare_s: float = 0.0):
+        self.layout = layout
+        self.rows = layout["channel"]       # input channel of each sensor
+        self.xy = np.column_stack((layout["x_mm"], layout["y_mm"]))
+        n = len(layout)
+        self.k = float(k)
+        self.offset = np.full((n, 1), MID_MV)
+        self.tare_n = int(tare_s * fs)
+        self.tare_sum = np.zeros((n, 1))
+        local = spacing(self.xy)
+        self.pitch = float(np.median(local))
+        self.G = gradient_operator(self.xy, NEIGHBOUR_PITCH * local)
+        self.W, self.shape, self.extent = raster_operator(self.xy, pixel_mm, COVER_PITCH * local)
+        self.sos = signal.butter(2, band, "bandpass", fs=fs, output="sos")
+        self.zi = None
+        self.a = np.exp(-1.0 / (rms_s * fs))
+        self.ms = np.zeros(n)
+        self.seen = 0
+        self.field = np.zeros(n)
+        self.grad = np.zeros((2, n))
+        self.rms = np.zeros(n)
+
+    def push(self, mv) -> int:
+        """Feed a (channels x n) block in mV; updates field, grad and rms."""
+        mv = np.asarray(mv, dtype=np.float64)[self.rows]
+        n = mv.shape[1]
+        if not n:
+            return 0
+        if self.seen < self.tare_n:
+            m = min(n, self.tare_n - self.seen)
+            self.tare_sum += mv[:, :m].sum(axis=1, keepdims=True)
+            if self.seen + m == self.tare_n:
+                self.offset = self.tare_sum / self.tare_n
+        self.field = (mv.mean(axis=1) - self.offset[:, 0]) / self.k
+        self.grad = self.G @ self.field
+        b = mv / self.k     # the band-pass removes the offset itself, so a tare does not step it
+        if self.zi is None:
+            self.zi = signal.sosfilt_zi(self.sos)[:, None, :] * b[None, :, :1]
+        y, self.zi = signal.sosfilt(self.sos, b, axis=-1, zi=self.zi)
+        # ms[n] = a ms[n-1] + (1 - a) y[n]^2, for the whole block at once
+        w = (1 - self.a) * self.a ** np.arange(n - 1, -1, -1)
+        self.ms = self.a ** n * self.ms + (y * y) @ w
+        self.seen += n
+        self.rms = np.sqrt(self.ms / (1 - self.a ** self.seen))    # bias-corrected from zero
+        return n
+
+    def images(self) -> np.ndarray:
+        """Field, gradient magnitude and RMS heatmaps, (3, ny, nx)."""
+        V = np.column_stack((self.field, np.hypot(*self.grad), self.rms))
+        return (self.W @ V).T.reshape(3, *self.shape)
+
+# --- Sources ---
+
+class Replay:
+    """
+    A capture (.hcap or monitor's t_s,mv... text) or an in-memory
+    (channels x n) array in mV, played at `speed` x real time and looped.
+    read() returns the samples due since the last call.
+    """
+    def __init__(self, path: str | None = None, data=None, fs: float | None = None,
+                 speed: float = 1.0, loop: bool = True):
+        self.k = None
+        self.cap = None
+        if path is not None and path.lower().endswith(".hcap"):
+            from hallcap import Capture
+            self.cap = Capture(path)
+            fs = fs or self.cap.fs
+            self.k = self.cap.meta.get("k")
+            self.channels, self.n = len(self.cap.columns), len(self.cap)
+        else:
+            if path is not None:
+                table = np.loadtxt(path, delimiter=",", ndmin=2)
+                fs = fs or 1.0 / np.median(np.diff(table[:, 0]))
+                data = table[:, 1:].T
+            self.data = np.atleast_2d(np.asarray(data, dtype=np.float64))
+            self.channels, self.n = self.data.shape
+        self.fs = float(fs or FS)
+        self.speed = float(speed)
+        self.loop = loop
+        self.sent = 0
+        self.t0 = None
+
+    def _rows(self, i: int, j: int):
+        if self.cap is not None:
+            return self.cap.read_rows(i, j)[1].T
+        return self.data[:, i:j]
+
+    def read(self):
+        now = time.perf_counter()
+        if self.t0 is None:
+            self.t0 = now
+        due = int((now - self.t0) * self.speed * self.fs)
+        if not self.loop:
+            due = min(due, self.n)
+        parts = []
+        while self.sent < due:
+            i = self.sent % self.n
+            j = min(self.n, i + due - self.sent)
+            parts.append(self._rows(i, j))
+            self.sent += j - i
+        x = np.concatenate(parts, axis=1) if parts else np.empty((self.channels, 0))
+        return (self.sent - x.shape[1] + np.arange(x.shape[1])) / self.fs, x
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.close()
+
+class Live:
+    """
+    Samples from a hall_shm ring: attached by name (monitor.py with
+    SHARED_RING prints it), or fed by hall_shm.acquire on `ports` in its
+    own process (several ports go through hall_acquire, `channels` each).
+    A board missing from the merge (NaN) holds its last value.
+    """
+    def __init__(self, ring: str | None = None, ports=None, channels: int = 1,
+                 fs: float = FS, binary: bool = False):
+        import hall_shm
+        self.proc = None
+        if ring is not None:
+            self.ring = hall_shm.SharedRing(ring)
+        else:
+            self.ring = hall_shm.SharedRing(channels=channels * len(ports),
+                                            capacity=int(RING_SECONDS * fs), fs=fs)
+            self.proc = hall_shm.start(hall_shm.acquire, self.ring.name,
+                                       list(ports) if len(ports) > 1 else ports[0], channels, binary, fs)
+        self.reader = hall_shm.Reader(self.ring)
+        self.channels, self.fs, self.k = self.ring.channels, self.ring.fs, None
+        self.last = np.full((self.channels, 1), MID_MV)
+
+    def read(self):
+        t, x = self.reader.read()
+        if t.size:
+            gap = np.isnan(x)
+            if gap.any():
+                x = np.where(gap, self.last, x)
+            self.last = x[:, -1:]
+        return t, x
+
+    def close(self):
+        if self.proc is not None:
+            self.ring.stop()
+            self.proc.join()
+        self.ring.close()
+
+def demo_source(layout: np.ndarray, fs: float = FS, seconds: float = 20.0, k: float = K,
+                height_mm: float | None = None, peak_mt: float = 20.0, seed: int = 0) -> np.ndarray:
+    """
+    (channels x n) mV of a vertical dipole circling `height_mm` (default:
+    the sensor pitch) above the array once every 5 s and vibrating at
+    12 Hz, plus 2 mV of noise.
+    """
+    xy = np.column_stack((layout["x_mm"], layout["y_mm"]))
+    height_mm = height_mm or float(np.median(spacing(xy)))
+    c, r = xy.mean(axis=0), 0.3 * np.ptp(xy, axis=0)
+    t = np.arange(int(fs * seconds)) / fs
+    wobble = 0.5 * np.sin(2 * np.pi * 12.0 * t)
+    mx = c[0] + r[0] * np.cos(2 * np.pi * t / 5.0) + wobble
+    my = c[1] + r[1] * np.sin(2 * np.pi * t / 5.0)
+    dx, dy = xy[:, 0, None] - mx, xy[:, 1, None] - my
+    r2 = dx * dx + dy * dy + height_mm ** 2
+    bz = peak_mt * height_mm ** 3 * (3 * height_mm ** 2 - r2) / (2 * r2 ** 2.5)   # peak_mt right below
+    out = np.full((int(layout["channel"].max()) + 1, t.size), MID_MV)
+    out[layout["channel"]] += k * bz
+    return out + np.random.default_rng(seed).normal(0.0, 2.0, out.shape)
+
+# --- Display ---
+
+class FieldView:
+    """
+    Three blitted heatmaps (field, |gradient| with arrows, band RMS) of a
+    FieldMap fed from a source. Colour scales move like minmax_plot's axis
+    limits on a peak hold (CLIM_HOLD_S), and only then is the figure
+    (colorbars, ticks) redrawn in full.
+    """
+    def __init__(self, fmap: FieldMap, source, blit: bool = True, labels: bool = False):
+        import matplotlib.pyplot as plt
+        self.fmap, self.source, self.blit = fmap, source, blit
+        x0, x1, y1, y0 = fmap.extent
+        stacked = x1 - x0 > 2 * (y1 - y0)   # wide boards: panels stacked
+        if stacked:
+            self.fig, axes = plt.subplots(3, 1, figsize=(10, 9), sharex=True)
+        else:
+            self.fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+        blank = np.full(fmap.shape, np.nan)
+        titles = ("Field (mT)", "|Gradient| (mT/mm)", f"RMS {BAND_HZ[0]:g}-{BAND_HZ[1]:g} Hz (mT)")
+        cmaps = ("RdBu_r", "viridis", "magma")
+        self.imgs = []
+        x, y = fmap.xy.T
+        for ax, title, cmap in zip(axes, titles, cmaps):
+            img = ax.imshow(blank, origin="upper", extent=fmap.extent, cmap=cmap,
+                            interpolation="nearest", animated=blit)
+            img.set_clim(-1e-3 if cmap == "RdBu_r" else 0.0, 1e-3)
+            self.fig.colorbar(img, ax=ax, shrink=0.8)
+            ax.plot(x, y, ".", color="k", ms=2)
+            ax.set_title(title)
+            ax.set_xlabel("x (mm)")
+            ax.set_ylabel("y (mm)")
+            ax.set_aspect("equal")
+            ax.set_xlim(x0, x1)
+            ax.set_ylim(y1, y0)
+            self.imgs.append(img)
+        if stacked:
+            for ax in axes[:-1]:
+                ax.set_xlabel("")
+        if labels:
+            for xi, yi, ref in zip(x, y, fmap.layout["ref"]):
+                axes[0].annotate(ref, (xi, yi), fontsize=6, xytext=(2, 2), textcoords="offset points")
+        self.arrows = axes[1].quiver(x, y, np.zeros_like(x), np.zeros_like(y), color="w",
+                                     angles="xy", scale_units="xy", scale=1, animated=blit)
+        self.status = axes[0].text(0.01, 0.99, "", transform=axes[0].transAxes, va="top", ha="left",
+                                   fontsize=7, family="monospace", animated=blit,
+                                   bbox=dict(facecolor="white", alpha=0.7, lw=0))
+        self.fig.tight_layout()
+        self.artists = (*self.imgs, self.arrows, self.status)
+        self.last = time.perf_counter()
+        self.fps = 0.0
+        self.peak = np.zeros(3)
+
+    def update(self, frame=None):
+        _, mv = self.source.read()
+        fmap = self.fmap
+        fmap.push(mv)
+        images = fmap.images()
+        for img, data in zip(self.imgs, images):
+            img.set_data(data)
+        now = time.perf_counter()
+        dt, self.last = max(now - self.last, 1e-6), now
+        self.fps = 0.9 * self.fps + 0.1 / dt
+        # colour scales follow a decaying peak hold, so they move (and the figure
+        # is redrawn) when a new peak arrives or the old one has halved
+        peak = [np.max(np.abs(fmap.field)), np.max(np.hypot(*fmap.grad)), np.max(fmap.rms)]
+        self.peak = np.maximum(peak, self.peak * 0.5 ** (dt / CLIM_HOLD_S))
+        redraw = False
+        for img, lo, hi in zip(self.imgs, (-self.peak[0], 0.0, 0.0), self.peak):
+            if update_clim(img, lo, hi):
+                redraw = True
+                if lo == 0.0:   # magnitudes: no padding below zero
+                    img.set_clim(0.0, img.get_clim()[1])
+        # arrows up to one pitch long at the top of the colour scale
+        g = fmap.pitch / max(self.imgs[1].get_clim()[1], np.finfo(float).tiny)
+        self.arrows.set_UVC(g * fmap.grad[0], g * fmap.grad[1])
+        self.status.set_text(f"t {fmap.seen / self.source.fs:7.1f} s  {self.fps:4.1f} fps  "
+                             f"{mv.shape[1]} samples")
+        if redraw and self.blit:
+            self.fig.canvas.draw()
+        return self.artists
+
+def bench(view: FieldView, seconds: float = 5.0, warmup: float = 1.0) -> dict:
+    """
+    Frames per second of update() plus the blitted draw, headless (like
+    monitor_replay), after `warmup` seconds for the colour scales to settle.
+    """
+    canvas = view.fig.canvas
+    canvas.draw()
+    frames, redraws = [], 0
+    t_start = time.perf_counter() + warmup
+    while time.perf_counter() < t_start + seconds:
+        f0 = time.perf_counter()
+        clims = [img.get_clim() for img in view.imgs]
+        for a in view.update():
+            a.axes.draw_artist(a)
+        canvas.blit(view.fig.bbox)
+        if f0 >= t_start:
+            frames.append(time.perf_counter() - f0)
+            redraws += clims != [img.get_clim() for img in view.imgs]
+    fr = np.asarray(frames)
+    return {"frames": fr.size, "redraws": redraws, "frame_p50": float(np.median(fr)),
+            "frame_p95": float(np.percentile(fr, 95)), "fps": fr.size / fr.sum()}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Live field map of the Hall array")
+    ap.add_argument("layout", help=".kicad_pcb (Hall sensors in reference order) or channel,ref,x_mm,y_mm CSV")
+    ap.add_argument("capture", nargs="?", help=".hcap capture or monitor's SAVE_FILE text to replay")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--port", nargs="+", help="serial port(s) for live input")
+    src.add_argument("--ring", help="attach to a running hall_shm ring (monitor.py with SHARED_RING)")
+    src.add_argument("--demo", action="store_true", help="synthetic magnet over the layout")
+    ap.add_argument("--channels", type=int, help="with --port, channels per board (default: the layout's)")
+    ap.add_argument("--binary", action="store_true", help="with --port, hall_protocol frames")
+    ap.add_argument("--fs", type=float, help=f"sample rate (default: the capture's, or {FS:g})")
+    ap.add_argument("--k", type=float, help=f"mV per mT (default: the capture's, or {K:g})")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay speed")
+    ap.add_argument("--tare", type=float, default=0.0, metavar="S",
+                    help="zero each sensor on its mean over the first S seconds (default: mid-scale)")
+    ap.add_argument("--pixel", type=float, default=PIXEL_MM, help="heatmap pixel size (mm)")
+    ap.add_argument("--labels", action="store_true", help="label sensors with their references")
+    ap.add_argument("--write-layout", metavar="CSV", help="write the layout as CSV and exit")
+    ap.add_argument("--bench", type=float, metavar="S", help="headless: time frames for S seconds")
+    args = ap.parse_args(argv)
+
+    layout = load_layout(args.layout)
+    if args.write_layout:
+        write_layout(args.write_layout, layout)
+        print(f"{len(layout)} sensors -> {args.write_layout}")
+        return 0
+    if args.bench:
+        import matplotlib
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import matplotlib.animation as animation
+
+    if args.port or args.ring:
+        n_boards = len(args.port) if args.port else 1
+        source = Live(args.ring, args.port, args.channels or -(-len(layout) // n_boards),
+                      args.fs or FS, args.binary)
+    elif args.demo or not args.capture:
+        fs = args.fs or FS
+        source = Replay(data=demo_source(layout, fs, k=args.k or K), fs=fs, speed=args.speed)
+    else:
+        source = Replay(args.capture, fs=args.fs, speed=args.speed)
+    if layout["channel"].max() >= source.channels:
+        print(f"layout uses channels up to {layout['channel'].max()}, the input has {source.channels}; "
+              "extra sensors are left out")
+        layout = layout[layout["channel"] < source.channels]
+    fmap = FieldMap(layout, source.fs, args.k or source.k or K, tare_s=args.tare, pixel_mm=args.pixel)
+    view = FieldView(fmap, source, labels=args.labels)
+    try:
+        if args.bench:
+            s = bench(view, args.bench)
+            print(f"{len(layout)} sensors, {fmap.shape[1]}x{fmap.shape[0]} px: {s['fps']:.0f} fps "
+                  f"(frame p50 {1e3 * s['frame_p50']:.1f} ms, p95 {1e3 * s['frame_p95']:.1f} ms, "
+                  f"{s['redraws']} full redraws in {s['frames']} frames)")
+            return 0
+        ani = animation.FuncAnimation(view.fig, view.update, interval=FRAME_INTERVAL_MS, blit=True,
+                                      cache_frame_data=False)
+        plt.show()
+    finally:
+        source.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
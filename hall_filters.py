@@ -0,0 +1,93 @@
+"""
+hall_filters.py
+Live filter stage for monitor.py, applied block by block to every channel.
+
+    FirmwareSMA   bit-exact replica of sma_push() in src/hall.c
+    FilterBank    optional SMA, then mains notches (+ harmonics) and a
+                  high-pass as one cascade of second-order sections
+
+All state (SMA history, sosfilt zi) is carried between calls, so filtering
+a stream in blocks gives the same samples as filtering it in one piece.
+"""
+
+import numpy as np
+from scipy import signal
+
+SMA_MAX = 64    # size of sma_t.buf in include/hall.h
+
+# --- Firmware moving average ---
+
+class FirmwareSMA:
+    """
+    sma_push() over (channels x n) blocks, vectorized.
+
+    Reproduces the firmware integer arithmetic: inputs are uint16, the
+    running sum covers the last min(filled, N) inputs, and the output is
+    (uint16_t)sum / filled, i.e. the sum is truncated to 16 bits before the
+    floor division. Outputs are returned as float64 for the rest of the chain.
+    """
+    def __init__(self, N: int = 4, channels: int = 1):
+        if not 1 <= N <= SMA_MAX:
+            raise ValueError(f"SMA length must be 1..{SMA_MAX}, got {N}")
+        self.N = int(N)
+        self.hist = np.zeros((int(channels), self.N - 1), dtype=np.int64)
+        self.filled = 0
+
+    def push(self, x) -> np.ndarray:
+        x = np.asarray(x).reshape(self.hist.shape[0], -1)
+        n = x.shape[1]
+        if not n:
+            return np.empty(x.shape)
+        vals = np.rint(x).astype(np.int64) & 0xFFFF      # uint16_t in
+        full = np.concatenate((self.hist, vals), axis=1)
+        c = np.zeros((full.shape[0], full.shape[1] + 1), dtype=np.int64)
+        np.cumsum(full, axis=1, out=c[:, 1:])
+        sums = c[:, self.N:] - c[:, :n]
+        filled = np.minimum(self.filled + np.arange(1, n + 1), self.N)
+        out = (sums & 0xFFFF) // filled
+        self.hist = full[:, full.shape[1] - (self.N - 1):]
+        self.filled = min(self.filled + n, self.N)
+        return out.astype(np.float64)
+
+# --- Filter bank ---
+
+def notch_sos(fs: float, mains: float, harmonics: int = 1, q: float = 30.0) -> np.ndarray:
+    """One iirnotch section per mains harmonic below Nyquist."""
+    sections = [signal.tf2sos(*signal.iirnotch(h * mains, q, fs=fs))
+                for h in range(1, int(harmonics) + 1) if h * mains < fs / 2]
+    return np.vstack(sections) if sections else np.empty((0, 6))
+
+class FilterBank:
+    """
+    Streaming filter for (channels x n) blocks: FirmwareSMA (sma > 0), then
+    notches at mains x 1..harmonics (mains=None disables) and a Butterworth
+    high-pass (highpass=None disables), run as a single sosfilt call per
+    block. The zi state starts at the steady state for the first sample, so
+    a DC offset does not ring through the high-pass.
+    """
+    def __init__(self, fs: float, channels: int = 1, mains: float | None = 60.0,
+                 harmonics: int = 3, q: float = 30.0, highpass: float | None = 0.5,
+                 highpass_order: int = 2, sma: int = 0):
+        self.channels = int(channels)
+        parts = []
+        if mains:
+            parts.append(notch_sos(fs, mains, harmonics, q))
+        if highpass:
+            parts.append(signal.butter(highpass_order, highpass, "highpass", fs=fs, output="sos"))
+        self.sos = np.vstack(parts) if parts else np.empty((0, 6))
+        self.sma = FirmwareSMA(sma, self.channels) if sma else None
+        self.zi = None
+
+    def process(self, x) -> np.ndarray:
+        """Filter one block; returns an array shaped like x."""
+        x = np.asarray(x, dtype=np.float64)
+        y = x.reshape(self.channels, -1)
+        if not y.shape[1]:
+            return x.copy()
+        if self.sma is not None:
+            y = self.sma.push(y)
+        if len(self.sos):
+            if self.zi is None:
+                self.zi = signal.sosfilt_zi(self.sos)[:, None, :] * y[None, :, :1]
+            y, self.zi = signal.sosfilt(self.sos, y, axis=-1, zi=self.zi)
+        return y.reshape(x.shape)
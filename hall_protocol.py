@@ -0,0 +1,414 @@
+"""
+hall_protocol.py
+Serial stream formats for the Hall array, host side: the firmware's ASCII
+"t_us,value[,value...]" lines, binary frames, and the sample history
+buffer the readers fill.
+
+Frame layout (little endian), matching hall_frame_pack() in src/hall.c:
+
+    sync   u16   0x5AA5 (bytes A5 5A)
+    seq    u16   frame counter, wraps at 65536
+    t_us   u32   device timestamp in microseconds
+    data   i16 x n_channels   raw ADC counts
+    crc    u16   CRC-16/CCITT-FALSE over seq..data
+
+Run `python hall_protocol.py` to start a pty loopback generator that streams
+synthetic frames, or `python hall_protocol.py --check` to decode it back.
+"""
+
+import os
+import re
+import sys
+import time
+import threading
+import argparse
+import numpy as np
+
+SYNC = 0x5AA5
+SYNC_BYTES = bytes((SYNC & 0xFF, SYNC >> 8))
+HEADER_BYTES = 8      # sync + seq + t_us
+CRC_BYTES = 2
+ADC_MAX = 4095        # 12-bit ADC
+VREF_MV = 3300.0
+
+# ASCII line formats
+csv_re     = re.compile(r'^\s*(\d+)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')  # t_us,value
+labeled_re = re.compile(r'Voltage:\s*(-?\d+(?:\.\d+)?)')
+plain_re   = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*$')
+
+# --- CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) ---
+
+def _crc_table() -> np.ndarray:
+    table = np.zeros(256, dtype=np.uint16)
+    for b in range(256):
+        crc = b << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[b] = crc & 0xFFFF
+    return table
+
+CRC_TABLE = _crc_table()
+
+def crc16_rows(rows: np.ndarray) -> np.ndarray:
+    """
+    CRC of every row of a (frames, bytes) uint8 array at once.
+    The loop runs over byte positions in a frame, never over frames.
+    """
+    crc = np.full(rows.shape[0], 0xFFFF, dtype=np.uint16)
+    for j in range(rows.shape[1]):
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ rows[:, j]]
+    return crc
+
+def crc16(data: bytes) -> int:
+    return int(crc16_rows(np.frombuffer(data, dtype=np.uint8)[None, :])[0])
+
+# --- Frame layout ---
+
+def frame_dtype(n_channels: int) -> np.dtype:
+    return np.dtype([
+        ("sync", "<u2"),
+        ("seq", "<u2"),
+        ("t_us", "<u4"),
+        ("data", "<i2", (n_channels,)),
+        ("crc", "<u2"),
+    ])
+
+def frame_size(n_channels: int) -> int:
+    return HEADER_BYTES + 2 * n_channels + CRC_BYTES
+
+def counts_to_mv(counts: np.ndarray) -> np.ndarray:
+    """Raw ADC counts to millivolts, same conversion as the firmware's ASCII output."""
+    return counts.astype(np.float64) * (VREF_MV / ADC_MAX)
+
+def encode_frames(seq, t_us, data) -> bytes:
+    """
+    Pack frames into bytes. seq and t_us are (frames,), data is
+    (frames, channels) int16 ADC counts.
+    """
+    data = np.atleast_2d(np.asarray(data, dtype=np.int16))
+    frames = np.zeros(data.shape[0], dtype=frame_dtype(data.shape[1]))
+    frames["sync"] = SYNC
+    frames["seq"] = np.asarray(seq, dtype=np.int64) & 0xFFFF
+    frames["t_us"] = np.asarray(t_us, dtype=np.int64) & 0xFFFFFFFF
+    frames["data"] = data
+    rows = frames.view(np.uint8).reshape(data.shape[0], -1)
+    frames["crc"] = crc16_rows(rows[:, 2:-CRC_BYTES])
+    return frames.tobytes()
+
+# --- Decoder ---
+
+class FrameDecoder:
+    """
+    Incremental decoder for a byte stream of frames.
+
+    feed() takes whatever bytes arrived, finds every sync word with one
+    vectorized search, checks all candidate CRCs together, and returns the
+    good frames as arrays. Bytes that are not part of a valid frame are
+    skipped (resync); an incomplete frame at the end is kept for the next
+    call. Sequence gaps are counted as dropped frames.
+    """
+    def __init__(self, n_channels: int):
+        self.n_channels = int(n_channels)
+        self.size = frame_size(self.n_channels)
+        self.dtype = frame_dtype(self.n_channels)
+        self.pending = b""
+        self.last_seq = None
+        self.frames = 0         # good frames decoded
+        self.dropped = 0        # frames missing from the sequence
+        self.crc_errors = 0     # sync candidates that failed the CRC
+        self.skipped = 0        # bytes discarded while resyncing
+
+    def empty(self):
+        return (np.empty(0, dtype=np.uint16), np.empty(0, dtype=np.uint32),
+                np.empty((0, self.n_channels), dtype=np.int16))
+
+    def feed(self, data: bytes):
+        """Decode new bytes; returns (seq, t_us, counts) with counts (frames x channels)."""
+        buf = np.frombuffer(self.pending + data, dtype=np.uint8)
+        if buf.size < self.size:
+            self.pending = buf.tobytes()
+            return self.empty()
+
+        # Every complete candidate frame starting on a sync word
+        last_start = buf.size - self.size
+        starts = np.flatnonzero((buf[:last_start + 1] == SYNC_BYTES[0])
+                                & (buf[1:last_start + 2] == SYNC_BYTES[1]))
+        rows = buf[starts[:, None] + np.arange(self.size)]
+        crc = rows[:, -2].astype(np.uint16) | (rows[:, -1].astype(np.uint16) << 8)
+        good = crc16_rows(rows[:, 2:-CRC_BYTES]) == crc
+        self.crc_errors += int((~good).sum())
+        starts, rows = starts[good], rows[good]
+
+        # A sync pattern inside a payload can pass the CRC by chance;
+        # keep the earliest of any overlapping frames
+        if starts.size > 1 and np.any(np.diff(starts) < self.size):
+            keep, end = [], -1
+            for i, s in enumerate(starts):
+                if s >= end:
+                    keep.append(i)
+                    end = s + self.size
+            starts, rows = starts[keep], rows[keep]
+
+        # Carry over anything that may still become a frame
+        end = int(starts[-1]) + self.size if starts.size else 0
+        carry = max(end, last_start + 1)
+        self.skipped += carry - starts.size * self.size
+        self.pending = buf[carry:].tobytes()
+
+        if not starts.size:
+            return self.empty()
+        frames = rows.reshape(-1).view(self.dtype)
+        seq = frames["seq"]
+        self._count_drops(seq)
+        self.frames += seq.size
+        return seq, frames["t_us"], frames["data"]
+
+    def _count_drops(self, seq: np.ndarray):
+        s = seq.astype(np.int64)
+        if self.last_seq is not None:
+            s = np.concatenate(([self.last_seq], s))
+        gaps = (np.diff(s) - 1) % 65536
+        self.dropped += int(gaps.sum())
+        self.last_seq = int(seq[-1])
+
+    def stats(self) -> dict:
+        return {"frames": self.frames, "dropped": self.dropped,
+                "crc_errors": self.crc_errors, "skipped_bytes": self.skipped}
+
+# --- ASCII lines ---
+
+def parse_UART(line: str):
+    m = csv_re.match(line)
+    if m:
+        t_us = int(m.group(1))
+        val = float(m.group(2))
+        t_us = t_us * 1e-6
+    else:
+        t_us = time.time()
+        m = labeled_re.search(line) or plain_re.match(line)
+        if not m:
+            return None
+        val = float(m.group(1))
+
+    return (t_us, val)
+
+def split_lines(buf: bytes):
+    """Split raw bytes into complete lines and the trailing partial line."""
+    cut = buf.rfind(b"\n")
+    if cut < 0:
+        return b"", buf
+    return buf[:cut], buf[cut + 1:]
+
+def parse_block(block: bytes, n_channels: int = 1):
+    """
+    Parse a block of complete UART lines in one pass.
+    `t_us,value[,value...]` blocks are converted by NumPy in a single call;
+    anything else (labeled/plain lines, corrupt lines) falls back to
+    line-by-line parsing.
+    Returns (t_s, values) as float64 arrays, values shaped (n,) for one
+    channel and (n_channels, n) otherwise.
+    """
+    cols = n_channels + 1
+    empty = np.empty(0) if n_channels == 1 else np.empty((n_channels, 0))
+    if not block:
+        return np.empty(0), empty
+    lines = block.split(b"\n")
+    tokens = block.replace(b",", b" ").split()
+    if block.count(b",") == n_channels * len(lines) and len(tokens) == cols * len(lines):
+        try:
+            tv = np.array(tokens, dtype=np.float64).reshape(-1, cols)
+            return tv[:, 0] * 1e-6, (tv[:, 1] if n_channels == 1 else tv[:, 1:].T)
+        except ValueError:
+            pass    # garbage in the block, parse it line by line
+
+    parsed = []
+    for raw in lines:
+        if n_channels == 1:
+            p = parse_UART(raw.decode("utf-8", errors="ignore").strip())
+        else:
+            try:
+                p = [float(v) for v in raw.split(b",")]
+                p[0] *= 1e-6
+            except ValueError:
+                p = None
+            if p is not None and len(p) != cols:
+                p = None
+        if p is not None:
+            parsed.append(p)
+    if not parsed:
+        return np.empty(0), empty
+    tv = np.array(parsed, dtype=np.float64)
+    return tv[:, 0], (tv[:, 1] if n_channels == 1 else tv[:, 1:].T)
+
+# --- Sample history ---
+
+class RingBuffer:
+    """
+    Fixed-size sample history. Holds the newest `capacity` samples in a
+    preallocated array so ingestion never grows a Python list.
+    With `channels` set the buffer is (channels x capacity) and extend()
+    takes (channels x n) blocks.
+    """
+    def __init__(self, capacity: int, channels: int | None = None):
+        self.capacity = int(capacity)
+        shape = (self.capacity,) if channels is None else (int(channels), self.capacity)
+        self.buf = np.zeros(shape, dtype=np.float64)
+        self.total = 0      # samples pushed since start
+        self.head = 0       # next write position
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def extend(self, x):
+        x = np.asarray(x, dtype=np.float64).reshape(self.buf.shape[:-1] + (-1,))
+        n = x.shape[-1]
+        self.total += n
+        if n >= self.capacity:
+            self.buf[...] = x[..., -self.capacity:]
+            self.head = 0
+            return
+        end = self.head + n
+        if end <= self.capacity:
+            self.buf[..., self.head:end] = x
+        else:
+            split = self.capacity - self.head
+            self.buf[..., self.head:] = x[..., :split]
+            self.buf[..., :end - self.capacity] = x[..., split:]
+        self.head = end % self.capacity
+
+    def latest(self, n: int | None = None) -> np.ndarray:
+        """Return the newest n samples (oldest first) as a new array."""
+        n = len(self) if n is None else min(int(n), len(self))
+        start = (self.head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.buf[..., start:start + n].copy()
+        return np.concatenate((self.buf[..., start:], self.buf[..., :self.head]), axis=-1)
+
+# --- pty loopback generator ---
+
+class LoopbackGenerator:
+    """
+    Streams synthetic frames into a pseudo-terminal so the decoder (or
+    anything that opens a serial port) can be exercised without a board.
+    Open `gen.port` with serial.Serial like a real device.
+
+    Each channel carries a sine at its own frequency plus noise, in ADC
+    counts around mid-scale. drop_rate skips frames (sequence gaps) and
+    corrupt_rate flips a byte inside a frame (CRC failure, resync).
+    """
+    def __init__(self, n_channels: int = 8, fs: float = 750.0, block: int = 64,
+                 drop_rate: float = 0.0, corrupt_rate: float = 0.0, seed: int = 0):
+        import pty
+        import tty
+        self.n_channels = int(n_channels)
+        self.fs = float(fs)
+        self.block = int(block)
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.rng = np.random.default_rng(seed)
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)      # no newline or echo translation of binary data
+        self.port = os.ttyname(self.slave)
+        self.freqs = 5.0 + 2.5 * np.arange(self.n_channels)
+        self.sent = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def make_block(self, start: int, n: int):
+        """Frames start..start+n as (seq, t_us, counts)."""
+        idx = np.arange(start, start + n)
+        t = idx / self.fs
+        wave = np.sin(2 * np.pi * self.freqs[None, :] * t[:, None])
+        counts = 2048 + 600 * wave + self.rng.normal(0, 8, wave.shape)
+        counts = np.clip(np.rint(counts), 0, ADC_MAX).astype(np.int16)
+        return idx & 0xFFFF, np.rint(t * 1e6).astype(np.int64), counts
+
+    def _impair(self, payload: bytes, n: int) -> bytes:
+        size = frame_size(self.n_channels)
+        frames = np.frombuffer(payload, dtype=np.uint8).reshape(n, size).copy()
+        keep = self.rng.random(n) >= self.drop_rate
+        hit = self.rng.random(n) < self.corrupt_rate
+        cols = self.rng.integers(2, size, n)
+        frames[hit, cols[hit]] ^= 0xFF
+        return frames[keep].tobytes()
+
+    def run(self, duration: float | None = None, speed: float = 1.0):
+        """Write frames paced at fs * speed until stopped or duration elapses."""
+        t0 = time.perf_counter()
+        while not self._stop.is_set():
+            elapsed = time.perf_counter() - t0
+            if duration is not None and elapsed >= duration:
+                break
+            due = int(elapsed * self.fs * speed) + self.block
+            if self.sent >= due:
+                time.sleep(self.block / (self.fs * speed) / 4)
+                continue
+            n = due - self.sent
+            payload = encode_frames(*self.make_block(self.sent, n))
+            if self.drop_rate or self.corrupt_rate:
+                payload = self._impair(payload, n)
+            os.write(self.master, payload)
+            self.sent += n
+
+    def start(self, **kwargs):
+        self._thread = threading.Thread(target=self.run, kwargs=kwargs, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+def read_port(port: str, n_channels: int, seconds: float):
+    """Decode a serial port (real or loopback) for a while; returns (decoder, counts)."""
+    import serial
+    dec = FrameDecoder(n_channels)
+    chunks = []
+    with serial.Serial(port, 921600, timeout=0.05) as ser:
+        t_end = time.time() + seconds
+        while time.time() < t_end:
+            data = ser.read(max(1, ser.in_waiting))
+            if data:
+                chunks.append(dec.feed(data)[2])
+    counts = np.concatenate(chunks) if chunks else np.empty((0, n_channels), np.int16)
+    return dec, counts
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Hall array binary frame loopback")
+    ap.add_argument("--channels", type=int, default=8)
+    ap.add_argument("--fs", type=float, default=750.0, help="frames per second")
+    ap.add_argument("--speed", type=float, default=1.0, help="multiple of real time")
+    ap.add_argument("--seconds", type=float, default=None, help="stop after this long")
+    ap.add_argument("--drop", type=float, default=0.0, help="fraction of frames dropped")
+    ap.add_argument("--corrupt", type=float, default=0.0, help="fraction of frames corrupted")
+    ap.add_argument("--check", action="store_true",
+                    help="decode the loopback in-process and print statistics")
+    args = ap.parse_args(argv)
+
+    gen = LoopbackGenerator(args.channels, args.fs, drop_rate=args.drop,
+                            corrupt_rate=args.corrupt)
+    if args.check:
+        seconds = args.seconds or 2.0
+        gen.start(duration=seconds, speed=args.speed)
+        dec, counts = read_port(gen.port, args.channels, seconds + 0.5)
+        gen.stop()
+        stats = dec.stats()
+        print(f"sent {gen.sent} frames, decoded {stats['frames']} "
+              f"({stats['frames'] / seconds:.0f} frames/s, {counts.size / seconds:.0f} samples/s)")
+        print(f"dropped {stats['dropped']}, crc errors {stats['crc_errors']}, "
+              f"skipped {stats['skipped_bytes']} bytes")
+        return 0
+
+    print(f"Streaming {args.channels}-channel frames on {gen.port} (Ctrl-C to stop)")
+    try:
+        gen.run(duration=args.seconds, speed=args.speed)
+    except KeyboardInterrupt:
+        pass
+    gen.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+hall_shm.py
+Sample ring buffer in shared memory: one acquisition process writes, any
+number of processes read at their own pace.
+
+    python hall_shm.py                      # synthetic producer + consumers, prints rates
+    python hall_shm.py --rate 200000 --consumers 3 --seconds 5
+
+Layout of the segment (all little-endian 8-byte words):
+
+    header  int64[8]   magic, channels, capacity, reserved, published, stop, -, fs (float64)
+    t       float64[capacity]             sample times (s)
+    data    float64[channels, capacity]   samples
+
+The writer never waits for readers. write() first raises `reserved` to
+the new total, copies the block into the ring, then raises `published`
+once. A reader copies the samples up to `published`, then reads
+`reserved` again: any sample older than reserved - capacity may have
+been overwritten while it copied and is dropped and counted as lost. No
+lock is taken. Each counter has one writer and aligned 8-byte stores are
+atomic. Readers map the same memory, so SharedRing.segments() hands out
+zero-copy views; Reader.read() copies and validates.
+
+x86 only: the protocol relies on stores becoming visible in program order
+and loads not being reordered with each other (x86-64 TSO). NumPy issues
+no memory fences, so on weakly ordered CPUs (ARM, Apple silicon) a reader
+can see `published` before the samples behind it, or miss a `reserved`
+raise, and return torn data. Creating a ring there prints a warning.
+
+monitor.py runs acquisition and capture recording as processes on a ring
+when SHARED_RING is set, and plots as one more reader.
+"""
+
+import sys
+import time
+import platform
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+MAGIC = 0x48414C4C52494E47     # "HALLRING"
+HEADER_WORDS = 8
+_MAGIC, _CHANNELS, _CAPACITY, _RESERVED, _PUBLISHED, _STOP, _, _FS = range(HEADER_WORDS)
+POLL_S = 0.005      # reader/recorder sleep when the ring has nothing new
+ORDERED_CPU = platform.machine().lower() in ("x86_64", "amd64", "i386", "i686", "x86")
+
+# --- Ring ---
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach without handing the segment to this process's resource tracker (the creator unlinks it)."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:   # Python < 3.13 registers on attach too; skip it for this call
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+class SharedRing:
+    """
+    (channels x capacity) sample ring with timestamps in shared memory.
+    SharedRing(channels=..., capacity=..., fs=...) creates a segment;
+    SharedRing(name) attaches to an existing one.
+    """
+    def __init__(self, name: str | None = None, channels: int = 1, capacity: int = 1 << 16,
+                 fs: float = 0.0):
+        self.owner = name is None
+        if self.owner:
+            if not ORDERED_CPU:
+                print(f"hall_shm: {platform.machine()} is weakly ordered; ring reads may be torn "
+                      "(see the module docstring)", file=sys.stderr)
+            size = 8 * (HEADER_WORDS + capacity * (1 + channels))
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = _attach(name)
+        buf = self.shm.buf
+        self.header = np.ndarray((HEADER_WORDS,), dtype="<i8", buffer=buf)
+        if self.owner:
+            self.header[:] = 0
+            self.header[_CHANNELS], self.header[_CAPACITY] = channels, capacity
+            self.header[_FS:].view("<f8")[0] = fs
+            self.header[_MAGIC] = MAGIC
+        elif self.header[_MAGIC] != MAGIC:
+            raise ValueError(f"{name} is not a sample ring")
+        self.channels = int(self.header[_CHANNELS])
+        self.capacity = int(self.header[_CAPACITY])
+        self.fs = float(self.header[_FS:].view("<f8")[0])
+        off = 8 * HEADER_WORDS
+        self.t = np.ndarray((self.capacity,), dtype="<f8", buffer=buf, offset=off)
+        self.data = np.ndarray((self.channels, self.capacity), dtype="<f8", buffer=buf,
+                               offset=off + 8 * self.capacity)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def published(self) -> int:
+        """Samples written since the ring was created."""
+        return int(self.header[_PUBLISHED])
+
+    @property
+    def stopped(self) -> bool:
+        return bool(self.header[_STOP])
+
+    def stop(self):
+        """Ask every process attached to the ring to finish."""
+        self.header[_STOP] = 1
+
+    def write(self, t: np.ndarray, x: np.ndarray):
+        """
+        Append n samples: t (n,) and x (channels, n). Single writer only.
+        A block longer than the ring keeps its last `capacity` samples; the
+        rest count as published and lost.
+        """
+        x = np.asarray(x, dtype=np.float64).reshape(self.channels, -1)
+        n = x.shape[1]
+        if not n:
+            return
+        end = int(self.header[_PUBLISHED]) + n
+        start = end - min(n, self.capacity)
+        t, x = t[-(end - start):], x[:, -(end - start):]
+        self.header[_RESERVED] = end
+        for (a, b), (i, j) in self._spans(start, end):
+            self.t[a:b] = t[i:j]
+            self.data[:, a:b] = x[:, i:j]
+        self.header[_PUBLISHED] = end
+
+    def _spans(self, start: int, stop: int):
+        """Ring slices covering samples [start, stop) with their offsets into the block."""
+        a = start % self.capacity
+        n = stop - start
+        if a + n <= self.capacity:
+            return [((a, a + n), (0, n))]
+        split = self.capacity - a
+        return [((a, self.capacity), (0, split)), ((0, n - split), (split, n))]
+
+    def segments(self, start: int, stop: int):
+        """
+        Zero-copy (t, x) views of samples [start, stop), one or two pieces.
+        Valid only while the writer has not lapped them; check with
+        self.intact(start) after use.
+        """
+        return [(self.t[a:b], self.data[:, a:b]) for (a, b), _ in self._spans(start, stop)]
+
+    def intact(self, start: int) -> bool:
+        """True if sample `start` has not been overwritten (nor is being)."""
+        return int(self.header[_RESERVED]) - self.capacity <= start
+
+    def close(self):
+        del self.header, self.t, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class Reader:
+    """One consumer's position in a ring; read() returns the samples it has not seen yet."""
+    def __init__(self, ring: SharedRing, from_start: bool = False):
+        self.ring = ring
+        self.cursor = 0 if from_start else ring.published
+        self.lost = 0       # samples overwritten before this reader got to them
+
+    @property
+    def behind(self) -> int:
+        return self.ring.published - self.cursor
+
+    def read(self, max_n: int | None = None):
+        """New samples as (t (n,), x (channels, n)) copies, oldest first."""
+        ring = self.ring
+        stop = ring.published
+        start = max(self.cursor, stop - ring.capacity)
+        if max_n is not None:
+            stop = min(stop, start + int(max_n))
+        n = stop - start
+        t = np.empty(n)
+        x = np.empty((ring.channels, n))
+        for (a, b), (i, j) in ring._spans(start, stop):
+            t[i:j] = ring.t[a:b]
+            x[:, i:j] = ring.data[:, a:b]
+        # Whatever the writer reserved meanwhile may have overwritten the oldest samples
+        torn = min(n, max(0, int(ring.header[_RESERVED]) - ring.capacity - start))
+        self.lost += start - self.cursor + torn
+        self.cursor = stop
+        return t[torn:], x[:, torn:]
+
+# --- Processes ---
+
+def acquire(name: str, port: str | list, n_channels: int = 1, binary: bool = False,
+            fs: float = 750.0, baud: int = 115200):
+    """
+    Producer: read a serial port (or a list of ports through hall_acquire,
+    n_channels per board) and publish every sample until the ring is stopped.
+    """
+    ring = SharedRing(name)
+    try:
+        if isinstance(port, (list, tuple)):
+            from hall_acquire import Acquisition, Board
+            acq = Acquisition([Board(p, n_channels, fs, binary) for p in port], fs).start()
+            while not ring.stopped:
+                t, x = acq.drain()
+                ring.write(t, x)
+                time.sleep(POLL_S)
+            acq.stop()
+            return
+        import serial
+        from hall_protocol import FrameDecoder, counts_to_mv, parse_block, split_lines
+        decoder = FrameDecoder(n_channels) if binary else None
+        pending = b""
+        with serial.Serial(port, baud, timeout=0.05) as ser:
+            while not ring.stopped:
+                data = ser.read(max(1, ser.in_waiting))
+                if not data:
+                    continue
+                if decoder is not None:
+                    _, t_us, counts = decoder.feed(data)
+                    t, x = t_us * 1e-6, counts_to_mv(counts).T
+                else:
+                    block, pending = split_lines(pending + data)
+                    t, x = parse_block(block, n_channels)
+                ring.write(t, x)
+    finally:
+        ring.close()
+
+def record(name: str, path: str, fmt: str = "hcap", k: float | None = None):
+    """Consumer: append every sample to a .hcap capture (or CSV text) until the ring is stopped."""
+    from hallcap import CaptureWriter, ADC_MV_PER_COUNT
+    ring = SharedRing(name)
+    reader = Reader(ring, from_start=True)
+    if fmt == "hcap":
+        out = CaptureWriter(path, [f"ch{i}" for i in range(ring.channels)], fs=ring.fs,
+                            scale=ADC_MV_PER_COUNT, units="mV", k=k, chunk_rows=4096)
+    else:
+        out = open(path, "a", buffering=1 << 16)
+    try:
+        while True:
+            done = ring.stopped
+            t, x = reader.read()
+            if t.size and fmt == "hcap":
+                out.append(x.T / ADC_MV_PER_COUNT, np.rint(t * 1e6))
+            elif t.size:
+                np.savetxt(out, np.column_stack([t, x.T]), fmt="%.6f" + ",%.3f" * ring.channels)
+            if done:
+                break
+            if not t.size:
+                time.sleep(POLL_S)
+    finally:
+        out.close()
+        if reader.lost:
+            print(f"record: {reader.lost} samples overwritten before they were saved")
+        ring.close()
+
+def start(target, *args, **kwargs) -> mp.Process:
+    """Run acquire/record (or any function taking the ring name first) in a daemon process."""
+    p = mp.Process(target=target, args=args, kwargs=kwargs, daemon=True)
+    p.start()
+    return p
+
+# --- Benchmark ---
+
+def _synthetic(name: str, rate: float, block: int):
+    """Producer publishing a ramp at `rate` samples/s."""
+    ring = SharedRing(name)
+    t0, sent = time.perf_counter(), 0
+    while not ring.stopped:
+        due = int((time.perf_counter() - t0) * rate)
+        if due - sent < block:
+            time.sleep(block / rate / 2)
+            continue
+        idx = np.arange(sent, due)
+        ring.write(idx / rate, np.broadcast_to(idx.astype(np.float64), (ring.channels, idx.size)))
+        sent = due
+    ring.close()
+
+def _consumer(name: str, work_s: float, result):
+    """Reads at its own pace (work_s of 'processing' per read) and checks the ramp is intact."""
+    ring = SharedRing(name)
+    reader = Reader(ring)
+    got = bad = 0
+    while not ring.stopped:
+        t, x = reader.read()
+        if t.size:
+            # A torn copy breaks the ramp or the agreement of t and the channels
+            bad += int(np.count_nonzero(np.diff(x[0]) != 1))
+            bad += int(np.count_nonzero((x[-1] != x[0]) | (np.rint(t * ring.fs) != x[0])))
+            got += t.size
+        time.sleep(work_s if t.size else POLL_S)
+    result.extend([got, reader.lost, bad])
+    ring.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Shared-memory sample ring: producer + consumers benchmark")
+    ap.add_argument("--rate", type=float, default=100000.0, help="samples/s published")
+    ap.add_argument("--channels", type=int, default=8)
+    ap.add_argument("--consumers", type=int, default=2)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--capacity", type=int, default=1 << 16)
+    args = ap.parse_args(argv)
+
+    ring = SharedRing(channels=args.channels, capacity=args.capacity, fs=args.rate)
+    manager = mp.Manager()
+    results = [manager.list() for _ in range(args.consumers + 1)]
+    # One consumer that keeps up, the rest 'working' longer per read, and one that stalls
+    works = [0.0] + [0.01 * (i + 1) for i in range(args.consumers - 1)] + [1.5 * args.capacity / args.rate]
+    procs = [start(_consumer, ring.name, w, r) for w, r in zip(works, results)]
+    time.sleep(0.2)
+    producer = start(_synthetic, ring.name, args.rate, 256)
+    time.sleep(args.seconds)
+    published = ring.published
+    ring.stop()
+    for p in procs + [producer]:
+        p.join()
+    print(f"published {published} samples x {args.channels} channels "
+          f"({published / args.seconds:.0f} samples/s)")
+    for w, r in zip(works, results):
+        got, lost, bad = r
+        print(f"consumer (work {1e3 * w:6.1f} ms/read): read {got:9d}  lost {lost:9d}  "
+              f"discontinuities {bad}")
+    ring.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+hall_trigger.py
+Event-triggered capture for monitor.py: a cheap detector runs on every
+ingested block and only the triggered windows, with pre- and post-trigger
+context, are written (one file per event plus an index).
+
+    Trigger        per-sample detection statistic for (channels x n) blocks:
+                   "rms"    short-term / long-term mean square (STA/LTA)
+                   "band"   the same on a band-passed copy (band-power jump)
+                   "cusum"  CUSUM of the STA/LTA excess, for smaller but
+                            sustained changes
+    EventRecorder  keeps the last pre_s seconds of raw samples; a detection
+                   opens an event file with that context, and the event closes
+                   once post_s seconds pass without one
+
+    python hall_trigger.py hall_data.hcap                        # extract events from a full capture
+    python hall_trigger.py hall_data.csv --method band --band 10 30 --threshold 8
+    python hall_trigger.py --check                               # synthetic burst -> one event per method
+
+The long-term level follows the signal with time constant lta_s but takes
+samples above LTA_CLIP x its level clipped, so a long event does not raise
+its own bar. Detection starts once lta_s seconds have been seen. Like the
+filters, the statistic does not depend on how the stream is split into blocks.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from scipy import signal
+from hall_protocol import RingBuffer
+
+METHODS = ("rms", "band", "cusum")
+DEFAULT_THRESHOLD = {"rms": 4.0, "band": 6.0, "cusum": 2.0}    # power ratio (a narrow band fluctuates more); CUSUM level in seconds of excess
+STA_S = 0.25        # short-term average time constant
+LTA_S = 30.0        # long-term average time constant (and warm-up)
+LTA_CLIP = 3.0      # samples above this x the long-term level enter it clipped
+CUSUM_DRIFT = 0.5   # STA/LTA excess over 1 that CUSUM tolerates
+HIGHPASS_HZ = 0.5   # "rms" / "cusum" watch the signal above this (DC and drift removed)
+INDEX_FILE = "events.csv"
+INDEX_COLUMNS = ("event", "path", "start_s", "trigger_s", "end_s", "samples", "peak")
+SCAN_BLOCK = 1 << 16    # rows per block when scanning a capture
+
+# --- Detector ---
+
+class Trigger:
+    """
+    process(x) returns the detection statistic per sample (max over
+    channels) and which samples are detections: the statistic above
+    `threshold`, and for "cusum" also still climbing. All filter state is
+    carried between blocks, like hall_filters.FilterBank.
+    """
+    def __init__(self, fs: float, channels: int = 1, method: str = "rms",
+                 threshold: float | None = None, band: tuple[float, float] | None = None,
+                 sta_s: float = STA_S, lta_s: float = LTA_S):
+        if method not in METHODS:
+            raise ValueError(f"trigger method must be one of {METHODS}, got {method!r}")
+        if method == "band" and band is None:
+            raise ValueError("band trigger needs band=(lo, hi)")
+        self.method = method
+        self.threshold = DEFAULT_THRESHOLD[method] if threshold is None else float(threshold)
+        self.channels = int(channels)
+        self.fs = float(fs)
+        if band is not None:
+            self.sos = signal.butter(4, band, "bandpass", fs=fs, output="sos")
+        else:
+            self.sos = signal.butter(2, HIGHPASS_HZ, "highpass", fs=fs, output="sos")
+        self.zi = None
+        self.a_sta = np.exp(-1.0 / (sta_s * fs))
+        self.a_lta = np.exp(-1.0 / (lta_s * fs))
+        self.sta = np.zeros((self.channels, 1))     # one-pole states
+        self.lta = np.zeros((self.channels, 1))
+        self.hop = max(1, int(sta_s * fs))          # the clip level is refreshed every hop
+        self.level = np.inf
+        self.g = np.zeros((self.channels, 1))
+        self.warmup = int(lta_s * fs)
+        self.seen = 0
+
+    def _smooth(self, a: float, p: np.ndarray, y0: np.ndarray):
+        """One-pole average y[n] = a y[n-1] + (1 - a) p[n]; returns (y, last y)."""
+        y, _ = signal.lfilter([1 - a], [1, -a], p, axis=1, zi=a * y0)
+        return y, y[:, -1:]
+
+    def _cusum(self, excess: np.ndarray) -> np.ndarray:
+        """
+        CUSUM g = max(0, g + excess / fs) per channel, restarted from 0 when
+        a detection ends (g above threshold, excess back to <= 0): g only
+        drains at the drift, so without the restart it would stay above the
+        threshold long after an event and any noise excess would trigger.
+        """
+        n = excess.shape[1]
+        stat = np.empty_like(excess)
+        a = 0
+        while a < n:
+            # Lindley recursion in closed form: S - min(0, running min S)
+            s = np.cumsum(excess[:, a:] / self.fs, axis=1) + self.g
+            g = s - np.minimum(np.minimum.accumulate(s, axis=1), 0.0)
+            ended = (g > self.threshold) & (excess[:, a:] <= 0)
+            hits = np.flatnonzero(ended.any(axis=0))
+            b = a + int(hits[0]) + 1 if hits.size else n
+            stat[:, a:b] = g[:, :b - a]
+            self.g = np.where(ended[:, b - a - 1:b - a], 0.0, g[:, b - a - 1:b - a])
+            a = b
+        return stat
+
+    def process(self, x) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float64).reshape(self.channels, -1)
+        n = x.shape[1]
+        if not n:
+            return np.empty(0), np.empty(0, dtype=bool)
+        if self.zi is None:
+            self.zi = signal.sosfilt_zi(self.sos)[:, None, :] * x[None, :, :1]
+        y, self.zi = signal.sosfilt(self.sos, x, axis=-1, zi=self.zi)
+        p = y * y
+        # Long-term level from zero, bias-corrected, with the clip level taken at
+        # fixed hops of the whole stream so the result does not depend on block sizes
+        lta = np.empty_like(p)
+        a = 0
+        while a < n:
+            b = min(n, a + self.hop - (self.seen + a) % self.hop)
+            done = self.seen + a
+            if done % self.hop == 0:
+                self.level = self.lta / (1 - self.a_lta ** done) if done else np.inf
+            lta[:, a:b], self.lta = self._smooth(self.a_lta, np.minimum(p[:, a:b], LTA_CLIP * self.level),
+                                                 self.lta)
+            a = b
+        lta /= 1 - self.a_lta ** (self.seen + np.arange(1, n + 1))
+        lta = np.maximum(lta, np.finfo(float).tiny)
+        sta, self.sta = self._smooth(self.a_sta, p, self.sta)
+        ratio = sta / lta
+        if self.method == "cusum":
+            excess = ratio - 1.0 - CUSUM_DRIFT
+            stat = self._cusum(excess)
+            # while g climbs: the event ends when the excess does, not once g has drained
+            on = ((stat > self.threshold) & (excess > 0)).any(axis=0)
+        else:
+            stat = ratio
+            on = (stat > self.threshold).any(axis=0)
+        stat = stat.max(axis=0)
+        # no detections until the long-term level has settled
+        settle = max(0, self.warmup - self.seen)
+        stat[:settle] = 0.0
+        on[:settle] = False
+        self.seen += n
+        return stat, on
+
+# --- Event files ---
+
+class EventRecorder:
+    """
+    Writes only the triggered windows of a stream. push() takes each raw
+    block (what is saved) and the block the trigger watches (monitor passes
+    the filtered one). Each event goes to out_dir/<session>_<n>.hcap (or
+    .csv, as monitor's CAPTURE_FORMAT) and gets a row in out_dir/events.csv
+    when it closes: times in device seconds, samples written and the peak
+    statistic.
+    """
+    def __init__(self, trigger: Trigger, fs: float, channels: int = 1, pre_s: float = 2.0,
+                 post_s: float = 5.0, out_dir: str = "events", fmt: str = "hcap",
+                 k: float | None = None):
+        self.trigger = trigger
+        self.fs = fs
+        self.channels = int(channels)
+        self.fmt = fmt
+        self.k = k
+        self.out_dir = out_dir
+        self.pre = RingBuffer(max(1, int(round(pre_s * fs))), channels=self.channels + 1)  # row 0 = t_s
+        self.post_n = max(1, int(round(post_s * fs)))
+        self.written = 0    # absolute index after the last sample written
+        self.quiet = 0      # samples since the last detection in the open event
+        self.out = None     # open event's writer
+        self.event = None
+        self.count = 0
+        self.bytes = 0
+        self.session = time.strftime("%Y%m%d_%H%M%S")
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, INDEX_FILE)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.index = open(path, "a", buffering=1)
+        if new:
+            self.index.write(",".join(INDEX_COLUMNS) + "\n")
+
+    @property
+    def active(self) -> bool:
+        return self.out is not None
+
+    def push(self, t_s, mv, x=None) -> int:
+        """One block: raw samples mv (channels x n) at t_s, trigger input x (default mv). Returns events closed."""
+        t_s = np.asarray(t_s, dtype=np.float64).ravel()
+        mv = np.asarray(mv, dtype=np.float64).reshape(self.channels, -1)
+        n = t_s.size
+        if not n:
+            return 0
+        stat, on = self.trigger.process(mv if x is None else x)
+        rows = np.vstack((t_s, mv))
+        base = self.pre.total   # absolute index of rows[:, 0]
+        closed, i = 0, 0
+        while i < n:
+            if self.out is None:
+                hits = np.flatnonzero(on[i:])
+                if not hits.size:
+                    break
+                j = i + int(hits[0])
+                # pre-trigger context, never reaching back into the previous event
+                lo = max(base + j - self.pre.capacity, self.written)
+                context = rows[:, max(lo - base, 0):j]
+                if lo < base:
+                    context = np.hstack((self.pre.latest(base - lo), context))
+                self._open(context, float(t_s[j]))
+                i = j
+            # samples since the last detection, carried over from earlier blocks
+            pos = np.arange(n - i)
+            last = np.maximum.accumulate(np.where(on[i:], pos, -1 - self.quiet))
+            since = pos - last
+            done = np.flatnonzero(since >= self.post_n)
+            end = i + int(done[0]) + 1 if done.size else n
+            self._write(rows[:, i:end])
+            self.event["peak"] = max(self.event["peak"], float(stat[i:end].max()))
+            if done.size:
+                self.written = base + end
+                self._close()
+                closed += 1
+            else:
+                self.quiet = int(since[-1])
+            i = end
+        self.pre.extend(rows)
+        return closed
+
+    def _open(self, context: np.ndarray, t_trigger: float):
+        self.count += 1
+        name = f"{self.session}_{self.count:04d}.{'hcap' if self.fmt == 'hcap' else 'csv'}"
+        path = os.path.join(self.out_dir, name)
+        if self.fmt == "hcap":
+            from hallcap import CaptureWriter, ADC_MV_PER_COUNT
+            self.out = CaptureWriter(path, [f"ch{c}" for c in range(self.channels)], fs=self.fs,
+                                     scale=ADC_MV_PER_COUNT, units="mV", k=self.k, chunk_rows=4096,
+                                     extra={"trigger": self.trigger.method,
+                                            "threshold": self.trigger.threshold})
+        else:
+            self.out = open(path, "w", buffering=1 << 16)
+        self.event = {"event": self.count, "path": name, "start_s": t_trigger,
+                      "trigger_s": t_trigger, "samples": 0, "peak": 0.0}
+        self.quiet = 0
+        self._write(context)
+
+    def _write(self, rows: np.ndarray):
+        if not rows.shape[1]:
+            return
+        if self.event["samples"] == 0:
+            self.event["start_s"] = float(rows[0, 0])
+        self.event["end_s"] = float(rows[0, -1])
+        self.event["samples"] += rows.shape[1]
+        if self.fmt == "hcap":
+            from hallcap import ADC_MV_PER_COUNT
+            self.out.append(rows[1:].T / ADC_MV_PER_COUNT, np.rint(rows[0] * 1e6))
+        else:
+            np.savetxt(self.out, rows.T, fmt="%.6f" + ",%.3f" * self.channels)
+
+    def _close(self):
+        self.out.close()
+        e = self.event
+        self.bytes += os.path.getsize(os.path.join(self.out_dir, e["path"]))
+        self.index.write(f"{e['event']},{e['path']},{e['start_s']:.6f},{e['trigger_s']:.6f},"
+                         f"{e['end_s']:.6f},{e['samples']},{e['peak']:.4g}\n")
+        self.out = self.event = None
+
+    def close(self):
+        """Close the open event (cut short) and the index."""
+        if self.out is not None:
+            self._close()
+        self.index.close()
+
+def read_index(out_dir: str = "events") -> np.ndarray:
+    """The event index as a structured array (one row per event)."""
+    return np.genfromtxt(os.path.join(out_dir, INDEX_FILE), delimiter=",", names=True,
+                         dtype=None, encoding="utf-8", ndmin=1)
+
+# --- Offline scan ---
+
+def scan(path: str, out_dir: str, method: str = "rms", threshold: float | None = None,
+         band=None, pre_s: float = 2.0, post_s: float = 5.0, fs: float | None = None,
+         mains: float | None = 60.0) -> EventRecorder:
+    """
+    Run the trigger over a full capture (.hcap or monitor's t_s,mv... text),
+    block by block as monitor would, filtering with monitor's FilterBank
+    defaults first. Events are written in the capture's format.
+    """
+    from hall_filters import FilterBank
+    if path.lower().endswith(".hcap"):
+        from hallcap import Capture
+        cap = Capture(path)
+        fs = fs or cap.fs
+        channels, n, fmt, k = len(cap.columns), len(cap), "hcap", cap.meta.get("k")
+        blocks = ((t * 1e-6, d.T) for t, d in
+                  (cap.read_rows(i, i + SCAN_BLOCK) for i in range(0, n, SCAN_BLOCK)))
+    else:
+        data = np.loadtxt(path, delimiter=",", ndmin=2)
+        channels, n, fmt, k = data.shape[1] - 1, data.shape[0], "csv", None
+        fs = fs or 1.0 / np.median(np.diff(data[:, 0]))
+        blocks = ((data[i:i + SCAN_BLOCK, 0], data[i:i + SCAN_BLOCK, 1:].T)
+                  for i in range(0, n, SCAN_BLOCK))
+    filters = FilterBank(fs, channels, mains=mains)
+    trigger = Trigger(fs, channels, method, threshold, band)
+    rec = EventRecorder(trigger, fs, channels, pre_s, post_s, out_dir, fmt, k)
+    for t_s, mv in blocks:
+        rec.push(t_s, mv, filters.process(mv))
+    rec.close()
+    return rec
+
+# --- Self-check ---
+
+def check(fs: float = 750.0, seconds: float = 180.0, burst_s: float = 60.0, seed: int = 0) -> bool:
+    """
+    Regression check on synthetic noise with one 2 s burst at burst_s: every
+    method must record exactly one event, triggered at the burst, whether
+    the stream arrives whole or in odd-sized blocks.
+    """
+    import tempfile
+    rng = np.random.default_rng(seed)
+    x = rng.normal(0.0, 1.0, (1, int(seconds * fs)))
+    x[:, int(burst_s * fs):int((burst_s + 2.0) * fs)] *= 6.0
+    t = np.arange(x.shape[1]) / fs
+    ok = True
+    for method in METHODS:
+        band = (10.0, 30.0) if method == "band" else None
+        for block in (x.shape[1], 1001):
+            with tempfile.TemporaryDirectory() as out:
+                rec = EventRecorder(Trigger(fs, 1, method, band=band), fs, 1, out_dir=out, fmt="csv")
+                for i in range(0, x.shape[1], block):
+                    rec.push(t[i:i + block], x[:, i:i + block])
+                rec.close()
+                events = read_index(out) if rec.count else []
+            good = len(events) == 1 and abs(events[0]["trigger_s"] - burst_s) < 1.0
+            print(f"{method:6s} block {block:6d}: {len(events)} event(s) "
+                  + " ".join(f"{e['trigger_s']:.1f}-{e['end_s']:.1f} s" for e in events)
+                  + ("" if good else "  FAIL"))
+            ok &= good
+    return ok
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Extract triggered events from a capture")
+    ap.add_argument("capture", nargs="?", help=".hcap capture or monitor's SAVE_FILE text")
+    ap.add_argument("--out", default="events", help="directory for event files and the index")
+    ap.add_argument("--method", choices=METHODS, default="rms")
+    ap.add_argument("--threshold", type=float, help="detector level (default per method: "
+                    + ", ".join(f"{m} {v:g}" for m, v in DEFAULT_THRESHOLD.items()) + ")")
+    ap.add_argument("--band", type=float, nargs=2, metavar=("LO", "HI"), help="Hz, for --method band")
+    ap.add_argument("--pre", type=float, default=2.0, help="seconds of context before a trigger")
+    ap.add_argument("--post", type=float, default=5.0, help="seconds after the last detection")
+    ap.add_argument("--fs", type=float, help="sample rate (default from the capture)")
+    ap.add_argument("--mains", type=float, default=60.0, help="mains notch, 0 to disable")
+    ap.add_argument("--check", action="store_true",
+                    help="run the synthetic regression check (one burst -> one event per method)")
+    args = ap.parse_args(argv)
+    if args.check:
+        return 0 if check() else 1
+    if args.capture is None:
+        ap.error("a capture is required (or --check)")
+
+    t0 = time.perf_counter()
+    rec = scan(args.capture, args.out, args.method, args.threshold, args.band,
+               args.pre, args.post, args.fs, args.mains or None)
+    size = os.path.getsize(args.capture)
+    print(f"{rec.count} events in {time.perf_counter() - t0:.1f} s -> {args.out}/ "
+          f"({rec.bytes / 1024:.0f} KiB of {size / 1024:.0f} KiB, {rec.bytes / max(size, 1):.1%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,422 @@
+"""
+hallcap.py
+Append-only, chunked binary capture format (.hcap) for Hall array data and
+PSD products, with memory-mapped reads.
+
+Layout (little endian):
+
+    file header   b"HCAP", u16 version, u16 reserved, u32 meta_len,
+                  JSON metadata (space padded to 8 bytes)
+    chunk         b"CHNK", u32 n_rows, i64 t0_us, i64 t1_us,
+                  [n_rows x i64 t_us]            if meta["timestamps"]
+                  n_rows x n_columns samples     row major, meta["dtype"]
+
+Captures store raw ADC counts (int16) with `scale`/`offset` to physical
+units, the sensor sensitivity `k` (mV/mT) and `fs`. PSD products use
+kind "psd", float64 columns and no timestamps; multi-resolution products
+(kind "psd_multi") stack one frequency/PSD block per Welch segment length,
+with meta["resolutions"] giving each block's rows.
+
+Usage:
+    python hallcap.py convert <file.csv|.xlsx|.wav>... [-o out.hcap] [--k 30]
+    python hallcap.py info <file.hcap>
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+MAGIC = b"HCAP"
+CHUNK_MAGIC = b"CHNK"
+VERSION = 1
+FILE_HEADER = np.dtype([("magic", "S4"), ("version", "<u2"), ("reserved", "<u2"), ("meta_len", "<u4")])
+CHUNK_HEADER = np.dtype([("magic", "S4"), ("n_rows", "<u4"), ("t0_us", "<i8"), ("t1_us", "<i8")])
+ADC_MV_PER_COUNT = 3300.0 / 4095.0
+
+# --- Writer ---
+
+class CaptureWriter:
+    """
+    Append rows to a .hcap file, one chunk per `chunk_rows` rows.
+    If the file already exists its metadata is reused and new chunks are
+    appended after the last complete one; ValueError if its columns,
+    dtype, timestamps, fs or k differ from the ones asked for (fs / k of
+    None match anything).
+    """
+    def __init__(self, path: str, columns, fs: float | None = None, dtype: str = "int16",
+                 scale=1.0, offset=0.0, units: str = "", k: float | None = None,
+                 kind: str = "capture", timestamps: bool = True,
+                 chunk_rows: int = 65536, extra: dict | None = None):
+        self.path = path
+        self.chunk_rows = int(chunk_rows)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            cap = Capture(path)
+            self.meta = cap.meta
+            asked = {"columns": list(columns), "dtype": np.dtype(dtype).str,
+                     "timestamps": bool(timestamps), "fs": fs, "k": k}
+            differ = [f"{name} {self.meta.get(name)!r} (asked {value!r})" for name, value in asked.items()
+                      if value is not None and self.meta.get(name) != value]
+            if differ:
+                cap.close()
+                raise ValueError(f"{path} exists with different " + ", ".join(differ)
+                                 + "; move it or write to a new file")
+            end = cap.end_offset
+            self.rows_written = cap.n_rows
+            cap.close()
+            self.fh = open(path, "r+b")
+            self.fh.truncate(end)   # drop a torn chunk left by a crash
+            self.fh.seek(end)
+        else:
+            self.rows_written = 0
+            self.meta = {
+                "kind": kind,
+                "columns": list(columns),
+                "dtype": np.dtype(dtype).str,
+                "scale": scale,
+                "offset": offset,
+                "units": units,
+                "fs": fs,
+                "k": k,
+                "timestamps": bool(timestamps),
+                **(extra or {}),
+            }
+            self.fh = open(path, "wb")
+            self.fh.write(_pack_header(self.meta))
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.n_columns = len(self.meta["columns"])
+        self._data = []
+        self._t = []
+        self._rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, data, t_us=None):
+        """Buffer rows; data is (n, n_columns), t_us is (n,) when timestamps are stored."""
+        data = np.asarray(data).reshape(-1, self.n_columns)
+        if np.issubdtype(self.dtype, np.integer) and not np.issubdtype(data.dtype, np.integer):
+            info = np.iinfo(self.dtype)
+            data = np.clip(np.rint(data), info.min, info.max)
+        self._data.append(data.astype(self.dtype, copy=False))
+        if self.meta["timestamps"]:
+            if t_us is None:
+                raise ValueError("this capture stores timestamps; pass t_us")
+            self._t.append(np.asarray(t_us, dtype=np.int64).ravel())
+        self._rows += data.shape[0]
+        while self._rows >= self.chunk_rows:
+            self._write_chunk(self.chunk_rows)
+
+    def flush(self):
+        """Write buffered rows as a (possibly short) chunk."""
+        if self._rows:
+            self._write_chunk(self._rows)
+        self.fh.flush()
+
+    def close(self):
+        if not self.fh.closed:
+            self.flush()
+            self.fh.close()
+
+    def _write_chunk(self, n: int):
+        data = np.concatenate(self._data) if len(self._data) > 1 else self._data[0]
+        self._data = [data[n:]] if data.shape[0] > n else []
+        data = data[:n]
+        if self.meta["timestamps"]:
+            t = np.concatenate(self._t) if len(self._t) > 1 else self._t[0]
+            self._t = [t[n:]] if t.size > n else []
+            t = t[:n]
+            t0, t1 = int(t[0]), int(t[-1])
+        else:
+            t = None
+            t0 = int(round(self.rows_written * 1e6 / self.meta["fs"])) if self.meta["fs"] else self.rows_written
+            t1 = t0 + (int(round((n - 1) * 1e6 / self.meta["fs"])) if self.meta["fs"] else n - 1)
+        self._rows -= n
+
+        hdr = np.zeros(1, dtype=CHUNK_HEADER)
+        hdr["magic"], hdr["n_rows"], hdr["t0_us"], hdr["t1_us"] = CHUNK_MAGIC, n, t0, t1
+        self.fh.write(hdr.tobytes())
+        if t is not None:
+            self.fh.write(t.astype("<i8").tobytes())
+        self.fh.write(np.ascontiguousarray(data, dtype=self.dtype.newbyteorder("<")).tobytes())
+        self.rows_written += n
+
+def _pack_header(meta: dict) -> bytes:
+    body = json.dumps(meta).encode("utf-8")
+    body += b" " * (-(FILE_HEADER.itemsize + len(body)) % 8)
+    hdr = np.zeros(1, dtype=FILE_HEADER)
+    hdr["magic"], hdr["version"], hdr["meta_len"] = MAGIC, VERSION, len(body)
+    return hdr.tobytes() + body
+
+# --- Reader ---
+
+class Capture:
+    """
+    Memory-mapped reader. The chunk index (offset, rows, t0/t1) is built by
+    hopping over chunk headers, so opening costs O(chunks), and read()
+    touches only the chunks that overlap the requested range.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.mm = np.memmap(path, dtype=np.uint8, mode="r")
+        hdr = self.mm[:FILE_HEADER.itemsize].view(FILE_HEADER)[0]
+        if hdr["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a .hcap file")
+        start = FILE_HEADER.itemsize
+        self.meta = json.loads(bytes(self.mm[start:start + int(hdr["meta_len"])]))
+        self.columns = self.meta["columns"]
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.fs = self.meta.get("fs")
+        self._build_index(start + int(hdr["meta_len"]))
+
+    def _build_index(self, off: int):
+        row_bytes = len(self.columns) * self.dtype.itemsize + (8 if self.meta["timestamps"] else 0)
+        entries = []
+        size = self.mm.size
+        row0 = 0
+        while off + CHUNK_HEADER.itemsize <= size:
+            ch = self.mm[off:off + CHUNK_HEADER.itemsize].view(CHUNK_HEADER)[0]
+            n = int(ch["n_rows"])
+            end = off + CHUNK_HEADER.itemsize + n * row_bytes
+            if ch["magic"] != CHUNK_MAGIC or end > size:
+                break   # torn tail from an interrupted write
+            entries.append((off + CHUNK_HEADER.itemsize, n, row0, int(ch["t0_us"]), int(ch["t1_us"])))
+            row0 += n
+            off = end
+        self.end_offset = off
+        self.index = np.array(entries, dtype=[("offset", "i8"), ("n_rows", "i8"), ("row0", "i8"),
+                                              ("t0_us", "i8"), ("t1_us", "i8")])
+        self.n_rows = row0
+
+    def close(self):
+        self.mm = None
+
+    def __len__(self):
+        return self.n_rows
+
+    def _chunk(self, i: int):
+        """Zero-copy (t_us or None, data) views of chunk i."""
+        off, n = int(self.index["offset"][i]), int(self.index["n_rows"][i])
+        t = None
+        if self.meta["timestamps"]:
+            t = np.ndarray((n,), dtype="<i8", buffer=self.mm, offset=off)
+            off += 8 * n
+        data = np.ndarray((n, len(self.columns)), dtype=self.dtype.newbyteorder("<"),
+                          buffer=self.mm, offset=off)
+        return t, data
+
+    def _chunk_times(self, i: int, t):
+        if t is not None:
+            return t
+        n = int(self.index["n_rows"][i])
+        t0 = int(self.index["t0_us"][i])
+        step = 1e6 / self.fs if self.fs else 1.0
+        return t0 + np.rint(np.arange(n) * step).astype(np.int64)
+
+    def _columns(self, columns):
+        if columns is None:
+            return slice(None)
+        return [self.columns.index(c) if isinstance(c, str) else int(c) for c in columns]
+
+    def scale_data(self, data: np.ndarray, cols=slice(None)) -> np.ndarray:
+        scale = np.asarray(self.meta.get("scale", 1.0), dtype=np.float64)
+        offset = np.asarray(self.meta.get("offset", 0.0), dtype=np.float64)
+        if scale.ndim:
+            scale = scale[cols]
+        if offset.ndim:
+            offset = offset[cols]
+        return data.astype(np.float64) * scale + offset
+
+    def read_rows(self, start: int = 0, stop: int | None = None, columns=None, scaled: bool = True):
+        """Rows [start, stop) as (t_us, data)."""
+        stop = self.n_rows if stop is None else min(int(stop), self.n_rows)
+        start = max(0, int(start))
+        cols = self._columns(columns)
+        if stop <= start:
+            return np.empty(0, np.int64), np.empty((0, len(self.columns) if columns is None else len(cols)))
+        row0 = self.index["row0"]
+        first = int(np.searchsorted(row0, start, side="right")) - 1
+        last = int(np.searchsorted(row0, stop, side="left"))
+        ts, ds = [], []
+        for i in range(first, last):
+            t, d = self._chunk(i)
+            a = max(start - int(row0[i]), 0)
+            b = min(stop - int(row0[i]), d.shape[0])
+            ts.append(self._chunk_times(i, t)[a:b])
+            ds.append(d[a:b, cols])
+        t = np.concatenate(ts)
+        d = np.concatenate(ds)
+        return t, (self.scale_data(d, cols) if scaled else d)
+
+    def read(self, t_start: float | None = None, t_stop: float | None = None,
+             columns=None, scaled: bool = True):
+        """
+        Samples with t_start <= t < t_stop (seconds, capture clock) as
+        (t_s, data). Only the overlapping chunks are mapped.
+        """
+        if not self.n_rows:
+            return self.read_rows(0, 0, columns, scaled)
+        lo = -np.inf if t_start is None else t_start * 1e6
+        hi = np.inf if t_stop is None else t_stop * 1e6
+        hit = np.flatnonzero((self.index["t1_us"] >= lo) & (self.index["t0_us"] < hi))
+        if not hit.size:
+            t, d = self.read_rows(0, 0, columns, scaled)
+            return t * 1e-6, d
+        start = int(self.index["row0"][hit[0]])
+        stop = int(self.index["row0"][hit[-1]] + self.index["n_rows"][hit[-1]])
+        t, d = self.read_rows(start, stop, columns, scaled)
+        keep = (t >= lo) & (t < hi)
+        return t[keep] * 1e-6, d[keep]
+
+    def column(self, name, scaled: bool = True) -> np.ndarray:
+        return self.read_rows(columns=[name], scaled=scaled)[1][:, 0]
+
+# --- PSD products ---
+
+def write_psd(path: str, f, Pxx, columns=None, **meta):
+    """Write a PSD product: frequency plus one or more PSD columns."""
+    P = np.atleast_2d(np.asarray(Pxx, dtype=np.float64))
+    if P.shape[0] != np.size(f):
+        P = P.T
+    columns = list(columns) if columns else ["PSD [1/Hz]"] if P.shape[1] == 1 else \
+        [f"PSD ch{i} [1/Hz]" for i in range(P.shape[1])]
+    if os.path.exists(path):
+        os.remove(path)
+    with CaptureWriter(path, ["Frequency [Hz]"] + columns, dtype="float64", kind="psd",
+                       timestamps=False, chunk_rows=max(1, np.size(f)), extra=meta) as w:
+        w.append(np.column_stack([np.asarray(f, dtype=np.float64), P]))
+
+def read_psd(path: str, column: int | str = 1):
+    """Frequency and one PSD column of a PSD product (the first resolution of a multi-resolution one)."""
+    cap = Capture(path)
+    start, stop = next(iter(cap.meta.get("resolutions", {}).values()), (0, None))
+    t, d = cap.read_rows(start, stop, columns=[0, column])
+    return d[:, 0], d[:, 1]
+
+def write_psd_multi(path: str, products: dict, **meta):
+    """
+    Write PSDs on different frequency grids (e.g. one per Welch segment
+    length) as one product: {label: (f, Pxx)}, rows of each stored
+    contiguously and located by meta["resolutions"] = {label: [start, stop]}.
+    """
+    resolutions, row = {}, 0
+    for label, (f, _) in products.items():
+        resolutions[str(label)] = [row, row + int(np.size(f))]
+        row += int(np.size(f))
+    if os.path.exists(path):
+        os.remove(path)
+    with CaptureWriter(path, ["Frequency [Hz]", "PSD [1/Hz]"], dtype="float64", kind="psd_multi",
+                       timestamps=False, chunk_rows=max(1, row),
+                       extra={**meta, "resolutions": resolutions}) as w:
+        for f, Pxx in products.values():
+            w.append(np.column_stack([np.asarray(f, dtype=np.float64),
+                                      np.asarray(Pxx, dtype=np.float64)]))
+
+def read_psd_multi(path: str) -> dict:
+    """{label: (f, Pxx)} of a multi-resolution product; {"": (f, Pxx)} for a plain PSD product."""
+    cap = Capture(path)
+    resolutions = cap.meta.get("resolutions")
+    if not resolutions:
+        return {"": read_psd(path)}
+    out = {}
+    for label, (start, stop) in resolutions.items():
+        d = cap.read_rows(start, stop, columns=[0, 1])[1]
+        out[label] = (d[:, 0], d[:, 1])
+    return out
+
+# --- Converters ---
+
+def is_psd_columns(columns) -> bool:
+    lower = [str(c).lower() for c in columns]
+    return any("freq" in c for c in lower) and any(("psd" in c or "/hz" in c) for c in lower[1:])
+
+def convert(src: str, dst: str | None = None, k: float | None = 30.0, chunk_rows: int = 65536) -> str:
+    """Convert a monitor CSV, an XLSX (PSD product or time series) or a WAV to .hcap."""
+    dst = dst or os.path.splitext(src)[0] + ".hcap"
+    ext = os.path.splitext(src)[1].lower()
+    if os.path.exists(dst):
+        os.remove(dst)
+
+    if ext == ".wav":
+        from scipy.io import wavfile
+        fs, data = wavfile.read(src, mmap=True)
+        data = data.reshape(len(data), -1)
+        cols = [f"ch{i}" for i in range(data.shape[1])]
+        if data.dtype == np.int16:
+            dtype, scale, offset = "int16", 1 / 32768.0, 0.0
+        elif data.dtype == np.uint8:
+            dtype, scale, offset = "int16", 1 / 128.0, -1.0
+        else:
+            dtype, scale, offset = "float32", 1.0, 0.0
+        with CaptureWriter(dst, cols, fs=float(fs), dtype=dtype, scale=scale, offset=offset,
+                           units="normalized", timestamps=False, chunk_rows=chunk_rows,
+                           extra={"source": os.path.basename(src)}) as w:
+            for i in range(0, data.shape[0], chunk_rows):
+                block = np.asarray(data[i:i + chunk_rows])
+                if block.dtype == np.int32:
+                    block = block.astype(np.float32) / 2147483648.0
+                w.append(block)
+        return dst
+
+    if ext in (".xlsx", ".xls"):
+        import pandas as pd
+        df = pd.read_excel(src).dropna(axis=1, how="all")
+        if is_psd_columns(df.columns):
+            write_psd(dst, df.iloc[:, 0].to_numpy(float), df.iloc[:, 1:].to_numpy(float),
+                      columns=[str(c) for c in df.columns[1:]], source=os.path.basename(src))
+            return dst
+        t = df.iloc[:, 0].to_numpy(float)
+        values = df.iloc[:, 1:].to_numpy(np.float32)
+        cols = [str(c) for c in df.columns[1:]]
+        fs = float(1 / np.mean(np.diff(t))) if t.size > 1 else None
+        with CaptureWriter(dst, cols, fs=fs, dtype="float32", timestamps=True,
+                           chunk_rows=chunk_rows, extra={"source": os.path.basename(src)}) as w:
+            w.append(values, np.rint(t * 1e6))
+        return dst
+
+    # monitor.py CSV: t_s,mV[,mV...] (or a PSD CSV with a header)
+    with open(src) as fh:
+        first = fh.readline()
+    has_header = any(ch.isalpha() for ch in first)
+    if has_header and is_psd_columns(first.strip().split(",")):
+        d = np.loadtxt(src, delimiter=",", skiprows=1, ndmin=2)
+        write_psd(dst, d[:, 0], d[:, 1:], columns=first.strip().split(",")[1:],
+                  source=os.path.basename(src))
+        return dst
+    d = np.loadtxt(src, delimiter=",", skiprows=int(has_header), ndmin=2)
+    t_us = np.rint(d[:, 0] * 1e6)
+    fs = float(1 / np.median(np.diff(d[:, 0]))) if d.shape[0] > 1 else None
+    cols = [f"ch{i}" for i in range(d.shape[1] - 1)]
+    with CaptureWriter(dst, cols, fs=fs, dtype="int16", scale=ADC_MV_PER_COUNT, units="mV", k=k,
+                       timestamps=True, chunk_rows=chunk_rows,
+                       extra={"source": os.path.basename(src)}) as w:
+        w.append(d[:, 1:] / ADC_MV_PER_COUNT, t_us)
+    return dst
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Hall capture (.hcap) tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("convert", help="convert CSV/XLSX/WAV files to .hcap")
+    c.add_argument("src", nargs="+")
+    c.add_argument("-o", "--out", help="output path (single input only)")
+    c.add_argument("--k", type=float, default=30.0, help="sensor sensitivity, mV per mT")
+    i = sub.add_parser("info", help="print metadata and chunk index")
+    i.add_argument("path")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "convert":
+        for src in args.src:
+            dst = convert(src, args.out if len(args.src) == 1 else None, k=args.k)
+            print(f"{src} -> {dst} ({os.path.getsize(src)} -> {os.path.getsize(dst)} bytes)")
+    else:
+        cap = Capture(args.path)
+        print(json.dumps(cap.meta, indent=2))
+        print(f"{cap.n_rows} rows in {len(cap.index)} chunks")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
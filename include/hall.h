@@ -13,4 +13,13 @@ typedef struct {
 } sma_t;
 
 void sma_init(sma_t *f);
-uint16_t sma_push(sma_t *f, uint16_t in);
\ No newline at end of file
+uint16_t sma_push(sma_t *f, uint16_t in);
+
+// Binary frame stream, decoded by hall_protocol.py on the host
+#define HALL_FRAME_SYNC 0x5AA5
+#define HALL_FRAME_HEADER 8     // sync + seq + t_us
+#define HALL_FRAME_SIZE(n) (HALL_FRAME_HEADER + 2 * (n) + 2)
+
+uint16_t crc16_ccitt(const uint8_t *data, size_t len);
+size_t hall_frame_pack(uint8_t *out, uint16_t seq, uint32_t t_us,
+                       const int16_t *samples, size_t n);
\ No newline at end of file
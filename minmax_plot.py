@@ -0,0 +1,213 @@
+"""
+minmax_plot.py
+Min/max decimated rendering for long time series.
+
+Each pixel column of the axes is reduced to the min and max of the samples
+that fall in it, so a line never carries more than ~2 points per pixel and
+still shows every spike. MinMaxLine re-decimates from the full-resolution
+data (an array or a memory-mapped view) whenever the x limits change, so
+zooming in reveals real detail down to individual samples.
+"""
+
+import numpy as np
+
+PYRAMID_FACTOR = 64     # samples per bin between pyramid levels
+READ_CHUNK = 1 << 22    # samples per read when building the first level
+
+# --- Decimation ---
+
+def _reduce(y: np.ndarray, bin_size: int):
+    """Min and max of consecutive bins along the last axis (last bin may be short)."""
+    n = y.shape[-1]
+    full = n // bin_size * bin_size
+    shape = y.shape[:-1] + (-1, bin_size)
+    lo = y[..., :full].reshape(shape).min(axis=-1)
+    hi = y[..., :full].reshape(shape).max(axis=-1)
+    if full < n:
+        lo = np.concatenate((lo, y[..., full:].min(axis=-1, keepdims=True)), axis=-1)
+        hi = np.concatenate((hi, y[..., full:].max(axis=-1, keepdims=True)), axis=-1)
+    return lo, hi
+
+def _interleave(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    out = np.empty(lo.shape[:-1] + (2 * lo.shape[-1],), dtype=np.result_type(lo, hi))
+    out[..., 0::2] = lo
+    out[..., 1::2] = hi
+    return out
+
+def minmax_decimate(y: np.ndarray, n_bins: int):
+    """
+    Reduce y (..., n) to at most n_bins min/max pairs along the last axis.
+    Returns (idx, yd): sample positions of each point and the interleaved
+    min/max values. Short inputs are returned unchanged.
+    """
+    y = np.asarray(y)
+    n = y.shape[-1]
+    n_bins = max(1, int(n_bins))
+    if n <= 2 * n_bins:
+        return np.arange(n, dtype=np.float64), y
+    bin_size = -(-n // n_bins)
+    lo, hi = _reduce(y, bin_size)
+    starts = np.arange(lo.shape[-1], dtype=np.float64) * bin_size
+    idx = np.repeat(starts, 2)
+    idx[1::2] += bin_size / 2
+    return idx, _interleave(lo, hi)
+
+# --- Interactive line ---
+
+class MinMaxLine:
+    """
+    A Line2D that always shows the min/max envelope of the visible range.
+
+    y is any 1-D array-like supporting slicing (np.memmap views included);
+    x positions come from `x` (monotonic array) or from t0 + i / fs. Values
+    are drawn as y * scale + offset, applied after the reduction, so raw
+    integer samples never need a full float copy. Coarse views use a
+    min/max pyramid built once from the data in READ_CHUNK reads.
+    """
+    def __init__(self, ax, y, x=None, fs: float | None = None, t0: float = 0.0,
+                 scale: float = 1.0, offset: float = 0.0, **line_kwargs):
+        self.ax = ax
+        self.y = y
+        self.x = None if x is None else np.asarray(x)
+        self.fs = fs
+        self.t0 = t0
+        self.scale = scale
+        self.offset = offset
+        self.n = len(y)
+        self.pyramid = None
+        self.line, = ax.plot([], [], **line_kwargs)
+        self._last = None
+
+        x0, x1 = self.pos(0), self.pos(self.n - 1)
+        ax.set_xlim(x0, x1 if x1 > x0 else x0 + 1)
+        lo, hi = self.value_range()
+        if np.isfinite(lo) and np.isfinite(hi):
+            pad = 0.02 * (hi - lo) or 1.0
+            ax.set_ylim(lo - pad, hi + pad)
+        self.refresh()
+        ax.callbacks.connect("xlim_changed", lambda _ax: self.refresh())
+        ax.figure.canvas.mpl_connect("resize_event", lambda _ev: self.refresh())
+
+    # index <-> position
+    def pos(self, i):
+        if self.x is not None:
+            return self.x[np.clip(np.asarray(i, dtype=np.int64), 0, self.n - 1)]
+        return self.t0 + np.asarray(i, dtype=np.float64) / (self.fs or 1.0)
+
+    def index(self, p: float) -> int:
+        if self.x is not None:
+            return int(np.searchsorted(self.x, p))
+        return int(np.floor((p - self.t0) * (self.fs or 1.0)))
+
+    def _build_pyramid(self):
+        levels = []
+        lo_parts, hi_parts = [], []
+        step = READ_CHUNK // PYRAMID_FACTOR * PYRAMID_FACTOR
+        for i in range(0, self.n, step):
+            lo, hi = _reduce(np.asarray(self.y[i:i + step]), PYRAMID_FACTOR)
+            lo_parts.append(lo)
+            hi_parts.append(hi)
+        lo, hi = np.concatenate(lo_parts), np.concatenate(hi_parts)
+        factor = PYRAMID_FACTOR
+        levels.append((factor, lo, hi))
+        while lo.size > 4096:
+            lo = _reduce(lo, PYRAMID_FACTOR)[0]
+            hi = _reduce(hi, PYRAMID_FACTOR)[1]
+            factor *= PYRAMID_FACTOR
+            levels.append((factor, lo, hi))
+        self.pyramid = levels
+
+    def value_range(self):
+        if not self.n:
+            return np.nan, np.nan
+        if self.n <= READ_CHUNK:
+            y = np.asarray(self.y)
+            lo, hi = float(y.min()), float(y.max())
+        else:
+            if self.pyramid is None:
+                self._build_pyramid()
+            _, lo_a, hi_a = self.pyramid[-1]
+            lo, hi = float(lo_a.min()), float(hi_a.max())
+        lo, hi = lo * self.scale + self.offset, hi * self.scale + self.offset
+        return min(lo, hi), max(lo, hi)
+
+    def refresh(self):
+        """Re-decimate the visible range to the current axes width."""
+        if not self.n:
+            return
+        x0, x1 = self.ax.get_xlim()
+        i0 = max(0, self.index(x0) - 1)
+        i1 = min(self.n, self.index(x1) + 2)
+        width = max(1, int(self.ax.bbox.width))
+        key = (i0, i1, width)
+        if key == self._last or i1 <= i0:
+            return
+        self._last = key
+
+        n = i1 - i0
+        bin_size = -(-n // width)
+        if bin_size <= 2:
+            idx = np.arange(i0, i1)
+            yd = np.asarray(self.y[i0:i1], dtype=np.float64)
+        else:
+            level = None
+            if bin_size >= PYRAMID_FACTOR:
+                if self.pyramid is None:
+                    self._build_pyramid()
+                level = max((lv for lv in self.pyramid if lv[0] <= bin_size), key=lambda lv: lv[0])
+            if level is None:
+                lo, hi = _reduce(np.asarray(self.y[i0:i1]), bin_size)
+                factor, j0 = 1, i0
+            else:
+                factor, lo_a, hi_a = level
+                j0, j1 = i0 // factor, -(-i1 // factor)
+                per_bin = max(1, bin_size // factor)
+                lo = _reduce(lo_a[j0:j1], per_bin)[0]
+                hi = _reduce(hi_a[j0:j1], per_bin)[1]
+                bin_size = per_bin * factor
+                j0 *= factor
+            starts = j0 + np.arange(lo.size) * bin_size
+            idx = np.repeat(starts, 2).astype(np.float64)
+            idx[1::2] += bin_size / 2
+            yd = _interleave(lo, hi).astype(np.float64)
+
+        self.line.set_data(self.pos(idx), yd * self.scale + self.offset)
+
+# --- Limits for blitted animations ---
+
+def _new_limits(cur_lo: float, cur_hi: float, lo: float, hi: float, slack: float, shrink: float,
+                log: bool = False):
+    """update_limits' rule: None while (lo, hi) fits the current span, else the padded new limits."""
+    fwd = (lambda v: np.log10(max(v, np.finfo(float).tiny))) if log else float
+    span, cur_span = fwd(hi) - fwd(lo), fwd(cur_hi) - fwd(cur_lo)
+    if lo >= cur_lo and hi <= cur_hi and cur_span > 0 and span >= shrink * cur_span:
+        return None
+    if slack:
+        pad = slack * span if span > 0 else 1e-12
+        new = (fwd(lo) - pad, fwd(hi) + pad)
+        lo, hi = (10**new[0], 10**new[1]) if log else new
+    return lo, hi
+
+def update_limits(ax, lo: float, hi: float, axis: str = "y", slack: float = 0.1,
+                  shrink: float = 0.5) -> bool:
+    """
+    Move axis limits only when the data leaves them or fills less than
+    `shrink` of the span, padding by `slack`. Returns True when the limits
+    changed, i.e. when a blitted figure needs a full redraw.
+    """
+    get = ax.get_ylim if axis == "y" else ax.get_xlim
+    set_ = ax.set_ylim if axis == "y" else ax.set_xlim
+    log = (ax.get_yscale() if axis == "y" else ax.get_xscale()) == "log"
+    new = _new_limits(*get(), lo, hi, slack, shrink, log)
+    if new is None:
+        return False
+    set_(*new)
+    return True
+
+def update_clim(img, lo: float, hi: float, slack: float = 0.1, shrink: float = 0.5) -> bool:
+    """update_limits for an image's colour scale; True when a colorbar needs a full redraw."""
+    new = _new_limits(*img.get_clim(), lo, hi, slack, shrink)
+    if new is None:
+        return False
+    img.set_clim(*new)
+    return True
@@ -3,116 +3,326 @@ import serial
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import time
-import re
-
-# ==== Serial Filters ====
-csv_re     = re.compile(r'^\s*(\d+)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')  # t_us,value
-labeled_re = re.compile(r'Voltage:\s*(-?\d+(?:\.\d+)?)')
-plain_re   = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*$')
+from spectral import StreamingWelch, StreamingCSD, StreamingSTFT, nonuniform_welch, resample_uniform, timing_report
+from hall_filters import FilterBank
+from hall_protocol import FrameDecoder, RingBuffer, counts_to_mv, parse_block, split_lines
+from hallcap import CaptureWriter, ADC_MV_PER_COUNT
+from minmax_plot import minmax_decimate, update_limits
 
 # ==== Config ====
 PORT = "/dev/tty.usbmodem14101"     # Change to serial port
 BAUD = 115200                       # Change to baud rate
+PORTS = None        # list of ports to read several boards at once (hall_acquire, clock-aligned); overrides PORT
+BOARD_CHANNELS = 1  # with PORTS, channels per board (N_CHANNELS becomes the total)
+SHARED_RING = False # acquire and record in separate processes through a shared-memory ring (hall_shm); the plot reads it
+RING_SECONDS = 60.0 # with SHARED_RING, samples the ring holds for slow readers
 SAVE_FILE = "hall_data.csv"
+CAPTURE_FILE = "hall_data.hcap"
+CAPTURE_FORMAT = "hcap"     # "hcap" = chunked binary counts (hallcap.py), "csv" = SAVE_FILE text
 PSD_FILE = "hall_psd.csv"
+TRIGGER = None      # None saves every sample; "rms", "band" or "cusum" saves only triggered events (hall_trigger.py)
+TRIGGER_THRESHOLD = None    # detector level, None for the method's default
+TRIGGER_BAND = (10.0, 30.0) # Hz, band watched by the "band" trigger
+PRE_TRIGGER_S = 2.0     # seconds of context saved before a trigger
+POST_TRIGGER_S = 5.0    # an event closes this long after its last detection
+EVENT_DIR = "events"    # one capture per event (CAPTURE_FORMAT) plus events.csv
 k = 30      # sensitivity mV per mT, 30 for A2 @3.3v, 60 for A1 @3.3v
 N = 10240     # buffer size for PSD
 fs = 750.0   # sampling frequency in Hz
+NPERSEG = 256    # Welch segment length
+STREAM_WELCH = True # incremental Welch over the last N samples instead of recomputing per frame
+PSD_TIMING = "nominal"  # "nominal" = samples at fs, "lombscargle" = device timestamps (fast Lomb-Scargle), "resample" = device timestamps interpolated to a uniform grid
+JITTER_REPORT = True    # measured rate, timestamp jitter and drops in the PSD title (shown on full redraws)
+BULK_INGEST = True  # read every pending byte per frame and parse the block at once
+SAVE_BUFFER = 1 << 16   # bytes buffered by the persistent SAVE_FILE handle
+N_CHANNELS = 1      # >1 for the array: "t_us,v0,...,vN-1" lines or binary frames
+BINARY_FRAMES = False   # decode hall_protocol frames instead of ASCII lines
+COH_BAND = (1.0, 100.0) # Hz, band the coherence matrix is averaged over
+BLIT = True         # redraw only the lines each frame; full redraws only when limits move
+SPECTROGRAM = False # rolling spectrogram of channel 0 below the PSD
+SPEC_SECONDS = 60.0 # time span of the rolling spectrogram
+FILTER = True       # live filter stage (hall_filters.py) before buffering and PSD
+MAINS_HZ = 60.0     # mains notch frequency, None to disable
+NOTCH_HARMONICS = 3 # notch mains x 1..NOTCH_HARMONICS (below Nyquist)
+NOTCH_Q = 30.0
+HIGHPASS_HZ = 0.5   # Butterworth high-pass corner, None to disable
+SMA_N = 0           # >0 applies the firmware moving average (sma_push, N=4 on the device)
+PLOT_RAW = False    # draw the unfiltered stream behind the filtered one
+FRAME_INTERVAL_MS = 100 # animation timer; each frame drains the port once
+CONNECT_DELAY = 2.0 # seconds to wait after opening the port
+METRICS = False     # per-stage timings and stream health for every frame (FrameMetrics)
+METRICS_OVERLAY = False # with METRICS, rolling means on the time series plot (text costs a few ms per frame)
+METRICS_FILE = "monitor_metrics.csv"    # with METRICS, one row per frame (None to skip)
+METRICS_WINDOW = 50 # frames in the rolling means
 
-# ==== INIT ====
-ser = serial.Serial(PORT, BAUD)
-time.sleep(2) # Wait for connection
-
-values = []
-timestamps = []
-
-# ==== PLOT ====
-fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(8,6))
-line_ts, = ax1.plot([], [], lw=.25)
-line_psd, = ax2.plot([], [], lw=1)
-
-ax1.set_xlabel("Sample")
-ax1.set_ylabel("Voltage (mV)")
-ax1.set_title("Hall Sensor Time Series")
-
-ax2.set_title("Hall Sensor PSD")
-ax2.set_xlabel("Frequency (Hz)")
-ax2.set_ylabel("PSD (T^2/Hz)")
-ax2.set_xscale("linear")
-ax2.set_yscale("linear")
-tiny = np.finfo(float).tiny
-line_psd.set_data([1.0], [tiny])
-ax2.set_xlim(0.9, 1.1)
-ax2.set_ylim(tiny, 10 * tiny)
-
-def parse_UART(line: str):
-    m = csv_re.match(line)
-    if m:
-        t_us = int(m.group(1))
-        val = float(m.group(2))
-        t_us = t_us * 1e-6
-    else:
-        t_s = time.time()
-        m = labeled_re.search(line) or plain_re.match(line)
-        if not m:
-            return None
-        val = float(m.group(1))
+METRIC_STAGES = ("read", "parse", "filter", "buffer", "save", "ts", "spec", "psd",
+                 "autoscale", "psd_save", "redraw")
 
-    return (t_us, val)
+class FrameMetrics:
+    """
+    Where each monitor frame spends its time, and how the stream keeps up.
 
-def update(frame):
-    global values, timestamps
+    mark(stage) charges the time since the previous mark to `stage`, so
+    update() only drops marks between its steps. Per frame it also records
+    samples ingested, bytes waiting in the port before the read, samples
+    dropped (sequence gaps for binary frames, timestamp gaps > 1.5 / fs
+    otherwise) and the effective sample rate from the device timestamps.
+    Frames go to a rolling window (for the overlay) and to METRICS_FILE.
+    When METRICS is off the monitor holds None instead and skips every call.
+    """
+    COLUMNS = ("time_s", "period_s", "update_s", "samples", "backlog_bytes", "dropped",
+               "fs_eff") + tuple(f"{s}_s" for s in METRIC_STAGES)
+
+    def __init__(self, fs: float, path: str | None = None, window: int = METRICS_WINDOW):
+        self.fs = fs
+        self.hist = RingBuffer(window, channels=len(self.COLUMNS))
+        self.t_start = self.last = self.frame_start = time.perf_counter()
+        self.period = 0.0
+        self.stage = dict.fromkeys(METRIC_STAGES, 0.0)
+        self.samples = self.backlog = self.dropped = 0
+        self.fs_eff = np.nan
+        self.prev_t = None
+        self.prev_seq_drops = 0
+        self.fh = None
+        if path:
+            self.fh = open(path, "w", buffering=SAVE_BUFFER)
+            self.fh.write(",".join(self.COLUMNS) + "\n")
+
+    def start_frame(self):
+        now = time.perf_counter()
+        self.period = now - self.frame_start
+        self.frame_start = self.last = now
+        self.stage = dict.fromkeys(METRIC_STAGES, 0.0)
+        self.samples = self.backlog = self.dropped = 0
+        self.fs_eff = np.nan
 
-    while ser.in_waiting:
-        line_bytes = ser.readline().decode("utf-8", errors="ignore").strip()
-        parsed = parse_UART(line_bytes)
-        if parsed is None:
-            continue
-        t_s, mv = parsed
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stage[stage] += now - self.last
+        self.last = now
 
-        values.append(mv)
-        timestamps.append(t_s)
+    def count(self, t_s: np.ndarray, seq_drops: int | None = None):
+        """Account for one ingested block with device timestamps t_s (seconds)."""
+        n = t_s.size
+        self.samples += n
+        if not n:
+            return
+        t = t_s if self.prev_t is None else np.concatenate(([self.prev_t], t_s))
+        if seq_drops is not None:
+            self.dropped += seq_drops - self.prev_seq_drops
+            self.prev_seq_drops = seq_drops
+        else:
+            gaps = np.diff(t) * self.fs
+            self.dropped += int(np.rint(gaps[gaps > 1.5] - 1).sum())
+        if t.size > 1 and t[-1] > t[0]:
+            self.fs_eff = (t.size - 1) / (t[-1] - t[0])
+        self.prev_t = float(t_s[-1])
 
-        # save line
-        with open(SAVE_FILE, "a") as f:
-            f.write(f"{t_s:.6f},{mv:.3f}\n")
+    def end_frame(self):
+        now = time.perf_counter()
+        row = [now - self.t_start, self.period, now - self.frame_start, self.samples,
+               self.backlog, self.dropped, self.fs_eff] + [self.stage[s] for s in METRIC_STAGES]
+        self.hist.extend(np.array(row)[:, None])
+        if self.fh is not None:
+            self.fh.write(",".join(f"{v:.6g}" for v in row) + "\n")
+
+    def summary(self) -> str:
+        """Rolling means over the window, for the on-plot overlay."""
+        h = self.hist.latest()
+        if not h.shape[1]:
+            return ""
+        col = dict(zip(self.COLUMNS, h))
+        period = np.mean(col["period_s"])
+        fps = 1.0 / period if period > 0 else 0.0
+        fs_eff = np.nanmean(col["fs_eff"]) if np.isfinite(col["fs_eff"]).any() else np.nan
+        ms = {s: 1e3 * np.mean(col[f"{s}_s"]) for s in METRIC_STAGES}
+        top = "  ".join(f"{s} {ms[s]:.1f}" for s in sorted(ms, key=ms.get, reverse=True)[:3])
+        return (f"{fps:.1f} fps  {1e3 * np.mean(col['update_s']):.1f} ms/frame  "
+                f"{np.mean(col['samples']):.0f} samples/frame  fs {fs_eff:.1f} Hz\n"
+                f"backlog {np.mean(col['backlog_bytes']):.0f} B  dropped {int(col['dropped'].sum())}  "
+                f"ms: {top}")
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+
+metrics = None      # FrameMetrics when METRICS is on (created by setup)
+acq = None          # hall_acquire.Acquisition when PORTS is set (created by setup)
+ring = ring_reader = None   # hall_shm.SharedRing and this process's Reader with SHARED_RING
+workers = []        # acquisition and recorder processes with SHARED_RING
+events = None       # hall_trigger.EventRecorder when TRIGGER is set (created by setup)
+capture = save_fh = None    # CAPTURE_FILE writer or SAVE_FILE handle for continuous recording
+
+def ingest():
+    """Drain the serial port into the sample history and the capture file."""
+    global pending
+
+    drops = None
+    if ring_reader is not None or acq is not None:
+        # Samples published by the acquisition process, or merged by the acquisition thread
+        if ring_reader is not None:
+            t_s, mv = ring_reader.read()
+            drops = ring_reader.lost
+        else:
+            t_s, mv = acq.drain()
+        if not t_s.size:
+            return 0
+        if metrics:
+            metrics.backlog = 0
+            metrics.mark("read")
+        # A silent board is NaN in the merge; hold its last value for the filters
+        gap = np.isnan(mv)
+        if gap.any():
+            mv = np.where(gap, raw_values.latest(1) if len(raw_values) else 0.0, mv)
+    elif BINARY_FRAMES:
+        n = ser.in_waiting
+        if not n:
+            return 0
+        data = ser.read(n)
+        if metrics:
+            metrics.backlog = n
+            metrics.mark("read")
+        _, t_us, counts = decoder.feed(data)
+        t_s, mv = t_us * 1e-6, counts_to_mv(counts).T
+        drops = decoder.dropped
+    elif BULK_INGEST:
+        n = ser.in_waiting
+        if not n:
+            return 0
+        data = ser.read(n)
+        if metrics:
+            metrics.backlog = n
+            metrics.mark("read")
+        block, pending = split_lines(pending + data)
+        t_s, mv = parse_block(block, N_CHANNELS)
+    else:
+        if metrics:
+            metrics.backlog = ser.in_waiting
+        lines = []    # line-by-line reads; reading and parsing are both charged to "parse"
+        while ser.in_waiting:
+            line = ser.readline().strip()
+            if line:
+                lines.append(line)
+        t_s, mv = parse_block(b"\n".join(lines), N_CHANNELS)
+
+    mv = mv.reshape(N_CHANNELS, -1)
+    if metrics:
+        metrics.count(t_s, drops)
+        metrics.mark("parse")
+    if mv.shape[1]:
+        raw_values.extend(mv)
+        timestamps.extend(t_s)
+        mv_f = filters.process(mv) if FILTER else mv
+        if metrics:
+            metrics.mark("filter")
+        values.extend(mv_f)
+        welch.push(mv_f / (k * 1000.0))
+        if SPECTROGRAM:
+            spec.extend(stft.push(mv_f[0] / (k * 1000.0)).T)
+        if metrics:
+            metrics.mark("buffer")
+        # save block (unfiltered; the filter can be replayed offline)
+        if events is not None:
+            events.push(t_s, mv, mv_f)  # only triggered windows; the trigger watches the filtered stream
+        elif SHARED_RING:
+            pass    # the recorder process saves
+        elif CAPTURE_FORMAT == "hcap":
+            capture.append(mv.T / ADC_MV_PER_COUNT, np.rint(t_s * 1e6))
+        else:
+            np.savetxt(save_fh, np.column_stack([t_s, mv.T]), fmt="%.6f" + ",%.3f" * N_CHANNELS)
+        if metrics:
+            metrics.mark("save")
+    return mv.shape[1]
+
+def update(frame):
+    if metrics:
+        metrics.start_frame()
+    ingest()
 
     # Time series plot
-    x = np.arange(len(values[-N:]))
-    y = np.array(values[-N:])
-    line_ts.set_data(x, y)
-    ax1.set_xlim(0, N)
-    y_lo, y_hi = float(y.min()), float(y.max())
+    Y = values.latest(N)    # (channels, n)
+    if Y.shape[1] == 0:
+        return finish_frame(False)
+    # min/max per pixel column instead of every sample
+    x, Yd = minmax_decimate(Y, ax1.bbox.width)
+    for line, y in zip(lines_ts, Yd):
+        line.set_data(x, y)
+    if PLOT_RAW:
+        R = raw_values.latest(N)
+        xr, Rd = minmax_decimate(R, ax1.bbox.width)
+        for line, y in zip(lines_raw, Rd):
+            line.set_data(xr, y)
+    Y_all = np.concatenate((Y, R)) if PLOT_RAW else Y
+    y_lo, y_hi = float(Y_all.min()), float(Y_all.max())
     if np.isclose(y_lo, y_hi):
         pad = 1e-12
         y_lo -= pad; y_hi += pad;
-    ax1.set_ylim(y_lo, y_hi)
+    redraw = update_limits(ax1, y_lo, y_hi)
+    if metrics:
+        metrics.mark("ts")
+
+    if SPECTROGRAM and len(spec):
+        # Rolling (frequency x time) image, newest column on the right
+        with np.errstate(divide="ignore"):
+            db = 10 * np.log10(spec.latest())
+        spec_disp[:] = np.nan
+        spec_disp[:, -db.shape[1]:] = db
+        spec_img.set_data(spec_disp)
+        finite = db[np.isfinite(db)]
+        if finite.size:
+            spec_img.set_clim(*np.percentile(finite, (5, 99.5)))
+    if metrics:
+        metrics.mark("spec")
 
     if len(values) < N/4:
-        return line_ts, line_psd
+        return finish_frame(redraw)
 
     # Welch PSD
-    B_T = np.array(values[-N:], dtype=float) / (k * 1000.0)
-    nseg = min(256, (B_T.size // 2) * 2)
-    if nseg < 16:
-        return line_ts, line_psd
-    
-    f, Pxx = welch_psd(B_T, fs=fs, nperseg=nseg, overlap=0.5)
+    if PSD_TIMING != "nominal" or JITTER_REPORT:
+        T = timestamps.latest(N)
+    if JITTER_REPORT:
+        jt = timing_report(T, fs)
+        ax2.set_title(f"Hall Sensor PSD  (fs {jt['fs_mean']:.1f} Hz, jitter "
+                      f"{1e6 * jt['jitter_rms_s']:.0f} us rms, {jt['dropped']} dropped)")
+    if PSD_TIMING == "lombscargle":
+        f, Pxx = zip(*(nonuniform_welch(T, y / (k * 1000.0), NPERSEG) for y in Y))
+        f, Pxx = f[0], np.array(Pxx)
+    elif PSD_TIMING == "resample":
+        _, Yg, fs_g = resample_uniform(T, Y / (k * 1000.0))
+        f, Pxx = zip(*(welch_psd(y, fs_g, nperseg=NPERSEG) for y in Yg))
+        f, Pxx = f[0], np.array(Pxx)
+    elif STREAM_WELCH or N_CHANNELS > 1:
+        f, Pxx = welch.psd()
+    else:
+        B_T = Y[0] / (k * 1000.0)
+        nseg = min(NPERSEG, (B_T.size // 2) * 2)
+        if nseg < 16:
+            return finish_frame(redraw)
+        f, Pxx = welch_psd(B_T, fs=fs, nperseg=nseg, overlap=0.5)
+    Pxx = np.atleast_2d(Pxx)    # (channels, nfreq)
+    if metrics:
+        metrics.mark("psd")
+
     if f.size > 1:
         # keep positive frequencies only
-        mask = np.isfinite(f) & np.isfinite(Pxx) & (f > 0)
+        mask = np.isfinite(f) & np.all(np.isfinite(Pxx), axis=0) & (f > 0)
         if not np.any(mask):
-            return line_ts, line_psd
+            return finish_frame(redraw)
         
         f_plot = f[mask]
-        P_plot = Pxx[mask]
+        P_plot = Pxx[:, mask]
         
         eps = np.finfo(float).tiny
         P_plot = np.clip(P_plot, eps, None)
 
-        line_psd.set_data(f_plot, P_plot)
+        for line, p in zip(lines_psd, P_plot):
+            line.set_data(f_plot, p)
 
-        ax2.set_xlim(f_plot[0], f_plot[-1])
+        if ax2.get_xscale() != "log":
+            ax2.set_xscale("log")
+            ax2.set_yscale("log")
+            redraw = True
+        redraw |= update_limits(ax2, f_plot[0], f_plot[-1], axis="x", slack=0)
 
         p5 = np.percentile(P_plot, 5)
         med = np.median(P_plot)
@@ -120,19 +330,40 @@ def update(frame):
         y_hi = P_plot.max()
         if not np.isfinite(y_hi) or y_hi <= y_lo:
             y_hi = y_lo * 10
-        ax2.set_ylim(y_lo, y_hi)
+        redraw |= update_limits(ax2, y_lo, y_hi)
 
-        if ax2.get_xscale() != "log":
-            ax2.set_xscale("log")
-        if ax2.get_yscale() != "log":
-            ax2.set_yscale("log")
+        if N_CHANNELS > 1:
+            # Coherence matrix averaged over COH_BAND
+            fc, coh = welch.coherence()
+            band = (fc >= COH_BAND[0]) & (fc <= COH_BAND[1])
+            if np.any(band):
+                coh_img.set_data(coh[band].mean(axis=0))
+            header = "Frequency (Hz)," + ",".join(f"PSD ch{i} (T^2/Hz)" for i in range(N_CHANNELS))
+        else:
+            header = "Frequency (Hz),PSD (T^2/Hz)"
+        if metrics:
+            metrics.mark("autoscale")
 
-        np.savetxt(PSD_FILE, np.column_stack([f_plot, P_plot]),
-                   delimiter=",", 
-                   header="Frequency (Hz),PSD (T^2/Hz)", 
-                   comments='' )
+        if events is None or events.active:    # with TRIGGER, the PSD of the last event
+            np.savetxt(PSD_FILE, np.column_stack([f_plot, P_plot.T]),
+                       delimiter=",",
+                       header=header,
+                       comments='' )
+        if metrics:
+            metrics.mark("psd_save")
         
-        return line_ts, line_psd
+    return finish_frame(redraw)
+
+def finish_frame(redraw: bool):
+    """With blitting, axes (ticks, labels) are only redrawn when limits moved."""
+    if redraw and BLIT:
+        fig.canvas.draw()
+    if metrics:
+        metrics.mark("redraw")
+        metrics.end_frame()
+        if METRICS_OVERLAY:
+            metrics_text.set_text(metrics.summary())
+    return artists
     
 def welch_psd(x, fs, nperseg=256, overlap=0.5):
     step = int(nperseg * (1 - overlap))
@@ -156,7 +387,143 @@ def welch_psd(x, fs, nperseg=256, overlap=0.5):
     f = np.fft.rfftfreq(nperseg, 1/fs)
     return f, Pxx
 
-ani = animation.FuncAnimation(fig, update, interval=100, cache_frame_data=False)
-plt.show()
+def setup():
+    """Open the port, allocate the stream state and build the figure (module globals)."""
+    global ser, values, raw_values, timestamps, filters, welch, decoder, pending, capture, save_fh
+    global stft, spec, fig, ax1, ax2, ax3, ax4, coh_img, lines_raw, lines_ts, lines_psd, artists
+    global spec_disp, spec_img, metrics, metrics_text, acq, ring, ring_reader, workers, events, N_CHANNELS
+    # ==== INIT ====
+    if PORTS:
+        N_CHANNELS = BOARD_CHANNELS * len(PORTS)
+    if SHARED_RING:
+        import hall_shm
+        ring = hall_shm.SharedRing(channels=N_CHANNELS, capacity=int(RING_SECONDS * fs), fs=fs)
+        out = CAPTURE_FILE if CAPTURE_FORMAT == "hcap" else SAVE_FILE
+        workers = [hall_shm.start(hall_shm.acquire, ring.name, PORTS or PORT,
+                                  BOARD_CHANNELS if PORTS else N_CHANNELS, BINARY_FRAMES, fs, BAUD)]
+        if not TRIGGER:
+            workers.append(hall_shm.start(hall_shm.record, ring.name, out, CAPTURE_FORMAT, k))
+        ring_reader = hall_shm.Reader(ring, from_start=True)
+        print(f"shared ring {ring.name} (hall_field.py <layout> --ring {ring.name} attaches a field map)")
+        ser = None
+    elif PORTS:
+        from hall_acquire import Acquisition, Board
+        acq = Acquisition([Board(p, BOARD_CHANNELS, fs, BINARY_FRAMES) for p in PORTS], fs).start()
+        ser = None
+    else:
+        ser = serial.Serial(PORT, BAUD)
+        time.sleep(CONNECT_DELAY) # Wait for connection
+
+    values = RingBuffer(N, channels=N_CHANNELS)        # filtered when FILTER
+    raw_values = RingBuffer(N, channels=N_CHANNELS)    # as received
+    timestamps = RingBuffer(N)
+    filters = FilterBank(fs, N_CHANNELS, mains=MAINS_HZ, harmonics=NOTCH_HARMONICS, q=NOTCH_Q,
+                         highpass=HIGHPASS_HZ, sma=SMA_N)
+    if N_CHANNELS > 1:
+        welch = StreamingCSD(fs, N_CHANNELS, nperseg=NPERSEG, overlap=0.5, history=N)
+    else:
+        welch = StreamingWelch(fs, nperseg=NPERSEG, overlap=0.5, history=N)
+    decoder = FrameDecoder(N_CHANNELS)
+    metrics = FrameMetrics(fs, METRICS_FILE) if METRICS else None
+    pending = b""   # partial line carried over between reads
+    if TRIGGER:
+        from hall_trigger import Trigger, EventRecorder
+        trigger = Trigger(fs, N_CHANNELS, TRIGGER, TRIGGER_THRESHOLD,
+                          TRIGGER_BAND if TRIGGER == "band" else None)
+        events = EventRecorder(trigger, fs, N_CHANNELS, PRE_TRIGGER_S, POST_TRIGGER_S,
+                               EVENT_DIR, CAPTURE_FORMAT, k)
+    elif SHARED_RING:
+        pass    # hall_shm.record writes the capture
+    elif CAPTURE_FORMAT == "hcap":
+        capture = CaptureWriter(CAPTURE_FILE, [f"ch{i}" for i in range(N_CHANNELS)], fs=fs,
+                                scale=ADC_MV_PER_COUNT, units="mV", k=k, chunk_rows=4096)
+    else:
+        save_fh = open(SAVE_FILE, "a", buffering=SAVE_BUFFER)
+
+    if SPECTROGRAM:
+        stft = StreamingSTFT(fs, NPERSEG, NPERSEG // 2)
+        spec = RingBuffer(int(SPEC_SECONDS * fs / stft.step), channels=stft.freqs.size)
+
+    # ==== PLOT ====
+    if N_CHANNELS > 1:
+        mosaic = [["ts", "coh"], ["psd", "coh"]] + ([["spec", "spec"]] if SPECTROGRAM else [])
+        fig, axd = plt.subplot_mosaic(mosaic, figsize=(12, 8 if SPECTROGRAM else 6),
+                                      width_ratios=[2, 1])
+        ax1, ax2, ax3 = axd["ts"], axd["psd"], axd["coh"]
+        ax4 = axd.get("spec")
+        coh_img = ax3.imshow(np.zeros((N_CHANNELS, N_CHANNELS)), vmin=0, vmax=1,
+                             cmap="viridis", interpolation="nearest")
+        fig.colorbar(coh_img, ax=ax3, shrink=0.6)
+        ax3.set_title(f"Coherence {COH_BAND[0]:g}-{COH_BAND[1]:g} Hz")
+        ax3.set_xlabel("Channel")
+        ax3.set_ylabel("Channel")
+    elif SPECTROGRAM:
+        fig, (ax1, ax2, ax4) = plt.subplots(3, 1, figsize=(8,9))
+    else:
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(8,6))
+    lines_raw = [ax1.plot([], [], lw=.25, color="0.7", animated=BLIT)[0]
+                 for _ in range(N_CHANNELS if PLOT_RAW else 0)]
+    lines_ts = [ax1.plot([], [], lw=.25, animated=BLIT)[0] for _ in range(N_CHANNELS)]
+    lines_psd = [ax2.plot([], [], lw=1, animated=BLIT)[0] for _ in range(N_CHANNELS)]
+    if N_CHANNELS > 1:
+        coh_img.set_animated(BLIT)
+    artists = (*lines_raw, *lines_ts, *lines_psd) + ((coh_img,) if N_CHANNELS > 1 else ())
+    if METRICS and METRICS_OVERLAY:
+        metrics_text = ax1.text(0.01, 0.98, "", transform=ax1.transAxes, va="top", ha="left",
+                                fontsize=7, family="monospace", animated=BLIT,
+                                bbox=dict(facecolor="white", alpha=0.7, lw=0))
+        artists += (metrics_text,)
+    if SPECTROGRAM:
+        spec_disp = np.full(spec.buf.shape, np.nan)
+        spec_img = ax4.imshow(spec_disp, origin="lower", aspect="auto", cmap="magma",
+                              interpolation="nearest", animated=BLIT,
+                              extent=(-SPEC_SECONDS, 0, 0, fs / 2))
+        ax4.set_title("Hall Sensor Spectrogram (ch0, dB re T^2/Hz)")
+        ax4.set_xlabel("Time (s)")
+        ax4.set_ylabel("Frequency (Hz)")
+        artists += (spec_img,)
+
+    ax1.set_xlim(0, N)
+    ax1.set_xlabel("Sample")
+    ax1.set_ylabel("Voltage (mV)")
+    ax1.set_title("Hall Sensor Time Series")
+
+    ax2.set_title("Hall Sensor PSD")
+    ax2.set_xlabel("Frequency (Hz)")
+    ax2.set_ylabel("PSD (T^2/Hz)")
+    ax2.set_xscale("linear")
+    ax2.set_yscale("linear")
+    tiny = np.finfo(float).tiny
+    for line_psd in lines_psd:
+        line_psd.set_data([1.0], [tiny])
+    ax2.set_xlim(0.9, 1.1)
+    ax2.set_ylim(tiny, 10 * tiny)
+    if SPECTROGRAM:
+        fig.tight_layout()
+    return fig
+
+def close():
+    if metrics:
+        metrics.close()
+    if events is not None:
+        events.close()
+    if ring is not None:
+        ring.stop()
+        for p in workers:
+            p.join()
+        ring.close()
+    elif capture is not None:
+        capture.close()
+    elif save_fh is not None:
+        save_fh.close()
+    if acq is not None:
+        acq.stop()
+    elif ser is not None:
+        ser.close()
 
-ser.close()
+if __name__ == "__main__":
+    setup()
+    ani = animation.FuncAnimation(fig, update, interval=FRAME_INTERVAL_MS, blit=BLIT,
+                                  cache_frame_data=False)
+    plt.show()
+    close()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+monitor_replay.py
+Accelerated replay into a pseudo-terminal to measure monitor.py's ingestion
+ceiling, headless (Agg backend, no display, no board).
+
+    python monitor_replay.py                          # synthetic tones, real time, 10 s
+    python monitor_replay.py --speed 20 hall_data.csv
+    python monitor_replay.py --wav Data/SMBB-WEB_fast_200Hz.wav --sweep
+
+A child process writes "t_us,value[,value...]" lines (the firmware's
+printf format, integer mV) into a pty at fs x speed, looping the source.
+Each t_us is the line's scheduled send time on the monotonic clock, so
+monitor's newest timestamp gives the end-to-end latency. The parent
+runs monitor.setup() on the pty and calls update() every frame like the
+animation timer would, then reports:
+
+    throughput  samples/s ingested vs offered
+    backlog     samples waiting in the port plus samples the writer could
+                not deliver yet (pty full); its slope is the backlog growth
+    latency     send -> ingested and drawn, p50 / p95 / max
+    frame       update() + draw time, p50 / p95
+
+--sweep doubles the speed until the backlog grows, and reports the highest
+sustained rate.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+import numpy as np
+
+TONES_HZ = (5.0, 15.5, 60.0)    # synthetic source
+MID_MV = 1650.0                 # mid-scale of the 3.3 V ADC
+SYNTH_SECONDS = 60.0            # length of the synthetic loop
+GROWTH_LIMIT = 0.02             # backlog growth (fraction of the offered rate) that counts as falling behind
+
+# --- Sources (channels x n, mV) ---
+
+def synthetic_source(fs: float, n_channels: int = 1, seconds: float = SYNTH_SECONDS,
+                     seed: int = 0) -> np.ndarray:
+    t = np.arange(int(fs * seconds)) / fs
+    rng = np.random.default_rng(seed)
+    ch = np.arange(n_channels)[:, None]
+    wave = sum(np.sin(2 * np.pi * f * t[None, :] + ch) for f in TONES_HZ)
+    return MID_MV + 300 * wave + rng.normal(0, 5, (n_channels, t.size))
+
+def capture_source(path: str, n_channels: int = 1) -> np.ndarray:
+    """Values of a monitor capture: SAVE_FILE text (t_s,mv...) or a .hcap file."""
+    if path.lower().endswith(".hcap"):
+        from hallcap import Capture
+        data = Capture(path).read_rows()[1]
+    else:
+        data = np.loadtxt(path, delimiter=",", ndmin=2)[:, 1:]
+    return np.resize(data.T, (n_channels, data.shape[0]))
+
+def wav_source(path: str, n_channels: int = 1) -> np.ndarray:
+    """WAV channels scaled to +-1000 mV around mid-scale."""
+    from wav_psd import _open_channel, _to_float32
+    rows = []
+    for c in range(n_channels):
+        _, data, _, max_abs = _open_channel(path, c)
+        rows.append(MID_MV + 1000.0 * _to_float32(np.asarray(data), max_abs))
+    return np.vstack(rows)
+
+def format_lines(t_us: np.ndarray, mv: np.ndarray) -> bytes:
+    """UART lines for (n,) timestamps and (channels, n) values."""
+    cols = np.column_stack((t_us.astype(np.int64), np.rint(mv.T).astype(np.int64)))
+    fmt = ",".join(["%d"] * cols.shape[1])
+    return ("\n".join(fmt % tuple(row) for row in cols.tolist()) + "\n").encode()
+
+# --- Writer process ---
+
+def _writer(fd: int, source: np.ndarray, rate: float, block: int, t0: float,
+            duration: float, sent, lag):
+    """Write lines paced at `rate` lines/s from t0 (monotonic) for duration seconds."""
+    n_src = source.shape[1]
+    i = 0
+    while True:
+        now = time.monotonic()
+        if now - t0 >= duration:
+            break
+        due = int((now - t0) * rate) + 1
+        lag.value = max(0, due - i)
+        if i >= due:
+            time.sleep(min(block / rate, 0.01))
+            continue
+        n = min(due - i, block)
+        idx = np.arange(i, i + n)
+        payload = format_lines((t0 + idx / rate) * 1e6, source[:, idx % n_src])
+        os.write(fd, payload)   # blocks while the pty is full: the reader is behind
+        i += n
+        sent.value = i
+
+# --- Measurement ---
+
+def run(source: np.ndarray, fs: float, speed: float = 1.0, seconds: float = 10.0,
+        block: int = 256, verbose: bool = True, metrics: bool = False) -> dict:
+    """
+    Replay source into monitor for `seconds`; returns the measured statistics.
+    With metrics=True monitor's own per-stage instrumentation is switched on
+    and its rolling summary printed at the end.
+    """
+    import pty
+    import tty
+    import matplotlib
+    matplotlib.use("Agg")
+    import monitor
+
+    n_channels = source.shape[0]
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    tmp = tempfile.mkdtemp(prefix="monitor_replay_")
+    monitor.PORT = os.ttyname(slave)
+    monitor.N_CHANNELS = n_channels
+    monitor.fs = fs
+    monitor.BINARY_FRAMES = False
+    monitor.CONNECT_DELAY = 0.0
+    monitor.CAPTURE_FILE = os.path.join(tmp, "replay.hcap")
+    monitor.SAVE_FILE = os.path.join(tmp, "replay.csv")
+    monitor.PSD_FILE = os.path.join(tmp, "replay_psd.csv")
+    monitor.METRICS = metrics
+    monitor.METRICS_FILE = os.path.join(tmp, "replay_metrics.csv")
+    fig = monitor.setup()
+    fig.canvas.draw()
+
+    rate = fs * speed
+    sent, lag = mp.Value("q", 0, lock=False), mp.Value("q", 0, lock=False)
+    t0 = time.monotonic() + 0.2
+    ctx = mp.get_context("fork")
+    writer = ctx.Process(target=_writer, daemon=True,
+                         args=(master, source, rate, block, t0, seconds, sent, lag))
+    writer.start()
+
+    interval = monitor.FRAME_INTERVAL_MS / 1000.0
+    line_bytes = len(format_lines(np.array([t0 * 1e6]), source[:, :1]))
+    ingested, t_log, backlog, latency, frame = 0, [], [], [], []
+    t_next = t0
+    try:
+        while time.monotonic() < t0 + seconds:
+            t_next += interval
+            f0 = time.monotonic()
+            waiting = monitor.ser.in_waiting
+            before = monitor.timestamps.total
+            monitor.update(0)
+            if monitor.BLIT:
+                for a in monitor.artists:
+                    a.axes.draw_artist(a)
+            else:
+                fig.canvas.draw()
+            f1 = time.monotonic()
+            ingested += monitor.timestamps.total - before
+            if monitor.timestamps.total > before:
+                latency.append(f1 - float(monitor.timestamps.latest(1)[0]))
+            t_log.append(f1 - t0)
+            backlog.append(waiting / line_bytes + lag.value)
+            frame.append(f1 - f0)
+            time.sleep(max(0.0, t_next - time.monotonic()))
+        if metrics and verbose:
+            h = monitor.metrics.hist.latest()
+            print(monitor.metrics.summary())
+            print("ms: " + "  ".join(f"{name[:-2]} {1e3 * v:.2f}" for name, v in
+                                     zip(monitor.FrameMetrics.COLUMNS[7:], h[7:].mean(axis=1))))
+    finally:
+        writer.terminate()
+        writer.join()
+        monitor.close()
+        os.close(master)
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+    elapsed = max(t_log[-1], 1e-9) if t_log else 1e-9
+    t_log, backlog = np.asarray(t_log), np.asarray(backlog)
+    growth = float(np.polyfit(t_log, backlog, 1)[0]) if t_log.size > 2 else 0.0
+    lat = np.asarray(latency) if latency else np.array([np.nan])
+    fr = np.asarray(frame) if frame else np.array([np.nan])
+    stats = {
+        "speed": speed,
+        "offered": rate * n_channels,
+        "sent": sent.value * n_channels / elapsed,
+        "ingested": ingested * n_channels / elapsed,
+        "backlog_end": float(backlog[-1]) if backlog.size else 0.0,
+        "backlog_growth": growth * n_channels,
+        "latency_p50": float(np.nanpercentile(lat, 50)),
+        "latency_p95": float(np.nanpercentile(lat, 95)),
+        "latency_max": float(np.nanmax(lat)),
+        "frame_p50": float(np.nanpercentile(fr, 50)),
+        "frame_p95": float(np.nanpercentile(fr, 95)),
+    }
+    stats["keeping_up"] = (stats["backlog_growth"] <= GROWTH_LIMIT * stats["offered"]
+                           and stats["ingested"] >= (1 - 2 * GROWTH_LIMIT) * stats["offered"])
+    if verbose:
+        report(stats)
+    return stats
+
+def report(s: dict):
+    print(f"x{s['speed']:<6g} offered {s['offered']:10.0f} samples/s  "
+          f"sent {s['sent']:10.0f}  ingested {s['ingested']:10.0f}")
+    print(f"        backlog {s['backlog_end']:10.0f} samples, growth {s['backlog_growth']:+10.0f} samples/s"
+          f"  ({'keeping up' if s['keeping_up'] else 'FALLING BEHIND'})")
+    print(f"        latency p50 {1e3 * s['latency_p50']:7.1f} ms  p95 {1e3 * s['latency_p95']:7.1f} ms  "
+          f"max {1e3 * s['latency_max']:7.1f} ms   frame p50 {1e3 * s['frame_p50']:6.1f} ms  "
+          f"p95 {1e3 * s['frame_p95']:6.1f} ms")
+
+def sweep(source: np.ndarray, fs: float, seconds: float, max_speed: float = 4096.0,
+          metrics: bool = False) -> float:
+    """Double the speed until monitor falls behind; returns the best sustained samples/s."""
+    best, speed = 0.0, 1.0
+    while speed <= max_speed:
+        s = run(source, fs, speed, seconds, metrics=metrics)
+        if not s["keeping_up"]:
+            break
+        best = s["ingested"]
+        speed *= 2
+    print(f"ingestion ceiling: ~{best:.0f} samples/s "
+          f"({best / fs / source.shape[0]:.0f}x real time at fs={fs:g} Hz)")
+    return best
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay captures into monitor.py through a pty (headless)")
+    ap.add_argument("capture", nargs="?", help="monitor capture (.csv or .hcap); default synthetic tones")
+    ap.add_argument("--wav", help="replay a WAV file instead")
+    ap.add_argument("--channels", type=int, default=1)
+    ap.add_argument("--fs", type=float, default=750.0, help="sample rate of the replayed stream")
+    ap.add_argument("--speed", type=float, default=1.0, help="multiple of real time")
+    ap.add_argument("--seconds", type=float, default=10.0, help="length of each run")
+    ap.add_argument("--sweep", action="store_true", help="double the speed until monitor falls behind")
+    ap.add_argument("--metrics", action="store_true",
+                    help="enable monitor's per-stage instrumentation and print its summary")
+    args = ap.parse_args(argv)
+
+    if args.wav:
+        source = wav_source(args.wav, args.channels)
+    elif args.capture:
+        source = capture_source(args.capture, args.channels)
+    else:
+        source = synthetic_source(args.fs, args.channels)
+    if args.sweep:
+        sweep(source, args.fs, args.seconds, metrics=args.metrics)
+        return 0
+    stats = run(source, args.fs, args.speed, args.seconds, metrics=args.metrics)
+    return 0 if stats["keeping_up"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,36 +1,177 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from scipy import signal
-from tkinter import Tk, filedialog, Button, Label
-from tkinter.ttk import Combobox
-
-# Function to compute PSD and plot
-def compute_psd_from_xls(file_path, sheet_name, time_column, magnetometer_column, output_file=None):
-    # Step 1: Load the time series data from the Excel file
-    df = pd.read_excel(file_path, sheet_name=sheet_name)
+from spectral import ZoomWelch, nominal_period, nonuniform_welch, resample_uniform, timing_report
+from hallcap import Capture, write_psd
+from minmax_plot import MinMaxLine
+from psd_cache import default_cache
+
+# matplotlib and tkinter are imported where they are used, so the batch CLI
+# (psd_batch.py) can use the compute functions without loading a GUI.
+
+# How sample times are used: "mean" assumes uniform samples at 1 / mean(dt),
+# "lombscargle" uses the timestamps as they are (fast Lomb-Scargle Welch),
+# "resample" interpolates onto a uniform grid at the median rate first.
+TIMING_METHODS = ("mean", "lombscargle", "resample")
+
+def _numeric_first_row(file_path):
+    """True when the first line of a CSV is all numbers, i.e. there is no header row."""
+    with open(file_path, encoding="utf-8", errors="ignore") as fh:
+        fields = fh.readline().strip().split(",")
+    try:
+        [float(v) for v in fields]
+    except ValueError:
+        return False
+    return True
+
+def load_series(file_path, sheet_name, time_column, magnetometer_column, cache=True):
+    """
+    Time and magnetometer columns of an Excel sheet, CSV file or .hcap capture.
+    Column names may also be given as integer positions (the only way to
+    address a CSV without a header row, like monitor's SAVE_FILE). Returns (time, data),
+    or None if a column is missing. Parsed Excel/CSV columns are kept in the
+    PSD cache, so a sheet is only parsed once.
+    """
+    if file_path.lower().endswith(".hcap"):
+        # Step 1-2: Memory-mapped capture; time comes from the stored timestamps
+        cap = Capture(file_path)
+        if isinstance(magnetometer_column, int):
+            magnetometer_column = (["t_us"] + cap.columns)[magnetometer_column]
+        if magnetometer_column not in cap.columns:
+            print(f"Error: The required column ('{magnetometer_column}') is not in the capture.")
+            return None
+        t_us, data = cap.read_rows(columns=[magnetometer_column])
+        return t_us * 1e-6, data[:, 0]
+
+    is_csv = file_path.lower().endswith(".csv")
+    store = default_cache() if cache else None
+    if store is not None:
+        key = store.key(file_path, "series", sheet=sheet_name, time_column=time_column,
+                        column=magnetometer_column, **({"header": "auto"} if is_csv else {}))
+        hit = store.get(key)
+        if hit is not None:
+            return hit[0]["time"], hit[0]["data"]
+
+    # Step 1: Load the time series data from the Excel (or CSV) file
+    if is_csv:
+        # monitor's SAVE_FILE (t_s,mv...) has no header row: columns are then positions
+        df = pd.read_csv(file_path, header=None if _numeric_first_row(file_path) else "infer")
+    else:
+        df = pd.read_excel(file_path, sheet_name=sheet_name)
+    if isinstance(time_column, int):
+        time_column = df.columns[time_column]
+    if isinstance(magnetometer_column, int):
+        magnetometer_column = df.columns[magnetometer_column]
 
     # Check if the specified columns exist
     if time_column not in df.columns or magnetometer_column not in df.columns:
         print(f"Error: The required columns ('{time_column}', '{magnetometer_column}') are not in the data.")
-        return
+        return None
 
     # Step 2: Extract the time and magnetometer data
-    time = df[time_column].values
-    magnetometer_data = df[magnetometer_column].values
+    time, data = df[time_column].values, df[magnetometer_column].values
+    if store is not None:
+        store.put(key, {"time": time, "data": data})
+    return time, data
+
+def psd_from_series(time, magnetometer_data, nperseg=1024, band=None, timing="mean"):
+    """
+    Welch PSD of a sampled series; returns (fs, f, Pxx).
+    With band=(lo, hi) only that band is computed (spectral.ZoomWelch),
+    on the same bins and scale as the full-band PSD. timing is one of
+    TIMING_METHODS; "lombscargle" has no 0 Hz bin.
+    """
+    if timing == "lombscargle":
+        t = np.asarray(time, dtype=np.float64)
+        f, Pxx = nonuniform_welch(t, magnetometer_data, min(nperseg, t.size))
+        fs = 1 / nominal_period(t)
+        if band is not None:
+            keep = (f >= band[0]) & (f <= band[1])
+            f, Pxx = f[keep], Pxx[keep]
+        return fs, f, Pxx
+    if timing == "resample":
+        time, magnetometer_data, _ = resample_uniform(time, magnetometer_data)
+    elif timing != "mean":
+        raise ValueError(f"timing must be one of {TIMING_METHODS}, got {timing!r}")
 
     # Step 3: Compute the sampling frequency (assuming uniform time intervals)
     dt = np.mean(np.diff(time))  # Time difference between samples
     fs = 1 / dt  # Sampling frequency
 
     # Step 4: Compute the Power Spectral Density (PSD) using Welch's method
-    f, Pxx = signal.welch(magnetometer_data, fs=fs, nperseg=1024)
+    if band is not None:
+        seg = min(nperseg, len(magnetometer_data))
+        zw = ZoomWelch(fs, band[0], band[1], seg, seg // 2)
+        zw.push(np.asarray(magnetometer_data, dtype=np.float64))
+        f, Pxx = zw.psd()
+        return fs, f, Pxx
+    f, Pxx = signal.welch(magnetometer_data, fs=fs, nperseg=nperseg)
+    return fs, f, Pxx
+
+def psd_for_file(file_path, sheet_name, time_column, magnetometer_column, nperseg=1024, cache=True,
+                 band=None, timing="mean", series=None):
+    """
+    load_series + psd_from_series through the PSD cache. A (time, values)
+    series already loaded from the file can be passed so it is not read again.
+    Returns (fs, f, Pxx), or None if a column is missing.
+    """
+    store = default_cache() if cache else None
+    if store is not None:
+        key = store.key(file_path, "table_psd", sheet=sheet_name, time_column=time_column,
+                        column=magnetometer_column, nperseg=nperseg, window="hann",
+                        detrend="constant", scaling="density",
+                        **({} if band is None else {"band": [float(b) for b in band]}),
+                        **({} if timing == "mean" else {"timing": timing}))
+        hit = store.get(key)
+        if hit is not None:
+            return hit[1]["fs"], hit[0]["f"], hit[0]["Pxx"]
+    if series is None:
+        series = load_series(file_path, sheet_name, time_column, magnetometer_column, cache)
+    if series is None:
+        return None
+    fs, f, Pxx = psd_from_series(*series, nperseg=nperseg, band=band, timing=timing)
+    if store is not None:
+        store.put(key, {"f": f, "Pxx": Pxx}, fs=float(fs))
+    return fs, f, Pxx
+
+def print_timing(time):
+    """Print the measured sample rate, timestamp jitter and gaps of a series."""
+    jt = timing_report(np.asarray(time, dtype=np.float64))
+    print(f"Sampling: {jt['fs_nominal']:.3f} Hz nominal, {jt['fs_mean']:.3f} Hz mean, "
+          f"jitter {1e6 * jt['jitter_rms_s']:.1f} us rms / {1e6 * jt['jitter_max_s']:.1f} us max, "
+          f"{jt['gaps']} gaps ({jt['dropped']} samples missing)")
+    return jt
+
+def export_psd(output_file, f, Pxx, fs):
+    """Save a PSD to .xlsx, .csv or a .hcap PSD product."""
+    ext = output_file.lower().rsplit(".", 1)[-1]
+    if ext == "hcap":
+        write_psd(output_file, f, Pxx, columns=['PSD [V**2/Hz]'], fs=float(fs))
+    else:
+        psd_df = pd.DataFrame({'Frequency [Hz]': f, 'PSD [V**2/Hz]': Pxx})
+        if ext == "csv":
+            psd_df.to_csv(output_file, index=False)
+        else:
+            psd_df.to_excel(output_file, index=False)
+
+# Function to compute PSD and plot
+def compute_psd_from_xls(file_path, sheet_name, time_column, magnetometer_column, output_file=None,
+                         band=None, timing="mean"):
+    import matplotlib.pyplot as plt
+
+    series = load_series(file_path, sheet_name, time_column, magnetometer_column)
+    if series is None:
+        return
+    time, magnetometer_data = series
+    print_timing(time)
+    fs, f, Pxx = psd_for_file(file_path, sheet_name, time_column, magnetometer_column, band=band,
+                              timing=timing, series=series)
 
     # Step 5: Plot the raw data on its own figure
     fig1, ax1 = plt.subplots(figsize=(12, 6))
 
-    # Plot the raw data on the first figure
-    ax1.plot(time, magnetometer_data, color='tab:blue', label='Raw Magnetometer Data')
+    # Plot the raw data on the first figure (min/max per pixel, re-decimated on zoom)
+    MinMaxLine(ax1, magnetometer_data, x=time, color='tab:blue', label='Raw Magnetometer Data')
     ax1.set_ylabel(f'{magnetometer_column} (µT)', color='tab:blue')
     ax1.tick_params(axis='y', labelcolor='tab:blue')
     ax1.set_title('Magnetometer Raw Data')
@@ -54,9 +195,12 @@ def compute_psd_from_xls(file_path, sheet_name, time_column, magnetometer_column
     ax2.semilogy(f, Pxx, color='tab:orange', label='Power Spectral Density')
 
     # Dynamically set the xlim to show a zoomed-in frequency range
-    max_freq = f[-1]  # Maximum frequency from the PSD
-    zoom_limit = min(max_freq, 100)  # Set a reasonable zoom limit (e.g., 0-100 Hz, or the maximum frequency)
-    ax2.set_xlim(0, zoom_limit)  # Zoom in to 0 - 100 Hz or adjust depending on your data
+    if band is not None:
+        ax2.set_xlim(f[0], f[-1])  # The computed band only
+    else:
+        max_freq = f[-1]  # Maximum frequency from the PSD
+        zoom_limit = min(max_freq, 100)  # Set a reasonable zoom limit (e.g., 0-100 Hz, or the maximum frequency)
+        ax2.set_xlim(0, zoom_limit)  # Zoom in to 0 - 100 Hz or adjust depending on your data
 
     # Ensure the PSD plot fills up the window
     ax2.set_xlabel('Frequency (Hz)')
@@ -77,14 +221,16 @@ def compute_psd_from_xls(file_path, sheet_name, time_column, magnetometer_column
     # Show the second plot
     plt.show()
 
-    # Step 7: Optionally save the PSD to a new Excel file
+    # Step 7: Optionally save the PSD to a new Excel file (or a .hcap PSD product)
     if output_file:
-        psd_df = pd.DataFrame({'Frequency [Hz]': f, 'PSD [V**2/Hz]': Pxx})
-        psd_df.to_excel(output_file, index=False)
+        export_psd(output_file, f, Pxx, fs)
         print(f"PSD data saved to {output_file}")
 
 # Function to open a file dialog and select the Excel file, sheet, and columns
 def select_file_and_columns():
+    from tkinter import Tk, filedialog, Button, Label
+    from tkinter.ttk import Combobox
+
     # Initialize Tkinter window
     root = Tk()
     root.withdraw()  # Hide the root window initially
@@ -92,15 +238,19 @@ def select_file_and_columns():
     # Step 1: Open file dialog to choose the Excel file
     file_path = filedialog.askopenfilename(
         title="Select the Excel file",
-        filetypes=[("Excel files", "*.xls"), ("Excel files", "*.xlsx")]
+        filetypes=[("Excel files", "*.xls"), ("Excel files", "*.xlsx"), ("Hall captures", "*.hcap")]
     )
     if not file_path:
         print("No file selected. Exiting.")
         return
 
     # Step 2: Read the Excel file to get the sheet names
-    xls = pd.ExcelFile(file_path)
-    sheet_names = xls.sheet_names
+    is_capture = file_path.lower().endswith(".hcap")
+    if is_capture:
+        sheet_names = ["capture"]
+    else:
+        xls = pd.ExcelFile(file_path)
+        sheet_names = xls.sheet_names
 
     # Show the Tkinter window for dropdown selection
     root.deiconify()
@@ -112,9 +262,12 @@ def select_file_and_columns():
     sheet_name_var.set(sheet_names[0])  # Set default value to the first sheet
     sheet_name_var.pack(padx=10, pady=5)
 
-    # Step 4: Read the selected sheet to get the columns
-    df = pd.read_excel(file_path, sheet_name=sheet_name_var.get())
-    columns = df.columns.tolist()
+    # Step 4: Read the selected sheet's header row to get the columns
+    if is_capture:
+        columns = ["t_us"] + Capture(file_path).columns
+    else:
+        df = pd.read_excel(xls, sheet_name=sheet_name_var.get(), nrows=0)
+        columns = df.columns.tolist()
 
     # Step 5: Add labels and dropdowns for time and magnetometer columns
     time_label = Label(root, text="Select Time Column:")
@@ -136,7 +289,7 @@ def select_file_and_columns():
         magnetometer_column = magnetometer_column_var.get()
 
         # Ask the user for the output file name (optional)
-        output_file = filedialog.asksaveasfilename(title="Save PSD Data", defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
+        output_file = filedialog.asksaveasfilename(title="Save PSD Data", defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx"), ("Hall captures", "*.hcap")])
 
         # Call the function to compute and plot PSD
         compute_psd_from_xls(file_path, sheet_name, time_column, magnetometer_column, output_file)
@@ -151,4 +304,5 @@ def select_file_and_columns():
     root.mainloop()
 
 # Run the file selector
-select_file_and_columns()
+if __name__ == "__main__":
+    select_file_and_columns()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+psd_batch.py
+Headless PSD processing for whole recording directories.
+
+    python psd_batch.py Data/ -o Out --format xlsx
+    python psd_batch.py "Data/*_200Hz.wav" -o Out --nperseg 128000 --suffix _psd_128k
+    python psd_batch.py Logs/*.xlsx --time-column 0 --column 1 -j 4
+    python psd_batch.py Data/ --band 10:20 --nperseg 2000000 --suffix _psd_zoom
+    python psd_batch.py Data/ --bandwidth 200 --format hcap --suffix _psd_lf
+    python psd_batch.py Logs/*.hcap --timing lombscargle --suffix _psd_ls
+    python psd_batch.py Data/ --nperseg 8000 128000 --format hcap --suffix _psd_multi
+
+WAV files go through wav_psd (normalized amplitude, Hann/50% Welch, large
+files streamed out of core); XLSX/CSV tables and .hcap captures go through
+psd (time column -> fs, Welch). Several --nperseg values write one
+multi-resolution product per input, WAVs in a single pass (wav_psd.multi_psd_from_wav). Files are spread over a process pool,
+largest first, so a campaign takes about as long as its slowest file.
+No plotting or GUI modules are imported.
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+WAV_EXTS = (".wav",)
+TABLE_EXTS = (".xlsx", ".xls", ".csv", ".hcap")
+FORMATS = ("xlsx", "csv", "hcap")
+
+# --- Input discovery ---
+
+def is_psd_product(path: str) -> bool:
+    """
+    True for a PSD output rather than a recording: a .hcap of kind "psd" /
+    "psd_multi", or a table whose header names a frequency and a PSD
+    column (export_psd here, in psd.py and wav_psd.py).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".hcap":
+            from hallcap import Capture
+            cap = Capture(path)
+            kind = cap.meta.get("kind")
+            cap.close()
+            return kind in ("psd", "psd_multi")
+        if ext == ".csv":
+            with open(path, encoding="utf-8", errors="ignore") as fh:
+                header = fh.readline().split(",")
+        elif ext == ".xlsx":
+            from openpyxl import load_workbook
+            wb = load_workbook(path, read_only=True)
+            header = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+            wb.close()
+        else:
+            return False
+    except Exception:
+        return False    # unreadable: left to the worker, which reports it
+    lower = [str(c).lower() for c in header]
+    return any("freq" in c for c in lower) and any("psd" in c or "density" in c for c in lower)
+
+def collect_inputs(patterns, recursive: bool = False, suffix: str | None = None) -> list[str]:
+    """
+    Expand files, directories and glob patterns to supported recordings.
+    Earlier outputs are left out: names ending in `suffix` and PSD
+    products (is_psd_product), so a rerun next to the inputs does not
+    compute PSDs of PSDs.
+    """
+    exts = WAV_EXTS + TABLE_EXTS
+    found = []
+    for pat in patterns:
+        if os.path.isdir(pat):
+            pat = os.path.join(pat, "**" if recursive else "", "*")
+        paths = glob.glob(pat, recursive=True) if glob.has_magic(pat) else [pat]
+        for p in sorted(paths):
+            if not (os.path.isfile(p) and p.lower().endswith(exts)):
+                continue
+            if suffix and os.path.splitext(os.path.basename(p))[0].endswith(suffix):
+                continue
+            if not p.lower().endswith(WAV_EXTS) and is_psd_product(p):
+                continue
+            found.append(os.path.normpath(p))
+    return list(dict.fromkeys(found))
+
+def output_path(path: str, out_dir: str | None, suffix: str, fmt: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(out_dir or os.path.dirname(path), f"{stem}{suffix}.{fmt}")
+
+def _band(value: str):
+    """LO:HI in Hz for --band."""
+    lo, hi = (float(v) for v in value.split(":"))
+    if not 0 <= lo < hi:
+        raise argparse.ArgumentTypeError(f"band must be LO:HI with 0 <= LO < HI, got {value!r}")
+    return lo, hi
+
+def _column(value: str):
+    """Column names from the command line; plain integers select by position."""
+    return int(value) if value.lstrip("-").isdigit() else value
+
+# --- Worker ---
+
+def process_file(job: dict) -> dict:
+    """
+    Compute and save one PSD. Runs in a pool worker, so it only takes and
+    returns plain dicts; errors are reported rather than raised.
+    """
+    path, out = job["path"], job["output"]
+    result = {"path": path, "output": out, "error": None}
+    t0 = time.perf_counter()
+    try:
+        npersegs = job["nperseg"] or []
+        if len(npersegs) > 1:
+            import wav_psd
+            if job["band"] or job["bandwidth"]:
+                raise ValueError("several --nperseg values do not combine with --band/--bandwidth")
+            if path.lower().endswith(WAV_EXTS):
+                fs, psds, _ = wav_psd.multi_psd_from_wav(path, job["channel"], npersegs, job["cache"])
+                segs = [int(seg) for _, _, seg in psds.values()]
+                psds = {wav_psd.resolution_label(n): (f, Pxx) for n, (f, Pxx, _) in psds.items()}
+                meta = {"channel": job["channel"]}
+            else:
+                import psd
+                psds = {}
+                for n in npersegs:
+                    res = psd.psd_for_file(path, job["sheet"], job["time_column"], job["column"],
+                                           n, job["cache"], None, job["timing"])
+                    if res is None:
+                        raise ValueError("required columns not found")
+                    fs, f, Pxx = res
+                    psds[wav_psd.resolution_label(n)] = (f, Pxx)
+                segs, meta = list(npersegs), {}
+            result["output"] = wav_psd.export_multi_psd(out, psds, fs=float(fs), nperseg=segs,
+                                                        source=os.path.basename(path), **meta)
+            bins = sum(f.size for f, _ in psds.values())
+        elif path.lower().endswith(WAV_EXTS):
+            import wav_psd
+            streaming = job["stream"]
+            if streaming is None:
+                streaming = os.path.getsize(path) > wav_psd.STREAM_THRESHOLD
+            fs, f, Pxx, seg, ch_label, _, _ = wav_psd.psd_from_wav(
+                path, job["channel"], npersegs[0] if npersegs else 128000, streaming, job["cache"],
+                job["band"], job["bandwidth"])
+            extra = {} if job["bandwidth"] is None else {"bandwidth": job["bandwidth"]}
+            result["output"] = wav_psd.export_psd(
+                out, f, Pxx, fs=float(fs), nperseg=seg, channel=job["channel"],
+                source=os.path.basename(path), **extra)
+            bins = f.size
+        else:
+            import psd
+            res = psd.psd_for_file(path, job["sheet"], job["time_column"], job["column"],
+                                   npersegs[0] if npersegs else 1024, job["cache"], job["band"],
+                                   job["timing"])
+            if res is None:
+                raise ValueError("required columns not found")
+            fs, f, Pxx = res
+            psd.export_psd(out, f, Pxx, fs)
+            bins = f.size
+        result.update(fs=float(fs), bins=int(bins))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+# --- Driver ---
+
+def run_batch(jobs: list[dict], workers: int | None = None, verbose: bool = True) -> list[dict]:
+    """Run jobs over a process pool, largest input first; returns results in input order."""
+    order = sorted(jobs, key=lambda j: os.path.getsize(j["path"]), reverse=True)
+    results = {}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    if workers == 1:
+        done = (process_file(j) for j in order)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        done = (fut.result() for fut in as_completed([pool.submit(process_file, j) for j in order]))
+    try:
+        for res in done:
+            results[res["path"]] = res
+            if verbose:
+                if res["error"]:
+                    print(f"FAIL {res['path']}: {res['error']}", file=sys.stderr)
+                else:
+                    print(f"ok   {res['path']} -> {res['output']} "
+                          f"({res['bins']} bins, fs={res['fs']:g} Hz, {res['seconds']:.2f} s)")
+    finally:
+        if workers > 1:
+            pool.shutdown(cancel_futures=True)
+    return [results[j["path"]] for j in jobs]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Batch PSDs for WAV/XLSX/CSV/.hcap recordings (no GUI)")
+    ap.add_argument("inputs", nargs="+", help="files, directories or glob patterns")
+    ap.add_argument("-o", "--out", default=None, help="output directory (default: next to each input)")
+    ap.add_argument("--format", choices=FORMATS, default="xlsx")
+    ap.add_argument("--suffix", default="_psd", help="appended to the input name")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all CPUs)")
+    ap.add_argument("-r", "--recursive", action="store_true", help="search directories recursively")
+    ap.add_argument("--skip-existing", action="store_true",
+                    help="skip inputs whose output is newer than the input")
+    ap.add_argument("--nperseg", type=int, nargs="+", default=None,
+                    help="Welch segment length (default: 128000 for WAV, 1024 for tables); "
+                         "several write one multi-resolution product")
+    ap.add_argument("--channel", type=int, default=0, help="WAV channel index")
+    ap.add_argument("--band", type=_band, default=None, metavar="LO:HI",
+                    help="compute only this band (Hz) with zoom Welch, e.g. 10:20 with a long --nperseg")
+    ap.add_argument("--bandwidth", type=float, default=None, metavar="HZ",
+                    help="decimate WAVs to keep 0..HZ before Welch (--nperseg stays in input samples)")
+    stream = ap.add_mutually_exclusive_group()
+    stream.add_argument("--stream", dest="stream", action="store_true", default=None,
+                        help="always stream WAVs out of core")
+    stream.add_argument("--no-stream", dest="stream", action="store_false",
+                        help="always load WAVs into memory")
+    ap.add_argument("--no-cache", action="store_true", help="bypass the PSD cache (psd_cache.py)")
+    ap.add_argument("--timing", choices=("mean", "lombscargle", "resample"), default="mean",
+                    help="tables/captures: uniform at the mean rate, Lomb-Scargle on the timestamps, "
+                         "or resample to a uniform grid first")
+    ap.add_argument("--sheet", default="0", help="Excel sheet name or index")
+    ap.add_argument("--time-column", default="0", help="time column name or index")
+    ap.add_argument("--column", default="1", help="magnetometer column name or index")
+    args = ap.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.recursive, args.suffix)
+    if not inputs:
+        print("No WAV/XLSX/CSV/.hcap recordings found.", file=sys.stderr)
+        return 1
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    jobs, seen = [], {}
+    for path in inputs:
+        out = output_path(path, args.out, args.suffix, args.format)
+        if out in seen:
+            print(f"{path} and {seen[out]} would both write {out}; use separate runs or --out",
+                  file=sys.stderr)
+            return 2
+        seen[out] = path
+        if args.skip_existing and os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(path):
+            continue
+        jobs.append({"path": path, "output": out, "nperseg": args.nperseg,
+                     "channel": args.channel, "stream": args.stream, "cache": not args.no_cache,
+                     "sheet": _column(args.sheet), "time_column": _column(args.time_column),
+                     "column": _column(args.column), "band": args.band,
+                     "bandwidth": args.bandwidth, "timing": args.timing})
+
+    t0 = time.perf_counter()
+    results = run_batch(jobs, args.jobs)
+    failed = sum(r["error"] is not None for r in results)
+    slowest = max((r["seconds"] for r in results), default=0.0)
+    print(f"{len(results) - failed}/{len(results)} PSDs in {time.perf_counter() - t0:.2f} s "
+          f"(slowest file {slowest:.2f} s, {len(inputs) - len(jobs)} up to date)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+psd_cache.py
+Content-addressed cache for PSD results and parsed tables.
+
+Entries are keyed by a hash of the input file's content plus the analysis
+parameters, so renaming or copying a recording still hits and editing it
+misses. Each entry is a small float64 .hcap file (columns + JSON metadata)
+that is memory-mapped on read. The cache is bounded in bytes; least recently
+used entries are evicted first (a hit refreshes the entry's mtime).
+
+Content hashes are memoized by (path, size, mtime), so a multi-gigabyte
+WAV is hashed once, not on every lookup.
+
+Environment:
+    HALL_PSD_CACHE      cache directory, or "off" to disable
+    HALL_PSD_CACHE_MB   size bound in MB (default 512)
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+from hallcap import Capture, CaptureWriter
+
+CACHE_DIR = os.environ.get("HALL_PSD_CACHE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "hallarray", "psd")
+MAX_BYTES = int(float(os.environ.get("HALL_PSD_CACHE_MB", 512)) * 1024**2)
+HASH_CHUNK = 1 << 22
+
+class PSDCache:
+    """
+    get/put by key, plus cached() which wraps a compute function.
+    Writes are atomic (temp file + rename), so pool workers can share a cache.
+    """
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self._digests_path = os.path.join(root, "digests.json")
+        self._digests = None
+
+    # --- Keys ---
+
+    def digest(self, path: str) -> str:
+        """BLAKE2b of the file content, memoized by path, size and mtime."""
+        st = os.stat(path)
+        real = os.path.realpath(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        if self._digests is None:
+            try:
+                with open(self._digests_path) as fh:
+                    self._digests = json.load(fh)
+            except (OSError, ValueError):
+                self._digests = {}
+        known = self._digests.get(real)
+        if known and known[:2] == stamp:
+            return known[2]
+
+        h = hashlib.blake2b(digest_size=16)
+        buf = bytearray(HASH_CHUNK)
+        view = memoryview(buf)
+        with open(path, "rb") as fh:
+            while n := fh.readinto(buf):
+                h.update(view[:n])
+        d = h.hexdigest()
+        self._digests[real] = stamp + [d]
+        self._write_json(self._digests_path, self._digests)
+        return d
+
+    def key(self, path: str, kind: str, **params) -> str:
+        """Entry key for a file's content, a result kind and its parameters."""
+        desc = json.dumps({"content": self.digest(path), "kind": kind, **params},
+                          sort_keys=True, default=str)
+        return hashlib.blake2b(desc.encode(), digest_size=16).hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".hcap")
+
+    # --- Entries ---
+
+    def get(self, key: str):
+        """(columns dict, meta) for a stored entry, or None."""
+        path = self._entry(key)
+        try:
+            cap = Capture(path)
+            _, data = cap.read_rows(scaled=False)
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        arrays = {name: data[:, i] for i, name in enumerate(cap.columns)}
+        return arrays, cap.meta.get("result", {})
+
+    def put(self, key: str, arrays: dict, **meta):
+        """Store equal-length 1-D arrays under key, then evict down to max_bytes."""
+        path = self._entry(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)      # CaptureWriter would append to a leftover
+        names = list(arrays)
+        table = np.column_stack([np.asarray(arrays[n], dtype=np.float64) for n in names])
+        with CaptureWriter(tmp, names, dtype="float64", kind="cache", timestamps=False,
+                           chunk_rows=max(1, table.shape[0]), extra={"result": meta}) as w:
+            w.append(table)
+        os.replace(tmp, path)
+        self.evict()
+
+    def cached(self, key: str, compute):
+        """
+        Return the entry for key, or call compute() -> (arrays, meta),
+        store it and return it.
+        """
+        hit = self.get(key)
+        if hit is not None:
+            return hit
+        arrays, meta = compute()
+        self.put(key, arrays, **meta)
+        return arrays, meta
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".hcap"):
+                    p = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime_ns, st.st_size, p))
+        total = sum(e[1] for e in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        self.max_bytes, limit = 0, self.max_bytes
+        self.evict()
+        self.max_bytes = limit
+
+    @staticmethod
+    def _write_json(path: str, obj):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(obj, fh)
+        os.replace(tmp, path)
+
+_default = None
+
+def default_cache() -> PSDCache | None:
+    """Process-wide cache, or None when HALL_PSD_CACHE=off."""
+    global _default
+    if CACHE_DIR == "off":
+        return None
+    if _default is None:
+        _default = PSDCache()
+    return _default
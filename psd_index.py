@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+psd_index.py
+Spectral feature index over PSD products (XLSX/CSV from psd.py and
+wav_psd.py, or .hcap PSDs).
+
+For every PSD the index stores:
+  - peaks:  local maxima of log10(PSD) with at least PEAK_PROMINENCE_DB of
+            prominence, refined by parabolic interpolation of log10(PSD)
+            over the three bins around the maximum (sub-bin frequency and
+            level), with the SNR over the local median floor
+  - bands:  power in each band, sum(PSD) * df over f in [lo, hi)
+  - floor:  median PSD above FLOOR_MIN_HZ (robust to peaks)
+and tags parsed from the Out/ naming scheme, e.g.
+
+    BB_still_psd_128k     location BB,       speed still, resolution 128k
+    SMBB-WEB_fast_200Hz   location SMBB-WEB, speed fast,  resolution 200Hz
+    SMBB-WEB_still_notch  location SMBB-WEB, speed still, variant notch
+    8k_slow               speed slow, resolution 8k
+    walking2.2            speed walking, variant 2.2
+
+Multi-resolution products (wav_psd.export_multi_psd) add one entry per
+resolution, named file[label] with that label as the resolution tag.
+
+The index is one small .npz of structured arrays, so queries never reopen
+the PSD files:
+
+    python psd_index.py build Out
+    python psd_index.py peak 15.5 --tol 0.5
+    python psd_index.py band "5-20 Hz" --resolution 128k
+"""
+
+import os
+import re
+import sys
+import glob
+import argparse
+import numpy as np
+
+INDEX_FILE = os.path.join("Out", "psd_index.npz")
+PSD_EXTS = (".xlsx", ".csv", ".hcap")
+
+SPEEDS = ("still", "slow", "fast", "walking")
+SPEED_MPS = {"still": 0.0, "slow": 1.2, "fast": 2.0}     # estimated walking speeds
+RESOLUTION_RE = re.compile(r"^\d+(\.\d+)?(k|Hz)$", re.IGNORECASE)
+
+BANDS = {
+    "0.5-5 Hz": (0.5, 5.0),
+    "5-20 Hz": (5.0, 20.0),
+    "20-45 Hz": (20.0, 45.0),
+    "45-65 Hz": (45.0, 65.0),       # mains
+    "65-200 Hz": (65.0, 200.0),
+    "200-1000 Hz": (200.0, 1000.0),
+    "1-8 kHz": (1000.0, 8000.0),
+}
+PEAK_PROMINENCE_DB = 3.0
+MAX_PEAKS = 64              # strongest peaks kept per PSD
+FLOOR_MIN_HZ = 1.0
+LOCAL_FLOOR_HZ = 5.0        # half-width of the window for a peak's local floor
+
+FILE_DTYPE = np.dtype([
+    ("name", "U64"), ("path", "U256"), ("location", "U32"), ("speed", "U16"),
+    ("speed_mps", "f8"), ("resolution", "U16"), ("variant", "U32"),
+    ("df", "f8"), ("f_max", "f8"), ("noise_floor", "f8"),
+])
+PEAK_DTYPE = np.dtype([
+    ("file", "i4"), ("freq", "f8"), ("psd", "f8"), ("freq_interp", "f8"),
+    ("psd_interp", "f8"), ("prominence_db", "f8"), ("snr_db", "f8"),
+])
+
+# --- Names ---
+
+def parse_name(name: str) -> dict:
+    """location / speed / resolution / variant tags from an Out/ file name."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    tags = {"location": "", "speed": "", "resolution": "", "variant": ""}
+    extra = []
+    for i, tok in enumerate(stem.split("_")):
+        low = tok.lower()
+        speed = next((s for s in SPEEDS if low.startswith(s)), None)
+        if low == "psd":
+            continue
+        if RESOLUTION_RE.match(tok) and not tags["resolution"]:
+            tags["resolution"] = tok
+        elif speed and not tags["speed"]:
+            tags["speed"] = speed
+            if tok[len(speed):]:
+                extra.append(tok[len(speed):])
+        elif i == 0:
+            tags["location"] = tok
+        else:
+            extra.append(tok)
+    tags["variant"] = "_".join(extra)
+    return tags
+
+# --- Features ---
+
+def find_peaks_interp(f: np.ndarray, Pxx: np.ndarray, prominence_db: float = PEAK_PROMINENCE_DB,
+                      max_peaks: int = MAX_PEAKS):
+    """
+    Peaks of a PSD as a PEAK_DTYPE array (file = -1). Detection and
+    interpolation run on log10(PSD), where spectral peaks are close to
+    parabolic.
+    """
+    from scipy.signal import find_peaks
+    tiny = np.finfo(np.float64).tiny
+    L = np.log10(np.maximum(Pxx, tiny))
+    k, props = find_peaks(L, prominence=prominence_db / 10.0)
+    if k.size > max_peaks:
+        keep = np.argsort(props["prominences"])[::-1][:max_peaks]
+        k, prom = k[np.sort(keep)], props["prominences"][np.sort(keep)]
+    else:
+        prom = props["prominences"]
+
+    a, b, c = L[k - 1], L[k], L[k + 1]
+    den = a - 2 * b + c
+    delta = np.where(den < 0, 0.5 * (a - c) / np.where(den < 0, den, -1.0), 0.0)
+    df = f[1] - f[0]
+    level = b - 0.25 * (a - c) * delta
+
+    # Local floor: median of the surrounding window
+    half = max(1, int(round(LOCAL_FLOOR_HZ / df)))
+    floor = np.array([np.median(Pxx[max(0, i - half):i + half + 1]) for i in k])
+
+    out = np.zeros(k.size, dtype=PEAK_DTYPE)
+    out["file"] = -1
+    out["freq"], out["psd"] = f[k], Pxx[k]
+    out["freq_interp"] = f[k] + delta * df
+    out["psd_interp"] = 10.0 ** level
+    out["prominence_db"] = 10.0 * prom
+    out["snr_db"] = 10.0 * (level - np.log10(np.maximum(floor, tiny)))
+    return out
+
+def band_powers(f: np.ndarray, Pxx: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Power in each [lo, hi) band, integrated as sum(Pxx) * df with a cumulative sum."""
+    df = f[1] - f[0]
+    cum = np.concatenate(([0.0], np.cumsum(Pxx, dtype=np.float64)))
+    lo = np.searchsorted(f, edges[:, 0], side="left")
+    hi = np.searchsorted(f, edges[:, 1], side="left")
+    power = (cum[hi] - cum[lo]) * df
+    return np.where(hi > lo, power, np.nan)
+
+def extract(f: np.ndarray, Pxx: np.ndarray, edges: np.ndarray):
+    """(peaks, band powers, noise floor) of one PSD."""
+    floor_mask = f >= FLOOR_MIN_HZ
+    floor = float(np.median(Pxx[floor_mask])) if floor_mask.any() else np.nan
+    return find_peaks_interp(f, Pxx), band_powers(f, Pxx, edges), floor
+
+# --- Index ---
+
+def build_index(paths, out: str = INDEX_FILE, bands: dict | None = None,
+                verbose: bool = True) -> "PSDIndex":
+    """
+    Extract features from PSD files (directories are scanned for
+    XLSX/CSV/.hcap) and write the index. Files that are not PSDs are skipped.
+    """
+    from psd_overlay import load_psd_resolutions
+    bands = bands or BANDS
+    edges = np.array(list(bands.values()), dtype=np.float64).reshape(-1, 2)
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(q for q in glob.glob(os.path.join(p, "*")) if q.lower().endswith(PSD_EXTS))
+        else:
+            files.append(p)
+
+    rows, peaks, powers = [], [], []
+    for p in files:
+        try:
+            products = load_psd_resolutions(p)
+        except Exception as e:
+            if verbose:
+                print(f"skip {p}: {e}", file=sys.stderr)
+            continue
+        tags = parse_name(p)
+        for label, (f, Pxx) in products.items():
+            # multi-resolution products give one entry per resolution, named file[label]
+            name = os.path.basename(p) + (f"[{label}]" if label else "")
+            f, Pxx = np.asarray(f, dtype=np.float64), np.asarray(Pxx, dtype=np.float64)
+            if f.size < 3 or not np.all(np.diff(f) > 0):
+                if verbose:
+                    print(f"skip {name}: not a PSD", file=sys.stderr)
+                continue
+            pk, pw, floor = extract(f, Pxx, edges)
+            pk["file"] = len(rows)
+            rows.append((name, p, tags["location"], tags["speed"],
+                         SPEED_MPS.get(tags["speed"], np.nan), label or tags["resolution"],
+                         tags["variant"], f[1] - f[0], f[-1], floor))
+            peaks.append(pk)
+            powers.append(pw)
+            if verbose:
+                print(f"{name}: {pk.size} peaks, floor {floor:.3g}")
+
+    index = PSDIndex(
+        np.array(rows, dtype=FILE_DTYPE),
+        np.concatenate(peaks) if peaks else np.zeros(0, PEAK_DTYPE),
+        np.array(list(bands), dtype="U32"), edges,
+        np.array(powers, dtype=np.float64).reshape(len(rows), len(bands)))
+    if out:
+        index.save(out)
+    return index
+
+class PSDIndex:
+    """
+    In-memory view of the index. Selections return masks over `files`;
+    queries return structured arrays with one row per selected file.
+    """
+    def __init__(self, files, peaks, band_names, band_edges, band_power):
+        self.files = files
+        self.peaks = peaks
+        self.band_names = band_names
+        self.band_edges = band_edges
+        self.band_power = band_power
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> "PSDIndex":
+        with np.load(path) as z:
+            return cls(z["files"], z["peaks"], z["band_names"], z["band_edges"], z["band_power"])
+
+    def save(self, path: str = INDEX_FILE):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, files=self.files, peaks=self.peaks, band_names=self.band_names,
+                 band_edges=self.band_edges, band_power=self.band_power)
+        os.replace(tmp, path)
+
+    def select(self, location=None, speed=None, resolution=None, variant=None) -> np.ndarray:
+        """Mask of files matching every given tag (a value or a list of values)."""
+        mask = np.ones(self.files.size, dtype=bool)
+        for field, want in (("location", location), ("speed", speed),
+                            ("resolution", resolution), ("variant", variant)):
+            if want is not None:
+                mask &= np.isin(self.files[field], np.atleast_1d(want))
+        return mask
+
+    def peak_at(self, freq: float, tol: float | None = None, **tags) -> np.ndarray:
+        """
+        Strongest peak within tol of freq (default: one bin, at least 0.5 Hz)
+        for each selected file; NaN where there is none.
+        """
+        sel = np.flatnonzero(self.select(**tags))
+        p = self.peaks
+        tol_f = np.maximum(self.files["df"][p["file"]], 0.5) if tol is None else tol
+        near = np.isin(p["file"], sel) & (np.abs(p["freq_interp"] - freq) <= tol_f)
+        p = p[near]
+        # Sort by file, then level, so the last row of each file is its strongest
+        p = p[np.lexsort((p["psd_interp"], p["file"]))]
+        last = np.flatnonzero(np.r_[p["file"][1:] != p["file"][:-1], True]) if p.size else []
+        best = {int(r["file"]): r for r in p[last]}
+
+        dtype = np.dtype(FILE_DTYPE.descr + [(n, PEAK_DTYPE[n]) for n in PEAK_DTYPE.names[1:]])
+        out = np.zeros(sel.size, dtype=dtype)
+        for name in FILE_DTYPE.names:
+            out[name] = self.files[name][sel]
+        for name in PEAK_DTYPE.names[1:]:
+            out[name] = [best[i][name] if i in best else np.nan for i in sel]
+        return out
+
+    def band(self, name: str, **tags):
+        """(files, power) of one band for the selected files."""
+        j = int(np.flatnonzero(self.band_names == name)[0])
+        mask = self.select(**tags)
+        return self.files[mask], self.band_power[mask, j]
+
+def load_or_build(path: str = INDEX_FILE, source: str | None = None) -> PSDIndex:
+    """Load the index, building it from the PSDs next to it if it does not exist yet."""
+    if not os.path.exists(path):
+        build_index([source or os.path.dirname(path) or "."], path)
+    return PSDIndex.load(path)
+
+# --- CLI ---
+
+def _print_rows(rows, columns):
+    print("  ".join(f"{c:>14s}" for c in columns))
+    for r in rows:
+        print("  ".join(f"{r[c]:>14.4g}" if isinstance(r[c], (float, np.floating))
+                        else f"{str(r[c]):>14s}" for c in columns))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Spectral feature index over PSD products")
+    ap.add_argument("--index", default=INDEX_FILE)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="extract features from PSD files or directories")
+    b.add_argument("paths", nargs="*", default=["Out"])
+    b.add_argument("--band", action="append", default=[], metavar="LO:HI",
+                   help="band in Hz (repeatable; replaces the default bands)")
+    for name in ("peak", "band"):
+        q = sub.add_parser(name)
+        q.add_argument("value", type=float if name == "peak" else str,
+                       help="peak frequency in Hz" if name == "peak" else "band name")
+        if name == "peak":
+            q.add_argument("--tol", type=float, default=None, help="frequency tolerance in Hz")
+        q.add_argument("--location", action="append")
+        q.add_argument("--speed", action="append")
+        q.add_argument("--resolution", action="append")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        bands = None
+        if args.band:
+            bands = {f"{lo}-{hi} Hz": (float(lo), float(hi))
+                     for lo, hi in (s.split(":") for s in args.band)}
+        index = build_index(args.paths, args.index, bands)
+        print(f"{index.files.size} PSDs, {index.peaks.size} peaks -> {args.index}")
+        return 0
+
+    index = PSDIndex.load(args.index)
+    tags = dict(location=args.location, speed=args.speed, resolution=args.resolution)
+    if args.cmd == "peak":
+        rows = index.peak_at(args.value, args.tol, **tags)
+        _print_rows(rows, ["name", "location", "speed", "freq_interp", "psd", "psd_interp", "snr_db"])
+    else:
+        files, power = index.band(args.value, **tags)
+        print(f"{'name':>32s}  {'power':>12s}")
+        for r, pw in zip(files, power):
+            print(f"{r['name']:>32s}  {pw:12.4g}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,91 @@
 #!/usr/bin/env python3
 """
 overlay_psd_interactive.py
-Overlay three PSD Excel files (frequency vs PSD) on one interactive plot.
+Overlay PSDs (frequency vs PSD) on one interactive plot. Curves come from
+the common-grid PSD tensor (psd_tensor.py), built from Out/ on first use
+and rebuilt when a PSD there changes, at the finest source resolution,
+so any selection of location / speed / resolution plots without reading
+the PSD files again.
 """
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
+from hallcap import read_psd, read_psd_multi
+from psd_cache import default_cache
 
 # ------------------------------------------------------------
 # User-configurable section
 # ------------------------------------------------------------
-files = {
-    "Still": "Out/BB_still_psd_128k.xlsx",
-    "Slow":  "Out/BB_slow_psd_128k.xlsx",
-    "Fast":  "Out/BB_fast_psd_128k.xlsx",
-}
+select = {"location": "BB", "resolution": "128k"}   # tags to overlay; a value or a list each, e.g. "speed": ["still", "fast"]
 title = "Baseball Path PSD Speed Comparison"
 fmin, fmax = 0, 500       # frequency limits (set to None to disable)
 use_log_y = False          # set True for log y-axis
 # ------------------------------------------------------------
 
 def load_psd(path: Path):
-    """Auto-detect frequency and PSD columns."""
-    df = pd.read_excel(path)
+    """Auto-detect frequency and PSD columns (parsed workbooks are cached)."""
+    if Path(path).suffix.lower() == ".hcap":
+        f, p = read_psd(str(path))
+        order = np.argsort(f)
+        return f[order], p[order]
+    store = default_cache()
+    if store is None:
+        return _parse_psd_table(path)
+    arrays, _ = store.cached(store.key(str(path), "psd_table"),
+                             lambda: (dict(zip(("f", "Pxx"), _parse_psd_table(path))), {}))
+    return arrays["f"], arrays["Pxx"]
+
+def load_psd_resolutions(path: Path) -> dict:
+    """
+    {resolution: (f, Pxx)} of a PSD file. Multi-resolution products
+    (wav_psd.export_multi_psd: .hcap blocks, .xlsx sheets or a .csv
+    Resolution column) give one entry per resolution, others {"": (f, Pxx)}.
+    Parsed tables are cached like load_psd, one entry per file.
+    """
+    if Path(path).suffix.lower() == ".hcap":
+        out = {}
+        for label, (f, p) in read_psd_multi(str(path)).items():
+            order = np.argsort(f)
+            out[label] = f[order], p[order]
+        return out
+    store = default_cache()
+    if store is None:
+        return _parse_psd_tables(path)
+    def parse():
+        tables = _parse_psd_tables(path)
+        bounds = np.cumsum([0] + [f.size for f, _ in tables.values()]).tolist()
+        return ({"f": np.concatenate([f for f, _ in tables.values()]),
+                 "Pxx": np.concatenate([p for _, p in tables.values()])},
+                {"resolutions": dict(zip(tables, zip(bounds[:-1], bounds[1:])))})
+    arrays, meta = store.cached(store.key(str(path), "psd_tables"), parse)
+    return {label: (arrays["f"][a:b], arrays["Pxx"][a:b]) for label, (a, b) in meta["resolutions"].items()}
+
+def _parse_psd_tables(path: Path) -> dict:
+    """Every PSD table in a workbook (one per sheet) or CSV (one per Resolution value)."""
+    if Path(path).suffix.lower() == ".csv":
+        df = pd.read_csv(path)
+        if "Resolution" not in df.columns:
+            return {"": _psd_columns(df)}
+        sheets = {str(label): g.drop(columns="Resolution") for label, g in df.groupby("Resolution", sort=False)}
+    else:
+        sheets = pd.read_excel(path, sheet_name=None)
+        if len(sheets) == 1:
+            return {"": _psd_columns(next(iter(sheets.values())))}
+    tables = {}
+    for name, df in sheets.items():
+        try:
+            tables[str(name)] = _psd_columns(df)
+        except (IndexError, ValueError):
+            continue    # a sheet without frequency/PSD columns
+    if not tables:
+        raise ValueError("no PSD table found")
+    return tables
+
+def _parse_psd_table(path: Path):
+    return _psd_columns(pd.read_excel(path))
+
+def _psd_columns(df):
     df = df.dropna(axis=1, how='all')
     cols = list(df.columns)
     lower = {c: str(c).lower() for c in cols}
@@ -46,21 +107,11 @@ def load_psd(path: Path):
 # ------------------------------------------------------------
 # Load and plot all PSDs
 # ------------------------------------------------------------
-plt.figure(figsize=(10, 5.5))
-for label, fname in files.items():
-    f, p = load_psd(Path(fname))
-    if fmin is not None or fmax is not None:
-        mask = (f >= (fmin or -np.inf)) & (f <= (fmax or np.inf))
-        f, p = f[mask], p[mask]
-    plt.plot(f, p, label=label)
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from psd_tensor import load_or_build, plot_overlay
 
-plt.title(title)
-plt.xlabel("Frequency (Hz)")
-plt.ylabel("Power Spectral Density")
-if use_log_y:
-    plt.yscale("log")
-plt.grid(True)
-plt.legend()
-plt.tight_layout()
+    plot_overlay(load_or_build(), fmin, fmax, use_log_y, title, **select)
+    plt.tight_layout()
 
-plt.show()  # opens interactive matplotlib window
+    plt.show()  # opens interactive matplotlib window
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+psd_tensor.py
+Every PSD product on one frequency grid, as a (location x speed x
+resolution x frequency) array, and cross-condition comparisons computed
+over it in one vectorized pass.
+
+    python psd_tensor.py build Out                       # linear grid, finest source bin spacing
+    python psd_tensor.py build Out --df 0.5              # coarser linear grid
+    python psd_tensor.py build Out --log 4096            # log-spaced grid
+    python psd_tensor.py lsd --resolution 128k --band 1:200
+    python psd_tensor.py bands --resolution 128k --speed still
+    python psd_tensor.py ratio --location BB --resolution 128k --ref still --band 10:20
+    python psd_tensor.py overlay --location BB --resolution 128k --fmax 500
+
+Each PSD is read once (through psd_overlay.load_psd_resolutions and the
+PSD cache) and tagged by psd_index.parse_name; a multi-resolution product
+fills one resolution per segment length. It is then resampled onto the grid
+through its cumulative integral: grid cells wider than the source bins
+get the mean density over the cell, which preserves band power. Narrower
+cells are linearly interpolated. Cells outside a file's range, and
+conditions with no file, are NaN. Files with a variant tag (notch, 2.2,
+...) are left out unless asked for. The tensor is saved as one .npz, so
+overlays and comparison matrices never reopen the PSD files; it records
+the files it was built from and load_or_build rebuilds it when one of them
+is newer, or files were added or removed.
+
+Comparisons over n selected conditions (labels "location/speed/resolution"):
+  lsd        log-spectral distance, RMS of the dB difference, (n x n)
+  ratio      spectral ratio in dB against a reference speed at the same
+             location and resolution, (L x S x R x F)
+  bands      power per band in dB relative to each other, (n x n x bands)
+"""
+
+import os
+import sys
+import glob
+import argparse
+import numpy as np
+from psd_index import parse_name, BANDS, PSD_EXTS, SPEEDS
+
+TENSOR_FILE = os.path.join("Out", "psd_tensor.npz")
+GRID_DF = None          # Hz, linear grid spacing; None: the finest source bin spacing
+LOG_F_MIN = 0.1         # Hz, lowest frequency of a log grid
+
+# --- Grid ---
+
+def linear_grid(f_max: float, df: float) -> np.ndarray:
+    return np.arange(0.0, f_max + df / 2, df)
+
+def log_grid(f_max: float, n: int, f_min: float = LOG_F_MIN) -> np.ndarray:
+    return np.geomspace(f_min, f_max, n)
+
+def cell_edges(grid: np.ndarray) -> np.ndarray:
+    """Edges of the cells centred on the grid points (midpoints, mirrored at the ends)."""
+    mid = 0.5 * (grid[1:] + grid[:-1])
+    return np.concatenate(([grid[0] - (mid[0] - grid[0])], mid, [grid[-1] + (grid[-1] - mid[-1])]))
+
+def regrid(f: np.ndarray, Pxx: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """
+    A PSD on new frequencies: cells at least as wide as the source bins get
+    the mean density over the cell, from the cumulative integral of the
+    bins (band power is preserved); narrower cells are interpolated.
+    NaN outside the source range.
+    """
+    src = cell_edges(f)
+    cum = np.concatenate(([0.0], np.cumsum(Pxx * np.diff(src))))
+    edges = cell_edges(grid)
+    lo, hi = np.maximum(edges[:-1], src[0]), np.minimum(edges[1:], src[-1])
+    width = np.maximum(hi - lo, np.finfo(np.float64).tiny)
+    mean = (np.interp(hi, src, cum) - np.interp(lo, src, cum)) / width
+    narrow = np.diff(edges) < np.interp(grid, f, np.diff(src))
+    out = np.where(narrow, np.interp(grid, f, Pxx), mean)
+    return np.where((grid >= f[0]) & (grid <= f[-1]), out, np.nan)
+
+# --- Tensor ---
+
+def _axis(values, order=()) -> list[str]:
+    """Distinct tags, known ones in `order` first, the rest sorted."""
+    values = set(values)
+    return [v for v in order if v in values] + sorted(values - set(order))
+
+class PSDTensor:
+    """
+    P[location, speed, resolution, frequency] on the grid f, with the source
+    file name of every cell ("" where no file), and the paths it was built
+    from. Selections take a value or a list for each of location / speed /
+    resolution; None keeps the axis.
+    """
+    AXES = ("location", "speed", "resolution")
+
+    def __init__(self, f, P, locations, speeds, resolutions, names, sources=()):
+        self.f = np.asarray(f)
+        self.P = np.asarray(P)
+        self.locations = np.asarray(locations)
+        self.speeds = np.asarray(speeds)
+        self.resolutions = np.asarray(resolutions)
+        self.names = np.asarray(names)
+        self.sources = np.asarray(sources, dtype=str)
+
+    @classmethod
+    def load(cls, path: str = TENSOR_FILE) -> "PSDTensor":
+        with np.load(path) as z:
+            return cls(z["f"], z["P"], z["locations"], z["speeds"], z["resolutions"], z["names"],
+                       z["sources"] if "sources" in z.files else ())
+
+    def save(self, path: str = TENSOR_FILE):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, f=self.f, P=self.P, locations=self.locations, speeds=self.speeds,
+                 resolutions=self.resolutions, names=self.names, sources=self.sources)
+        os.replace(tmp, path)
+
+    def mask(self, location=None, speed=None, resolution=None) -> np.ndarray:
+        """(L, S, R) mask of conditions that have a PSD and match the tags."""
+        m = self.names != ""
+        for ax, (axis, want) in enumerate(zip((self.locations, self.speeds, self.resolutions),
+                                              (location, speed, resolution))):
+            if want is not None:
+                shape = [1, 1, 1]
+                shape[ax] = -1
+                m = m & np.isin(axis, np.atleast_1d(want)).reshape(shape)
+        return m
+
+    def sel(self, band=None, **tags):
+        """(labels, f, P (n, F)) of the selected conditions, optionally within band=(lo, hi)."""
+        idx = np.argwhere(self.mask(**tags))
+        labels = [f"{self.locations[i] or '-'}/{self.speeds[j] or '-'}/{self.resolutions[k] or '-'}"
+                  for i, j, k in idx]
+        P = self.P[idx[:, 0], idx[:, 1], idx[:, 2]]
+        f = self.f
+        if band is not None:
+            keep = (f >= band[0]) & (f <= band[1])
+            f, P = f[keep], P[:, keep]
+        return labels, f, P
+
+    def band_power(self, edges) -> np.ndarray:
+        """Power in each [lo, hi) band for every cell, (L, S, R, bands); NaN if a band has gaps."""
+        edges = np.asarray(edges, dtype=np.float64).reshape(-1, 2)
+        w = np.diff(cell_edges(self.f))
+        gap = np.isnan(self.P)
+        cum = np.concatenate((np.zeros(self.P.shape[:-1] + (1,)),
+                              np.cumsum(np.where(gap, 0.0, self.P) * w, axis=-1)), axis=-1)
+        holes = np.concatenate((np.zeros(gap.shape[:-1] + (1,), int), np.cumsum(gap, axis=-1)), axis=-1)
+        lo = np.searchsorted(self.f, edges[:, 0], side="left")
+        hi = np.searchsorted(self.f, edges[:, 1], side="left")
+        power = cum[..., hi] - cum[..., lo]
+        bad = (holes[..., hi] - holes[..., lo] > 0) | (hi <= lo)
+        return np.where(bad, np.nan, power)
+
+# --- Comparisons ---
+
+def _db(P):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 10.0 * np.log10(np.where(P > 0, P, np.nan))
+
+def log_spectral_distance(P: np.ndarray) -> np.ndarray:
+    """
+    RMS dB difference between every pair of rows of P (n, F), over the
+    frequencies where all rows are finite and positive, as one matrix product.
+    """
+    L = _db(P)
+    L = L[:, np.all(np.isfinite(L), axis=0)]
+    if not L.shape[1]:
+        return np.full((P.shape[0],) * 2, np.nan)
+    L = L - L.mean(axis=0)      # differences are unchanged; avoids cancellation at large dB levels
+    sq = np.einsum("ij,ij->i", L, L)
+    d2 = (sq[:, None] + sq[None, :] - 2.0 * (L @ L.T)) / L.shape[1]
+    return np.sqrt(np.maximum(d2, 0.0))
+
+def spectral_ratio_db(P: np.ndarray, ref: np.ndarray) -> np.ndarray:
+    """10 log10(P_i / ref_j) for every row pair, (n, m, F)."""
+    return _db(P)[:, None, :] - _db(ref)[None, :, :]
+
+def ratio_to_speed(tensor: PSDTensor, speed: str) -> np.ndarray:
+    """dB ratio of every cell to the same location and resolution at `speed`, (L, S, R, F)."""
+    j = list(tensor.speeds).index(speed)
+    return _db(tensor.P) - _db(tensor.P[:, j:j + 1])
+
+def band_difference_db(B: np.ndarray) -> np.ndarray:
+    """Band power differences B_i - B_j in dB for rows of B (n, bands), (n, n, bands)."""
+    L = _db(B)
+    return L[:, None, :] - L[None, :, :]
+
+def compare(tensor: PSDTensor, band=None, bands: dict | None = None, **tags) -> dict:
+    """
+    Every comparison for the selected conditions at once: labels, the LSD
+    matrix over `band` (default: whole grid), and band power differences
+    for `bands` (default psd_index.BANDS).
+    """
+    bands = bands or BANDS
+    labels, f, P = tensor.sel(band=band, **tags)
+    m = tensor.mask(**tags)
+    B = tensor.band_power(list(bands.values()))[m]
+    return {"labels": labels, "f": f, "lsd_db": log_spectral_distance(P),
+            "band_names": list(bands), "band_power": B, "band_diff_db": band_difference_db(B)}
+
+# --- Build ---
+
+def psd_files(paths) -> list[str]:
+    """PSD files among `paths`; directories are scanned."""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(q for q in glob.glob(os.path.join(p, "*")) if q.lower().endswith(PSD_EXTS))
+        else:
+            files.append(p)
+    return files
+
+def build_tensor(paths, out: str | None = TENSOR_FILE, df: float | None = GRID_DF, log_points: int = 0,
+                 variants=("",), verbose: bool = True) -> PSDTensor:
+    """
+    Load PSD files (directories are scanned), put them on one grid and save.
+    A linear grid defaults to the finest bin spacing among the sources, so
+    the finest resolution is kept as is. Only files whose variant tag is in
+    `variants` are used (None for all; a variant is then appended to the
+    resolution label).
+    """
+    from psd_overlay import load_psd_resolutions
+    files = psd_files(paths)
+
+    loaded = []
+    for p in files:
+        tags = parse_name(p)
+        if variants is not None and tags["variant"] not in variants:
+            continue
+        try:
+            products = load_psd_resolutions(p)
+        except Exception as e:
+            if verbose:
+                print(f"skip {p}: {e}", file=sys.stderr)
+            continue
+        for label, (f, Pxx) in products.items():
+            name = os.path.basename(p) + (f"[{label}]" if label else "")
+            f, Pxx = np.asarray(f, dtype=np.float64), np.asarray(Pxx, dtype=np.float64)
+            if f.size < 3 or not np.all(np.diff(f) > 0):
+                if verbose:
+                    print(f"skip {name}: not a PSD", file=sys.stderr)
+                continue
+            res = label or tags["resolution"]
+            if variants is None and tags["variant"]:
+                res = "_".join(filter(None, (res, tags["variant"])))
+            loaded.append((tags["location"], tags["speed"], res, name, f, Pxx))
+    if not loaded:
+        raise ValueError("no PSD files found")
+
+    f_max = max(item[4][-1] for item in loaded)
+    if df is None:
+        df = min(float(np.median(np.diff(item[4]))) for item in loaded)
+    grid = log_grid(f_max, log_points) if log_points else linear_grid(f_max, df)
+    locations = _axis(r[0] for r in loaded)
+    speeds = _axis((r[1] for r in loaded), SPEEDS)
+    resolutions = _axis(r[2] for r in loaded)
+    P = np.full((len(locations), len(speeds), len(resolutions), grid.size), np.nan)
+    names = np.full(P.shape[:-1], "", dtype="U64")
+    for loc, speed, res, name, f, Pxx in loaded:
+        i, j, k = locations.index(loc), speeds.index(speed), resolutions.index(res)
+        if names[i, j, k]:
+            if verbose:
+                print(f"skip {name}: {names[i, j, k]} already fills {loc}/{speed}/{res}", file=sys.stderr)
+            continue
+        P[i, j, k] = regrid(f, Pxx, grid)
+        names[i, j, k] = name
+        if verbose:
+            print(f"{name}: {loc or '-'}/{speed or '-'}/{res or '-'}")
+
+    tensor = PSDTensor(grid, P, locations, speeds, resolutions, names, files)
+    if out:
+        tensor.save(out)
+    return tensor
+
+def load_or_build(path: str = TENSOR_FILE, source: str | None = None) -> PSDTensor:
+    """
+    Load the tensor, building it from the PSDs next to it (or in `source`)
+    if it does not exist yet or is stale: a PSD file is newer than it, or
+    the set of PSD files differs from the one it was built from.
+    """
+    files = psd_files([source or os.path.dirname(path) or "."])
+    if os.path.exists(path):
+        tensor = PSDTensor.load(path)
+        built = os.path.getmtime(path)
+        if (set(tensor.sources) == set(files)
+                and all(os.path.getmtime(p) <= built for p in files)):
+            return tensor
+    return build_tensor(files, path)
+
+# --- Plots ---
+
+def plot_overlay(tensor: PSDTensor, fmin=None, fmax=None, log_y: bool = False, title: str = "",
+                 ax=None, **tags):
+    import matplotlib.pyplot as plt
+    band = None if fmin is None and fmax is None else (fmin or -np.inf, fmax or np.inf)
+    labels, f, P = tensor.sel(band=band, **tags)
+    if ax is None:
+        _, ax = plt.subplots(figsize=(10, 5.5))
+    for label, p in zip(labels, P):
+        ax.plot(f, p, label=label)
+    ax.set_title(title or "PSD overlay")
+    ax.set_xlabel("Frequency (Hz)")
+    ax.set_ylabel("Power Spectral Density")
+    if log_y:
+        ax.set_yscale("log")
+    ax.grid(True)
+    ax.legend()
+    return ax
+
+def plot_matrix(M: np.ndarray, labels, title: str = "", unit: str = "dB", ax=None):
+    import matplotlib.pyplot as plt
+    if ax is None:
+        _, ax = plt.subplots(figsize=(1.2 + 0.45 * len(labels), 1.0 + 0.4 * len(labels)))
+    im = ax.imshow(M, cmap="viridis")
+    ax.figure.colorbar(im, ax=ax, label=unit)
+    ax.set_xticks(range(len(labels)), labels, rotation=90, fontsize=7)
+    ax.set_yticks(range(len(labels)), labels, fontsize=7)
+    ax.set_title(title)
+    ax.figure.tight_layout()
+    return ax
+
+# --- CLI ---
+
+def _band(value: str):
+    lo, hi = (float(v) for v in value.split(":"))
+    return lo, hi
+
+def _print_matrix(M, labels, fmt="{:7.2f}"):
+    width = max(len(s) for s in labels)
+    print(" " * width + " " + " ".join(f"{i:>7d}" for i in range(len(labels))))
+    for i, (label, row) in enumerate(zip(labels, M)):
+        print(f"{label:>{width}s} " + " ".join(fmt.format(v) for v in row) + f"   [{i}]")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Common-grid PSD tensor and cross-condition comparisons")
+    ap.add_argument("--tensor", default=TENSOR_FILE)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="load PSD files onto one grid")
+    b.add_argument("paths", nargs="*", default=["Out"])
+    b.add_argument("--df", type=float, default=GRID_DF,
+                   help="linear grid spacing in Hz (default: the finest source bin spacing)")
+    b.add_argument("--log", type=int, default=0, metavar="N", help="N log-spaced points instead")
+    b.add_argument("--all-variants", action="store_true", help="include notch/2.2/... variants")
+    for name in ("lsd", "bands", "ratio", "overlay"):
+        q = sub.add_parser(name)
+        q.add_argument("--location", action="append")
+        q.add_argument("--speed", action="append")
+        q.add_argument("--resolution", action="append")
+        q.add_argument("--band", type=_band, default=None, metavar="LO:HI")
+        if name == "ratio":
+            q.add_argument("--ref", required=True,
+                           help="reference speed; ratios are against the same location and resolution")
+        if name == "overlay":
+            q.add_argument("--fmax", type=float, default=None)
+            q.add_argument("--log-y", action="store_true")
+        if name in ("lsd", "bands"):
+            q.add_argument("--plot", action="store_true", help="show the matrix")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        t = build_tensor(args.paths, args.tensor, args.df, args.log,
+                         None if args.all_variants else ("",))
+        print(f"{t.P.shape} (location x speed x resolution x frequency), "
+              f"{int((t.names != '').sum())} PSDs -> {args.tensor}")
+        return 0
+
+    t = load_or_build(args.tensor)
+    tags = dict(location=args.location, speed=args.speed, resolution=args.resolution)
+    if args.cmd == "overlay":
+        import matplotlib.pyplot as plt
+        lo, hi = args.band or (None, args.fmax)
+        plot_overlay(t, lo, hi, args.log_y, **tags)
+        plt.tight_layout()
+        plt.show()
+        return 0
+    if args.cmd == "ratio":
+        R = ratio_to_speed(t, args.ref)
+        m = t.mask(**tags)
+        labels = t.sel(**tags)[0]
+        keep = np.ones(t.f.size, bool) if args.band is None else (t.f >= args.band[0]) & (t.f <= args.band[1])
+        f, R = t.f[keep], R[m][:, keep]
+        with np.errstate(all="ignore"):
+            mean, peak = np.nanmean(R, axis=1), np.nanmax(R, axis=1)
+        for label, r, mu, pk in zip(labels, R, mean, peak):
+            if np.isfinite(pk):
+                print(f"{label:>28s} vs {args.ref}: mean {mu:+6.2f} dB, "
+                      f"max {pk:+6.2f} dB at {f[np.nanargmax(r)]:.2f} Hz")
+        return 0
+
+    res = compare(t, band=args.band, **tags)
+    labels = res["labels"]
+    if args.cmd == "lsd":
+        _print_matrix(res["lsd_db"], labels)
+        if args.plot:
+            import matplotlib.pyplot as plt
+            plot_matrix(res["lsd_db"], labels, "Log-spectral distance")
+            plt.show()
+    else:
+        B = _db(res["band_power"])
+        width = max(len(s) for s in labels)
+        print(" " * width + "  " + "  ".join(f"{n:>11s}" for n in res["band_names"]))
+        for label, row in zip(labels, B):
+            print(f"{label:>{width}s}  " + "  ".join(f"{v:11.2f}" for v in row))
+        if args.plot:
+            import matplotlib.pyplot as plt
+            # Spread of each band across the selection: max pairwise difference
+            spread = np.nanmax(np.abs(res["band_diff_db"]), axis=1)
+            plot_matrix(spread, labels, "Largest band difference to any other condition")
+            plt.gca().set_xticks(range(len(res["band_names"])), res["band_names"], rotation=90)
+            plt.show()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+renode_harness.py
+Run the Renode Python peripheral scripts outside Renode.
+
+Renode executes a PythonPeripheral script on every register access with a
+`request` object (isInit / isRead / isWrite, offset, value) in a scope that
+persists between accesses. PeripheralScript does the same with a mock
+request, so the scripts can be checked against the RP2040 datasheet
+semantics and benchmarked without an emulator:
+
+    python renode_harness.py                 # check + benchmark every script
+    python renode_harness.py --accesses 1e6 rp2040_divider_table.py
+
+Divider scripts are recognised by name ("divider"), the rest are treated
+as spinlock banks. Exit status is 1 if any check fails.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = ("rp2040_divider.py", "rp2040_divider_table.py", "rp2040_spinlock.py")
+MASK32 = 0xFFFFFFFF
+
+# Divider register offsets (from SIO + 0x60) and CSR bits
+UDIVIDEND, UDIVISOR, SDIVIDEND, SDIVISOR, QUOTIENT, REMAINDER, CSR = range(0, 28, 4)
+CSR_READY, CSR_DIRTY = 1, 2
+N_SPINLOCKS = 32
+
+# --- Mock Renode peripheral ---
+
+class Request:
+    """The attributes of Renode's PythonPeripheral request that the scripts use."""
+    __slots__ = ("isInit", "isRead", "isWrite", "offset", "value")
+
+    def __init__(self):
+        self.isInit = self.isRead = self.isWrite = False
+        self.offset = 0
+        self.value = 0
+
+class PeripheralScript:
+    """A peripheral script compiled once and run per access in a persistent scope."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path) as fh:
+            self.code = compile(fh.read(), path, "exec")
+        self.request = Request()
+        self.scope = {}
+        self.init()
+
+    def _run(self, init=False, read=False, write=False, offset=0, value=0) -> int:
+        r = self.request
+        r.isInit, r.isRead, r.isWrite = init, read, write
+        r.offset, r.value = offset, value
+        exec(self.code, self.scope)
+        return r.value
+
+    def init(self):
+        self.scope = {"request": self.request}
+        self._run(init=True)
+
+    def read(self, offset: int) -> int:
+        return self._run(read=True, offset=offset)
+
+    def write(self, offset: int, value: int):
+        self._run(write=True, offset=offset, value=value)
+
+# --- RP2040 semantics ---
+
+def rp2040_divmod(dividend: int, divisor: int, signed: bool):
+    """
+    (quotient, remainder) register values of the SIO divider: truncating
+    division, remainder with the dividend's sign, and on divide by zero a
+    quotient of -1 (+1 for a negative signed dividend) with remainder = dividend.
+    """
+    n, d = dividend & MASK32, divisor & MASK32
+    if signed:
+        n, d = (n ^ 0x80000000) - 0x80000000, (d ^ 0x80000000) - 0x80000000
+    if d == 0:
+        q = 1 if n < 0 else -1
+    else:
+        q = abs(n) // abs(d)
+        if (n < 0) != (d < 0):
+            q = -q
+    return q & MASK32, (n - q * d) & MASK32
+
+class Checker:
+    def __init__(self):
+        self.count = 0
+        self.failures = []
+
+    def expect(self, what: str, got, want):
+        self.count += 1
+        if got != want and len(self.failures) < 20:
+            self.failures.append(f"{what}: got {got!r}, want {want!r}")
+
+def check_divider(p: PeripheralScript, rng: random.Random, n_random: int = 2000) -> Checker:
+    c = Checker()
+    p.init()
+    c.expect("CSR after init", p.read(CSR), CSR_READY)
+
+    edges = [0, 1, 2, 3, 7, 0x7FFFFFFF, 0x80000000, 0x80000001, MASK32, MASK32 - 6]
+    pairs = [(a, b) for a in edges for b in edges]
+    pairs += [(rng.getrandbits(32), rng.getrandbits(rng.choice((4, 16, 32))))
+              for _ in range(n_random)]
+    for signed in (False, True):
+        reg_n, reg_d = (SDIVIDEND, SDIVISOR) if signed else (UDIVIDEND, UDIVISOR)
+        kind = "signed" if signed else "unsigned"
+        for a, b in pairs:
+            p.write(reg_n, a)
+            p.write(reg_d, b)
+            want_q, want_r = rp2040_divmod(a, b, signed)
+            c.expect(f"{kind} {a:#x} / {b:#x} CSR", p.read(CSR), CSR_READY | CSR_DIRTY)
+            c.expect(f"{kind} {a:#x} % {b:#x}", p.read(REMAINDER), want_r)
+            c.expect(f"{kind} {a:#x} dirty after REMAINDER", p.read(CSR) & CSR_DIRTY, CSR_DIRTY)
+            c.expect(f"{kind} {a:#x} / {b:#x}", p.read(QUOTIENT), want_q)
+            c.expect(f"{kind} {a:#x} dirty after QUOTIENT", p.read(CSR), CSR_READY)
+
+    # Operand registers read back as 32-bit values through either alias
+    p.write(SDIVIDEND, -7 & MASK32)
+    p.write(SDIVISOR, 2)
+    c.expect("SDIVIDEND readback", p.read(SDIVIDEND), 0xFFFFFFF9)
+    c.expect("UDIVIDEND alias", p.read(UDIVIDEND), 0xFFFFFFF9)
+    c.expect("UDIVISOR alias", p.read(UDIVISOR), 2)
+    # The register written last picks the mode: same operands, unsigned divide
+    p.write(UDIVISOR, 2)
+    c.expect("mode from last write", p.read(QUOTIENT), rp2040_divmod(0xFFFFFFF9, 2, False)[0])
+
+    # Results can be written back (context save/restore), which marks DIRTY
+    p.read(QUOTIENT)
+    p.write(QUOTIENT, 0x12345678)
+    p.write(REMAINDER, 0x9ABCDEF0)
+    c.expect("CSR after result write", p.read(CSR), CSR_READY | CSR_DIRTY)
+    c.expect("REMAINDER restore", p.read(REMAINDER), 0x9ABCDEF0)
+    c.expect("QUOTIENT restore", p.read(QUOTIENT), 0x12345678)
+    return c
+
+def check_spinlock(p: PeripheralScript, rng: random.Random, n_random: int = 2000) -> Checker:
+    c = Checker()
+    p.init()
+    held = [False] * N_SPINLOCKS
+    for i in range(N_SPINLOCKS):
+        c.expect(f"lock {i} free after init", p.read(4 * i) != 0, True)
+        held[i] = True
+    for i in range(N_SPINLOCKS):
+        c.expect(f"lock {i} held", p.read(4 * i), 0)
+    for _ in range(n_random):
+        i = rng.randrange(N_SPINLOCKS)
+        if rng.random() < 0.5:
+            p.write(4 * i, rng.getrandbits(32))     # any write releases
+            held[i] = False
+        else:
+            c.expect(f"lock {i} claim", p.read(4 * i) != 0, not held[i])
+            held[i] = True
+    return c
+
+# --- Benchmarks ---
+
+def bench_divider(p: PeripheralScript, accesses: int, rng: random.Random) -> float:
+    """Accesses per second for the pico-sdk divide sequence (2 writes, 3 reads)."""
+    ops = [(rng.getrandbits(32), rng.getrandbits(16) | 1) for _ in range(1024)]
+    n = max(1, accesses // 5)
+    t0 = time.perf_counter()
+    for k in range(n):
+        a, b = ops[k & 1023]
+        p.write(SDIVIDEND, a)
+        p.write(SDIVISOR, b)
+        p.read(CSR)
+        p.read(REMAINDER)
+        p.read(QUOTIENT)
+    return 5 * n / (time.perf_counter() - t0)
+
+def bench_spinlock(p: PeripheralScript, accesses: int, rng: random.Random) -> float:
+    """Accesses per second for claim/release pairs over random locks."""
+    locks = [4 * rng.randrange(N_SPINLOCKS) for _ in range(1024)]
+    n = max(1, accesses // 2)
+    t0 = time.perf_counter()
+    for k in range(n):
+        off = locks[k & 1023]
+        p.read(off)
+        p.write(off, 0)
+    return 2 * n / (time.perf_counter() - t0)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Check and benchmark Renode peripheral scripts")
+    ap.add_argument("scripts", nargs="*", help=f"scripts (default: {', '.join(SCRIPTS)})")
+    ap.add_argument("--accesses", type=float, default=2e5, help="register accesses per benchmark")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    failed = 0
+    for path in args.scripts or [os.path.join(HERE, s) for s in SCRIPTS]:
+        name = os.path.basename(path)
+        divider = "divider" in name
+        p = PeripheralScript(path)
+        rng = random.Random(args.seed)
+        try:
+            c = (check_divider if divider else check_spinlock)(p, rng)
+        except Exception as e:
+            c = Checker()
+            c.failures.append(f"raised {type(e).__name__}: {e}")
+        rate = (bench_divider if divider else bench_spinlock)(p, int(args.accesses), rng)
+        status = "ok  " if not c.failures else "FAIL"
+        print(f"{status} {name:28s} {c.count:6d} checks  {rate / 1e6:6.2f} M accesses/s")
+        for msg in c.failures:
+            print(f"     {msg}")
+        failed += bool(c.failures)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
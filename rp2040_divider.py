@@ -10,8 +10,8 @@ DIV_POSITION = [
     "DIV_CSR"
 ]
 
-DIV_CSR_READY = 1 << 1
-DIV_CSR_DIRTY = 1
+DIV_CSR_READY = 1
+DIV_CSR_DIRTY = 1 << 1
 
 if request.isInit:
     DIV_DIVIDEND = 0
@@ -22,29 +22,41 @@ if request.isInit:
 elif request.isWrite:
     DIV_CSR |= DIV_CSR_DIRTY
     key = DIV_POSITION[request.offset // 4]
-    if key == "DIV_UDIVIDEND":
+    # Registers hold 32-bit patterns; the address written picks signed or unsigned
+    if key == "DIV_UDIVIDEND" or key == "DIV_SDIVIDEND":
         DIV_DIVIDEND = ctypes.c_uint32(request.value).value
-    elif key == "DIV_UDIVISOR":
+    elif key == "DIV_UDIVISOR" or key == "DIV_SDIVISOR":
         DIV_DIVISOR = ctypes.c_uint32(request.value).value
-    elif key == "DIV_SDIVIDEND":
-        DIV_DIVIDEND = ctypes.c_int32(request.value).value
-    elif key == "DIV_SDIVISOR":
-        DIV_DIVISOR = ctypes.c_int32(request.value).value
     elif key == "DIV_QUOTIENT":
-        DIV_QUOTIENT = request.value
+        DIV_QUOTIENT = ctypes.c_uint32(request.value).value
         DIV_CSR |= DIV_CSR_READY
     elif key == "DIV_REMAINDER":
-        DIV_REMAINDER = request.value
+        DIV_REMAINDER = ctypes.c_uint32(request.value).value
         DIV_CSR |= DIV_CSR_READY
+    elif key == "DIV_CSR":
+        pass    # read only
     else:
         raise NotImplementedError("Something is horribly wrong, the key should be caught")
 
     if key == "DIV_UDIVIDEND" or key == "DIV_UDIVISOR" \
        or key == "DIV_SDIVIDEND" or key == "DIV_SDIVISOR":
-        if DIV_DIVISOR != 0:
-            DIV_QUOTIENT =  DIV_DIVIDEND // DIV_DIVISOR
-            DIV_REMAINDER = DIV_DIVIDEND % DIV_DIVISOR
-            DIV_CSR |= DIV_CSR_READY
+        if key == "DIV_SDIVIDEND" or key == "DIV_SDIVISOR":
+            dividend = ctypes.c_int32(DIV_DIVIDEND).value
+            divisor = ctypes.c_int32(DIV_DIVISOR).value
+        else:
+            dividend = DIV_DIVIDEND
+            divisor = DIV_DIVISOR
+        if divisor != 0:
+            # Truncating division like the hardware (and C), not Python's floor
+            quotient = abs(dividend) // abs(divisor)
+            if (dividend < 0) != (divisor < 0):
+                quotient = -quotient
+        else:
+            # Divide by zero: quotient -1 (+1 for a negative dividend), remainder = dividend
+            quotient = 1 if dividend < 0 else -1
+        DIV_QUOTIENT = ctypes.c_uint32(quotient).value
+        DIV_REMAINDER = ctypes.c_uint32(dividend - quotient * divisor).value
+        DIV_CSR |= DIV_CSR_READY
 
 elif request.isRead:
     key = DIV_POSITION[request.offset // 4]
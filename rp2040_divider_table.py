@@ -0,0 +1,76 @@
+# Table-driven model of the RP2040 SIO hardware divider (SIO + 0x60) for Renode.
+# Same registers and semantics as rp2040_divider.py, but each access is one
+# list index and call: no name lookup, string comparisons or ctypes.
+# Runs under Renode's IronPython 2.7, so keep it Python 2 compatible.
+#
+# Offsets: 0x00 UDIVIDEND, 0x04 UDIVISOR, 0x08 SDIVIDEND, 0x0C SDIVISOR,
+#          0x10 QUOTIENT, 0x14 REMAINDER, 0x18 CSR (READY bit 0, DIRTY bit 1)
+
+if request.isRead:
+    request.value = DIV_READ[request.offset >> 2]()
+elif request.isWrite:
+    DIV_WRITE[request.offset >> 2](request.value & 0xFFFFFFFF)
+elif request.isInit:
+    DIV_CSR_READY = 1
+    DIV_CSR_DIRTY = 2
+    # dividend, divisor, quotient, remainder, csr as 32-bit register values
+    DIV = [0, 0, 0, 0, DIV_CSR_READY]
+
+    def div_unsigned():
+        n, d = DIV[0], DIV[1]
+        if d:
+            DIV[2] = n // d
+            DIV[3] = n % d
+        else:
+            DIV[2] = 0xFFFFFFFF
+            DIV[3] = n
+        DIV[4] = DIV_CSR_READY | DIV_CSR_DIRTY
+
+    def div_signed():
+        n = (DIV[0] ^ 0x80000000) - 0x80000000
+        d = (DIV[1] ^ 0x80000000) - 0x80000000
+        if d:
+            q = abs(n) // abs(d)
+            if (n < 0) != (d < 0):
+                q = -q
+        else:
+            q = 1 if n < 0 else -1
+        DIV[2] = q & 0xFFFFFFFF
+        DIV[3] = (n - q * d) & 0xFFFFFFFF
+        DIV[4] = DIV_CSR_READY | DIV_CSR_DIRTY
+
+    def write_udividend(v):
+        DIV[0] = v
+        div_unsigned()
+
+    def write_udivisor(v):
+        DIV[1] = v
+        div_unsigned()
+
+    def write_sdividend(v):
+        DIV[0] = v
+        div_signed()
+
+    def write_sdivisor(v):
+        DIV[1] = v
+        div_signed()
+
+    def write_quotient(v):
+        DIV[2] = v
+        DIV[4] = DIV_CSR_READY | DIV_CSR_DIRTY
+
+    def write_remainder(v):
+        DIV[3] = v
+        DIV[4] = DIV_CSR_READY | DIV_CSR_DIRTY
+
+    def write_csr(v):
+        pass    # read only
+
+    def read_quotient():
+        DIV[4] &= ~DIV_CSR_DIRTY
+        return DIV[2]
+
+    DIV_WRITE = [write_udividend, write_udivisor, write_sdividend, write_sdivisor,
+                 write_quotient, write_remainder, write_csr, write_csr]
+    DIV_READ = [lambda: DIV[0], lambda: DIV[1], lambda: DIV[0], lambda: DIV[1],
+                read_quotient, lambda: DIV[3], lambda: DIV[4], lambda: 0]
@@ -1,20 +1,38 @@
+import numpy as np
 import matplotlib.pyplot as plt
+from psd_index import load_or_build, INDEX_FILE
 
-# Data points
-x = [0, 1.2, 2.0]  # walking speed (m/s)
-y = [4.0634e-11, 2.7049e-11, 2.39935e-11]  # PSD power (1/Hz)
+# Peak to track; values come from the spectral feature index (psd_index.py)
+PEAK_HZ = 15.5
+TOL_HZ = 0.5
+LOCATIONS = None        # e.g. ["SMBB-WEB"]; None plots every location
+RESOLUTION = None       # e.g. "128k"; None plots every resolution
+VARIANT = ""            # skip variants such as "notch"
+
+index = load_or_build(INDEX_FILE)
+rows = index.peak_at(PEAK_HZ, TOL_HZ, location=LOCATIONS, resolution=RESOLUTION, variant=VARIANT)
+rows = rows[np.isfinite(rows["speed_mps"]) & np.isfinite(rows["psd"])]
 
 # Create plot
 plt.figure(figsize=(7, 5))
-plt.plot(x, y, marker='o', linestyle='-', linewidth=2, markersize=8)
+for loc, res in sorted(set(zip(rows["location"], rows["resolution"]))):
+    r = rows[(rows["location"] == loc) & (rows["resolution"] == res)]
+    if r.size < 2:
+        continue
+    r = r[np.argsort(r["speed_mps"])]
+    x = r["speed_mps"]  # walking speed (m/s)
+    y = r["psd"]        # PSD power at the peak bin (1/Hz)
+    label = f"{loc or 'Unlabeled'} ({res})" if res else (loc or "Unlabeled")
+    plt.plot(x, y, marker='o', linestyle='-', linewidth=2, markersize=8, label=label)
 
 # Labels and title
-plt.title("Walking Speed vs PSD Power at 15.5 Hz Peak", fontsize=14)
+plt.title(f"Walking Speed vs PSD Power at {PEAK_HZ:g} Hz Peak", fontsize=14)
 plt.xlabel("Estimated Walking Speed (m/s)", fontsize=12)
-plt.ylabel("PSD Power at 15.5 Hz (1/Hz)", fontsize=12)
+plt.ylabel(f"PSD Power at {PEAK_HZ:g} Hz (1/Hz)", fontsize=12)
 
 # Optional grid and layout
 plt.grid(True, linestyle='--', alpha=0.7)
+plt.legend(fontsize=9)
 plt.tight_layout()
 
 # Show or save
@@ -34,4 +34,48 @@ uint16_t sma_push(sma_t *f, uint16_t in) {
 
     uint16_t out = (uint16_t)f->sum / (int32_t)f->filled;
     return out;
-}
\ No newline at end of file
+}
+
+/**
+ * CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)
+ * @param data Bytes to check
+ * @param len Number of bytes
+ * @return The CRC
+ */
+uint16_t crc16_ccitt(const uint8_t *data, size_t len) {
+    uint16_t crc = 0xFFFF;
+    for (size_t k = 0; k < len; k++) {
+        crc ^= (uint16_t)data[k] << 8;
+        for (int b = 0; b < 8; b++)
+            crc = (crc & 0x8000) ? (uint16_t)((crc << 1) ^ 0x1021) : (uint16_t)(crc << 1);
+    }
+    return crc;
+}
+
+static void put_u16(uint8_t *p, uint16_t v) {
+    p[0] = v & 0xFF;
+    p[1] = v >> 8;
+}
+
+/**
+ * Pack one frame: sync, seq, t_us, n int16 samples, CRC (little endian)
+ * @param out Buffer of at least HALL_FRAME_SIZE(n) bytes
+ * @param seq Frame counter
+ * @param t_us Timestamp in microseconds
+ * @param samples Raw ADC counts, one per channel
+ * @param n Number of channels
+ * @return Number of bytes written
+ */
+size_t hall_frame_pack(uint8_t *out, uint16_t seq, uint32_t t_us,
+                       const int16_t *samples, size_t n) {
+    put_u16(out, HALL_FRAME_SYNC);
+    put_u16(out + 2, seq);
+    put_u16(out + 4, t_us & 0xFFFF);
+    put_u16(out + 6, t_us >> 16);
+    for (size_t k = 0; k < n; k++)
+        put_u16(out + HALL_FRAME_HEADER + 2 * k, (uint16_t)samples[k]);
+
+    size_t len = HALL_FRAME_HEADER + 2 * n;
+    put_u16(out + len, crc16_ccitt(out + 2, len - 2));
+    return len + 2;
+}
@@ -21,6 +21,12 @@ int count = 0;
 bool on = false;
 sma_t filter = {.N = 4};
 
+// 1 = stream binary frames (hall_protocol.py), 0 = ASCII "t_us,mv" lines
+#ifndef HALL_BINARY_FRAMES
+#define HALL_BINARY_FRAMES 0
+#endif
+#define N_CHANNELS 1
+
 #define MAIN_TASK_PRIORITY      ( tskIDLE_PRIORITY + 1UL )
 #define BLINK_TASK_PRIORITY     ( tskIDLE_PRIORITY + 2UL )
 #define MAIN_TASK_STACK_SIZE configMINIMAL_STACK_SIZE
@@ -43,14 +49,25 @@ void blink_task(__unused void *params) {
 
 void main_task(__unused void *params) {
     TickType_t last = xTaskGetTickCount();
+#if HALL_BINARY_FRAMES
+    uint8_t frame[HALL_FRAME_SIZE(N_CHANNELS)];
+    uint16_t seq = 0;
+#endif
     xTaskCreate(blink_task, "BlinkThread",
                 BLINK_TASK_STACK_SIZE, NULL, BLINK_TASK_PRIORITY, NULL);
     for(;;) {
         vTaskDelayUntil(&last, PERIOD);
         uint16_t raw = adc_read();
-        uint16_t mv = raw * 3300 / 4095;
         uint32_t t_us = (uint32_t) time_us_64();
+#if HALL_BINARY_FRAMES
+        int16_t samples[N_CHANNELS] = {(int16_t)raw};
+        size_t len = hall_frame_pack(frame, seq++, t_us, samples, N_CHANNELS);
+        for (size_t k = 0; k < len; k++)
+            putchar_raw(frame[k]);  // bypass CRLF translation
+#else
+        uint16_t mv = raw * 3300 / 4095;
         printf("%lu,%d\n", (unsigned long)t_us, mv);
+#endif
     }
 }
 
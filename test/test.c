@@ -4,6 +4,7 @@
 #include <unity.h>
 #include "unity_config.h"
 #include "threads.h"
+#include "hall.h"
 
 void setUp(void) {}
 
@@ -109,6 +110,25 @@ void test_fixed_orphan(void)
     TEST_ASSERT_EQUAL_INT(1, uxSemaphoreGetCount(semaphore));
 }
 
+// ---- Binary frames ----
+
+void test_crc16_check_value(void)
+{
+    TEST_ASSERT_EQUAL_HEX16(0x29B1, crc16_ccitt((const uint8_t *)"123456789", 9));
+}
+
+void test_frame_pack(void)
+{
+    int16_t samples[3] = {100, -5, 2048};
+    uint8_t frame[HALL_FRAME_SIZE(3)];
+    // Same frame as hall_protocol.encode_frames([7], [123456], [[100, -5, 2048]])
+    const uint8_t expected[] = {0xa5, 0x5a, 0x07, 0x00, 0x40, 0xe2, 0x01, 0x00,
+                                0x64, 0x00, 0xfb, 0xff, 0x00, 0x08, 0x0b, 0xae};
+
+    TEST_ASSERT_EQUAL_INT(sizeof(expected), hall_frame_pack(frame, 7, 123456, samples, 3));
+    TEST_ASSERT_EQUAL_HEX8_ARRAY(expected, frame, sizeof(expected));
+}
+
 static void rtos_test_task(void *pvParameters) {
 
     for(;;){
@@ -121,6 +141,8 @@ static void rtos_test_task(void *pvParameters) {
         RUN_TEST(test_orphaned);
         RUN_TEST(test_fixed_orphan);
         RUN_TEST(test_deadlock_pair);
+        RUN_TEST(test_crc16_check_value);
+        RUN_TEST(test_frame_pack);
 
         printf("\n==== END UNITY TESTS ====");
 
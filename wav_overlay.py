@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy.io import wavfile
+from minmax_plot import MinMaxLine
 
 # --- Edit these paths ---
 wav_paths = [
@@ -13,12 +14,12 @@ wav_paths = [
 fig, axes = plt.subplots(len(wav_paths), 1, figsize=(10, 6), sharex=True)
 
 for i, path in enumerate(wav_paths):
-    sr, data = wavfile.read(path)
+    sr, data = wavfile.read(path, mmap=True)
     # Convert to mono if stereo
     if data.ndim > 1:
-        data = data.mean(axis=1)
-    t = np.arange(len(data)) / sr
-    axes[i].plot(t, data, linewidth=0.8)
+        data = data.mean(axis=1, dtype=np.float32)
+    # Min/max per pixel from the mapped samples, re-decimated on zoom
+    MinMaxLine(axes[i], data, fs=sr, linewidth=0.8)
     axes[i].set_ylabel(f"{path}")
     axes[i].grid(True, alpha=0.3)
 
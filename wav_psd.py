@@ -1,19 +1,27 @@
 import os
+import contextlib
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 from scipy import signal
 from scipy.io import wavfile
-from tkinter import Tk, filedialog, Button, Label
-from tkinter.ttk import Combobox
-from matplotlib.ticker import MaxNLocator, LogLocator
+from hallcap import Capture, write_psd, write_psd_multi
+from spectral import WelchAccumulator, MultiWelch, StreamingSTFT, ZoomWelch, Decimator
+from minmax_plot import MinMaxLine
+from psd_cache import default_cache
+
+# matplotlib, pandas and tkinter load on first use (see psd_batch.py)
+
+STREAM_CHUNK = 1 << 20              # frames read per step in streaming mode
+STREAM_THRESHOLD = 256 * 1024**2    # files larger than this are streamed by the selector
+SPEC_NPERSEG = 8192                 # spectrogram segment length (75% overlap by default)
+SPEC_DISPLAY = (1024, 2000)         # max (frequency, time) pixels of the spectrogram image
 
 # --- Helpers ---
 
-def _to_float32(x: np.ndarray) -> np.ndarray:
+def _to_float32(x: np.ndarray, max_abs: float | None = None) -> np.ndarray:
     """
     Convert common WAV dtypes to float32 in approximately [-1, 1].
-    Falls back to unit-norm scaling if dtype is unusual.
+    Falls back to unit-norm scaling if dtype is unusual (by max_abs when
+    given, so chunks of one file share a scale).
     """
     if np.issubdtype(x.dtype, np.floating):
         return x.astype(np.float32)
@@ -24,25 +32,180 @@ def _to_float32(x: np.ndarray) -> np.ndarray:
     if x.dtype == np.uint8:
         return (x.astype(np.float32) - 128.0) / 128.0
     # Fallback: scale by max abs to avoid division by zero
-    max_abs = float(np.max(np.abs(x))) or 1.0
+    if max_abs is None:
+        max_abs = float(np.max(np.abs(x))) or 1.0
     return x.astype(np.float32) / max_abs
 
-# --- Core PSD function for WAV ---
+def _wav_scale(dtype: np.dtype, max_abs: float | None = None):
+    """(scale, offset) that _to_float32 applies to a dtype, for plotting raw samples."""
+    if np.issubdtype(dtype, np.floating):
+        return 1.0, 0.0
+    if dtype == np.int16:
+        return 1.0 / 32768.0, 0.0
+    if dtype == np.int32:
+        return 1.0 / 2147483648.0, 0.0
+    if dtype == np.uint8:
+        return 1.0 / 128.0, -1.0
+    return 1.0 / (max_abs or 1.0), 0.0
 
-def compute_psd_from_wav(
+def _welch_segment(n_samples: int, nperseg: int) -> int:
+    seg = int(min(nperseg, n_samples))
+    if seg < 256:
+        seg = max(64, seg)  # keep a small but valid segment size
+    return seg
+
+def _open_channel(file_path: str, channel_idx: int = 0, chunk_frames: int = STREAM_CHUNK):
+    """
+    Memory-mapped view of one WAV channel with its label and the max |x|
+    used for unusual dtypes (None for the standard ones).
+    """
+    fs, data = wavfile.read(file_path, mmap=True)
+    if data.ndim == 1:
+        channel_data = data
+        ch_label = "Mono"
+    else:
+        n_channels = data.shape[1]
+        channel_idx = int(np.clip(channel_idx, 0, n_channels - 1))
+        channel_data = data[:, channel_idx]
+        ch_label = f"Channel {channel_idx} of {n_channels}"
+
+    max_abs = None
+    known = (np.int16, np.int32, np.uint8)
+    if not (np.issubdtype(channel_data.dtype, np.floating) or channel_data.dtype in known):
+        n = channel_data.shape[0]
+        max_abs = max(float(np.max(np.abs(channel_data[i:i + chunk_frames])))
+                      for i in range(0, n, chunk_frames)) or 1.0
+    return fs, channel_data, ch_label, max_abs
+
+def stream_psd_from_wav(
     file_path: str,
     channel_idx: int = 0,
-    output_file: str | None = None,
     nperseg: int = 128000,
-    zoom_hz: float = 5000.0
-) -> None:
+    chunk_frames: int = STREAM_CHUNK
+):
     """
-    Load one channel from a WAV file and compute/plot its PSD using Welch's method.
-    Optionally save PSD to .xlsx or .csv.
+    Welch PSD of one WAV channel without loading the file into memory.
+    The WAV is memory-mapped and the channel read in chunks; each chunk is
+    converted to float32 and fed to a running Welch accumulator (Hann,
+    50% overlap, constant detrend, density), so peak memory is a few
+    segments.
+    Returns fs, f, Pxx, seg, ch_label, the memory-mapped channel and the
+    (scale, offset) that normalizes it, for plotting with MinMaxLine.
+    """
+    fs, channel_data, ch_label, max_abs = _open_channel(file_path, channel_idx, chunk_frames)
+    n = channel_data.shape[0]
+
+    seg = _welch_segment(n, nperseg)
+    acc = WelchAccumulator(fs, seg, seg // 2, window=signal.get_window("hann", seg))
+    for i in range(0, n, chunk_frames):
+        acc.push(_to_float32(np.asarray(channel_data[i:i + chunk_frames]), max_abs))
+
+    f, Pxx = acc.psd()
+    return fs, f, Pxx, seg, ch_label, channel_data, _wav_scale(channel_data.dtype, max_abs)
+
+def zoom_psd_from_wav(
+    file_path: str,
+    channel_idx: int = 0,
+    nperseg: int = 128000,
+    band: tuple[float, float] = (0.0, 100.0),
+    chunk_frames: int = STREAM_CHUNK
+):
+    """
+    Welch PSD of one channel restricted to band = (lo, hi) Hz (spectral.ZoomWelch).
+    The band is mixed down and decimated before the FFTs, so long segments
+    (fine resolution) cost a fraction of the full-band Welch; bins sit on the
+    same frequency grid and density scale as psd_from_wav with that nperseg.
+    Reads in chunks like stream_psd_from_wav; same return values.
+    """
+    if file_path.lower().endswith(".hcap"):
+        fs, _, _, _, ch_label, channel_data = _load_and_welch(file_path, channel_idx, nperseg,
+                                                              welch=False)
+        max_abs, scale = None, (1.0, 0.0)
+    else:
+        fs, channel_data, ch_label, max_abs = _open_channel(file_path, channel_idx, chunk_frames)
+        scale = _wav_scale(channel_data.dtype, max_abs)
+    n = channel_data.shape[0]
+
+    seg = _welch_segment(n, nperseg)
+    zw = ZoomWelch(fs, band[0], band[1], seg, seg // 2)
+    for i in range(0, n, chunk_frames):
+        zw.push(_to_float32(np.asarray(channel_data[i:i + chunk_frames]), max_abs))
+
+    f, Pxx = zw.psd()
+    return fs, f, Pxx, seg, ch_label, channel_data, scale
+
+def decimate_wav(
+    file_path: str,
+    channel_idx: int = 0,
+    bandwidth: float = 200.0,
+    chunk_frames: int = STREAM_CHUNK,
+    cache: bool = True
+):
+    """
+    One channel low-pass filtered and decimated so that [0, bandwidth] Hz is
+    kept (spectral.Decimator, multistage polyphase). The input is read in
+    chunks and only the decimated float32 signal is held in memory; it is
+    stored in the PSD cache so plots and repeated PSDs skip the filtering.
+    Returns fs_out, samples, ch_label and the input fs.
+    """
+    store = default_cache() if cache else None
+    if store is not None:
+        key = store.key(file_path, "wav_decimated", channel=channel_idx, bandwidth=float(bandwidth))
+        hit = store.get(key)
+        if hit is not None:
+            arrays, meta = hit
+            return meta["fs"], arrays["x"].astype(np.float32), meta["ch_label"], meta["fs_in"]
+
+    if file_path.lower().endswith(".hcap"):
+        fs, _, _, _, ch_label, channel_data = _load_and_welch(file_path, channel_idx, 0, welch=False)
+        max_abs = None
+    else:
+        fs, channel_data, ch_label, max_abs = _open_channel(file_path, channel_idx, chunk_frames)
+    dec = Decimator(fs, bandwidth)
+    parts = [dec.push(_to_float32(np.asarray(channel_data[i:i + chunk_frames]), max_abs))
+             for i in range(0, channel_data.shape[0], chunk_frames)]
+    parts.append(dec.flush())
+    x = np.concatenate(parts).astype(np.float32)
+
+    if store is not None:
+        store.put(key, {"x": x}, fs=dec.fs_out, fs_in=float(fs), factors=dec.factors,
+                  ch_label=ch_label)
+    return dec.fs_out, x, ch_label, float(fs)
+
+def _decimated_psd(file_path: str, channel_idx: int, nperseg: int, bandwidth: float,
+                   band: tuple[float, float] | None = None, cache: bool = True):
     """
-    # Step 1: Read the WAV
-    fs, data = wavfile.read(file_path)           # fs in Hz, data shape: (N,) or (N, C)
-    data = _to_float32(data)
+    Welch (or zoom Welch) on the decimated channel. nperseg counts input-rate
+    samples, so the frequency resolution is the same as without decimation.
+    """
+    fs, x, ch_label, fs_in = decimate_wav(file_path, channel_idx, bandwidth, cache=cache)
+    seg = _welch_segment(len(x), int(round(nperseg * fs / fs_in)))
+    if band is not None:
+        zw = ZoomWelch(fs, band[0], band[1], seg, seg // 2)
+        zw.push(x)
+        f, Pxx = zw.psd()
+    else:
+        f, Pxx = signal.welch(x, fs=fs, window="hann", nperseg=seg, noverlap=seg // 2,
+                              detrend="constant", scaling="density", average="mean")
+    return fs, f, Pxx, seg, ch_label, x, (1.0, 0.0)
+
+# --- Core PSD function for WAV ---
+
+def _load_and_welch(file_path: str, channel_idx: int, nperseg: int, welch: bool = True):
+    """
+    In-memory path: read the whole file, then one signal.welch call.
+    With welch=False only the channel is loaded (f, Pxx and seg are None).
+    """
+    # Step 1: Read the WAV (or a .hcap capture, memory-mapped)
+    if file_path.lower().endswith(".hcap"):
+        cap = Capture(file_path)
+        fs = cap.fs
+        data = cap.read_rows()[1].astype(np.float32)
+        if data.shape[1] == 1:
+            data = data[:, 0]
+    else:
+        fs, data = wavfile.read(file_path)           # fs in Hz, data shape: (N,) or (N, C)
+        data = _to_float32(data)
 
     # Step 2: Select one channel
     if data.ndim == 1:
@@ -54,13 +217,11 @@ def compute_psd_from_wav(
         channel_data = data[:, channel_idx]
         ch_label = f"Channel {channel_idx} of {n_channels}"
 
-    # Step 3: Build a time axis from the WAV sample rate
-    time = np.arange(len(channel_data), dtype=np.float64) / fs
+    if not welch:
+        return fs, None, None, None, ch_label, channel_data
 
-    # Step 4: Compute the PSD with Welch
-    seg = int(min(nperseg, len(channel_data)))
-    if seg < 256:
-        seg = max(64, seg)  # keep a small but valid segment size
+    # Step 3: Compute the PSD with Welch
+    seg = _welch_segment(len(channel_data), nperseg)
     noverlap = seg // 2
 
     f, Pxx = signal.welch(
@@ -73,10 +234,180 @@ def compute_psd_from_wav(
         scaling="density",  # PSD units: amplitude^2/Hz; here amplitude is normalized
         average="mean",
     )
+    return fs, f, Pxx, seg, ch_label, channel_data
 
-    # Step 5: Plot raw waveform
+def psd_from_wav(file_path: str, channel_idx: int = 0, nperseg: int = 128000,
+                 streaming: bool = False, cache: bool = True,
+                 band: tuple[float, float] | None = None, bandwidth: float | None = None):
+    """
+    Steps 1-3 without plotting: returns fs, f, Pxx, seg, ch_label, the
+    channel samples and their (scale, offset) normalization.
+    With band=(lo, hi) only that band is computed (zoom_psd_from_wav).
+    With bandwidth the channel is first decimated to keep [0, bandwidth] Hz
+    (decimate_wav); fs, seg and the samples are then those of the decimated
+    signal.
+    Results are looked up in the PSD cache (psd_cache.py) first; on a hit
+    the channel is only memory-mapped for plotting.
+    """
+    is_capture = file_path.lower().endswith(".hcap")
+    store = default_cache() if cache else None
+    if store is not None:
+        key = _cache_key(store, file_path, channel_idx, nperseg, band, bandwidth)
+        hit = store.get(key)
+        if hit is not None:
+            arrays, meta = hit
+            if bandwidth is not None:
+                channel_data = decimate_wav(file_path, channel_idx, bandwidth)[1]
+                scale = (1.0, 0.0)
+            elif is_capture:
+                channel_data = _load_and_welch(file_path, channel_idx, nperseg, welch=False)[-1]
+                scale = (1.0, 0.0)
+            else:
+                _, channel_data, _, max_abs = _open_channel(file_path, channel_idx)
+                scale = _wav_scale(channel_data.dtype, max_abs)
+            return (meta["fs"], arrays["f"], arrays["Pxx"], meta["seg"], meta["ch_label"],
+                    channel_data, scale)
+
+    if bandwidth is not None:
+        # Steps 1-3 at the decimated rate
+        result = _decimated_psd(file_path, channel_idx, nperseg, bandwidth, band, cache)
+    elif band is not None:
+        # Steps 1-3 for the band only, out of core
+        result = zoom_psd_from_wav(file_path, channel_idx, nperseg, band)
+    elif streaming and not is_capture:
+        # Steps 1-3 in one out-of-core pass
+        result = stream_psd_from_wav(file_path, channel_idx, nperseg)
+    else:
+        fs, f, Pxx, seg, ch_label, channel_data = _load_and_welch(file_path, channel_idx, nperseg)
+        result = fs, f, Pxx, seg, ch_label, channel_data, (1.0, 0.0)
+    if store is not None:
+        fs, f, Pxx, seg, ch_label = result[:5]
+        store.put(key, {"f": f, "Pxx": Pxx}, fs=float(fs), seg=int(seg), ch_label=ch_label)
+    return result
+
+def _cache_key(store, file_path: str, channel_idx: int, nperseg: int, band=None, bandwidth=None) -> str:
+    return store.key(file_path, "wav_psd", channel=channel_idx, nperseg=nperseg,
+                     noverlap="half", window="hann", detrend="constant", scaling="density",
+                     **({} if band is None else {"band": [float(b) for b in band]}),
+                     **({} if bandwidth is None else {"bandwidth": float(bandwidth)}))
+
+def resolution_label(nperseg: int) -> str:
+    """Out/ naming of a segment length: 128000 -> "128k", 4096 -> "4096"."""
+    return f"{nperseg // 1000}k" if nperseg % 1000 == 0 else str(nperseg)
+
+def multi_psd_from_wav(file_path: str, channel_idx: int = 0, npersegs=(8000, 128000),
+                       cache: bool = True, chunk_frames: int = STREAM_CHUNK):
+    """
+    Welch PSDs of one channel at several segment lengths from a single pass
+    (spectral.MultiWelch): the WAV is memory-mapped and every chunk read and
+    converted to float32 once for all resolutions, and the FFTs run in
+    float32 like the in-memory scipy.signal.welch path, so the pass costs
+    about as much as the largest nperseg alone did. .hcap captures are loaded as in
+    psd_from_wav. Each resolution is cached under psd_from_wav's key, so
+    only missing ones are computed and later single-resolution calls hit.
+    Returns fs, {nperseg: (f, Pxx, seg)}, ch_label.
+    """
+    store = default_cache() if cache else None
+    out, todo, fs, ch_label = {}, [], None, None
+    for nperseg in dict.fromkeys(int(n) for n in npersegs):
+        hit = store.get(_cache_key(store, file_path, channel_idx, nperseg)) if store else None
+        if hit is None:
+            todo.append(nperseg)
+            continue
+        arrays, meta = hit
+        out[nperseg] = (arrays["f"], arrays["Pxx"], meta["seg"])
+        fs, ch_label = meta["fs"], meta["ch_label"]
+    if todo:
+        if file_path.lower().endswith(".hcap"):
+            fs, _, _, _, ch_label, channel_data = _load_and_welch(file_path, channel_idx, 0, welch=False)
+            max_abs = None
+        else:
+            fs, channel_data, ch_label, max_abs = _open_channel(file_path, channel_idx, chunk_frames)
+        n = channel_data.shape[0]
+        segs = {nperseg: _welch_segment(n, nperseg) for nperseg in todo}
+        mw = MultiWelch(fs, segs.values(), dtype=np.float32)
+        for i in range(0, n, chunk_frames):
+            mw.push(_to_float32(np.asarray(channel_data[i:i + chunk_frames]), max_abs))
+        for nperseg, seg in segs.items():
+            f, Pxx = mw.psd(seg)
+            out[nperseg] = (f, Pxx, seg)
+            if store is not None:
+                store.put(_cache_key(store, file_path, channel_idx, nperseg), {"f": f, "Pxx": Pxx},
+                          fs=float(fs), seg=int(seg), ch_label=ch_label)
+    return fs, {n: out[n] for n in dict.fromkeys(int(n) for n in npersegs)}, ch_label
+
+def export_psd(output_file: str, f: np.ndarray, Pxx: np.ndarray, **meta) -> str:
+    """
+    Save a PSD to .csv, .hcap or .xlsx (the default for other extensions).
+    meta is stored in .hcap headers. Returns the path written.
+    """
+    ext = os.path.splitext(output_file)[1].lower()
+    if ext == ".hcap":
+        write_psd(output_file, f, Pxx, **meta)
+        return output_file
+    import pandas as pd
+    psd_df = pd.DataFrame({'Frequency [Hz]': f, 'PSD [1/Hz]': Pxx})
+    if ext == ".csv":
+        psd_df.to_csv(output_file, index=False)
+    else:
+        # Default to .xlsx if not CSV
+        if ext != ".xlsx":
+            output_file = os.path.splitext(output_file)[0] + ".xlsx"
+        psd_df.to_excel(output_file, index=False)
+    return output_file
+
+def export_multi_psd(output_file: str, psds: dict, **meta) -> str:
+    """
+    Save PSDs at several resolutions, {label: (f, Pxx)}, as one product:
+    .hcap (hallcap.write_psd_multi), .csv (long table with a resolution
+    column) or .xlsx (one sheet per resolution, the default). Returns the
+    path written.
+    """
+    ext = os.path.splitext(output_file)[1].lower()
+    if ext == ".hcap":
+        write_psd_multi(output_file, psds, **meta)
+        return output_file
+    import pandas as pd
+    frames = {label: pd.DataFrame({'Frequency [Hz]': f, 'PSD [1/Hz]': Pxx})
+              for label, (f, Pxx) in psds.items()}
+    if ext == ".csv":
+        pd.concat(frames, names=["Resolution"]).reset_index(level=0).to_csv(output_file, index=False)
+        return output_file
+    if ext != ".xlsx":
+        output_file = os.path.splitext(output_file)[0] + ".xlsx"
+    with pd.ExcelWriter(output_file) as xw:
+        for label, df in frames.items():
+            df.to_excel(xw, sheet_name=label, index=False)
+    return output_file
+
+def compute_psd_from_wav(
+    file_path: str,
+    channel_idx: int = 0,
+    output_file: str | None = None,
+    nperseg: int = 128000,
+    zoom_hz: float = 5000.0,
+    streaming: bool = False,
+    band: tuple[float, float] | None = None,
+    bandwidth: float | None = None
+) -> None:
+    """
+    Load one channel from a WAV file and compute/plot its PSD using Welch's method.
+    With streaming=True the WAV is processed out of core (stream_psd_from_wav);
+    with band=(lo, hi) only that band is computed and shown (zoom_psd_from_wav);
+    with bandwidth the channel is decimated first and the plots and export use
+    the decimated rate (decimate_wav).
+    Optionally save PSD to .xlsx, .csv or .hcap.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import MaxNLocator, LogLocator
+
+    fs, f, Pxx, seg, ch_label, channel_data, (scale, offset) = \
+        psd_from_wav(file_path, channel_idx, nperseg, streaming, band=band, bandwidth=bandwidth)
+
+    # Step 4: Plot raw waveform (min/max per pixel, re-decimated on zoom)
     fig1, ax1 = plt.subplots(figsize=(12, 6))
-    ax1.plot(time, channel_data, label=f'Raw Audio ({ch_label})')
+    MinMaxLine(ax1, channel_data, fs=fs, scale=scale, offset=offset,
+               label=f'Raw Audio ({ch_label})')
     ax1.set_xlabel('Time (s)')
     ax1.set_ylabel('Amplitude (normalized)')
     ax1.set_title(os.path.basename(file_path))
@@ -85,12 +416,15 @@ def compute_psd_from_wav(
     fig1.tight_layout()
     plt.show()
 
-    # Step 6: Plot PSD
+    # Step 5: Plot PSD
     fig2, ax2 = plt.subplots(figsize=(12, 6))
     ax2.semilogy(f, Pxx, label='Power Spectral Density')
-    max_freq = f[-1]  # Nyquist
-    zoom_limit = min(max_freq, float(zoom_hz))
-    ax2.set_xlim(0, zoom_limit)
+    if band is not None:
+        ax2.set_xlim(f[0], f[-1])
+    else:
+        max_freq = f[-1]  # Nyquist
+        zoom_limit = min(max_freq, float(zoom_hz))
+        ax2.set_xlim(0, zoom_limit)
 
     # Safe y-lims for log scale
     positive = Pxx[Pxx > 0]
@@ -106,22 +440,181 @@ def compute_psd_from_wav(
     fig2.tight_layout()
     plt.show()
 
-    # Step 7: Optional export
+    # Step 6: Optional export
     if output_file:
-        psd_df = pd.DataFrame({'Frequency [Hz]': f, 'PSD [1/Hz]': Pxx})
-        ext = os.path.splitext(output_file)[1].lower()
-        if ext == ".csv":
-            psd_df.to_csv(output_file, index=False)
-        else:
-            # Default to .xlsx if not CSV
-            if ext != ".xlsx":
-                output_file = os.path.splitext(output_file)[0] + ".xlsx"
-            psd_df.to_excel(output_file, index=False)
+        extra = {} if bandwidth is None else {"bandwidth": float(bandwidth)}
+        output_file = export_psd(output_file, f, Pxx, fs=float(fs), nperseg=seg,
+                                 channel=channel_idx, source=os.path.basename(file_path), **extra)
         print(f"PSD data saved to {output_file}")
 
+# --- Spectrogram ---
+
+def spectrogram_axes_path(path: str) -> str:
+    """Sidecar holding the time/frequency axes of a spectrogram .npy."""
+    return os.path.splitext(path)[0] + "_axes.npz"
+
+def stream_spectrogram_from_wav(
+    file_path: str,
+    out_path: str,
+    channel_idx: int = 0,
+    nperseg: int = SPEC_NPERSEG,
+    noverlap: int | None = None,
+    log_bands: int | None = None,
+    chunk_frames: int = STREAM_CHUNK,
+    on_start=None,
+    on_rows=None
+):
+    """
+    STFT of one channel (WAV or .hcap capture) written into a memory-mapped
+    (time x frequency) float32 .npy at out_path, PSD density per row. The
+    input is read in chunks and each chunk's segments are transformed in
+    batches, so memory stays at a few chunks for any recording length.
+    on_start(t, f) is called once the axes are known and on_rows(row0, rows)
+    after every chunk, for progressive plots.
+    Returns fs, t, f, the memmap and ch_label.
+    """
+    if file_path.lower().endswith(".hcap"):
+        cap = Capture(file_path)
+        fs = cap.fs
+        channel_idx = int(np.clip(channel_idx, 0, len(cap.columns) - 1))
+        ch_label = f"{cap.columns[channel_idx]} ({cap.meta.get('units', '')})"
+        max_abs = None
+        n = cap.n_rows
+        read = lambda i: cap.read_rows(i, i + chunk_frames, columns=[channel_idx])[1][:, 0]
+    else:
+        cap = None
+        fs, channel_data, ch_label, max_abs = _open_channel(file_path, channel_idx, chunk_frames)
+        n = channel_data.shape[0]
+        read = lambda i: np.asarray(channel_data[i:i + chunk_frames])
+
+    seg = _welch_segment(n, nperseg)
+    noverlap = 3 * seg // 4 if noverlap is None else noverlap
+    stft = StreamingSTFT(fs, seg, noverlap, window=signal.get_window("hann", seg),
+                         log_bands=log_bands)
+    n_rows = stft.n_frames(n)
+    S = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float32,
+                                  shape=(n_rows, stft.freqs.size))
+    t = stft.times(0, n_rows)
+    np.savez(spectrogram_axes_path(out_path), t=t, f=stft.freqs, fs=fs, nperseg=seg,
+             noverlap=noverlap, log_bands=log_bands or 0, channel=channel_idx,
+             source=os.path.basename(file_path))
+    if on_start is not None:
+        on_start(t, stft.freqs)
+
+    row0 = 0
+    try:
+        for i in range(0, n, chunk_frames):
+            block = read(i)
+            rows = stft.push(block if max_abs is None and block.dtype == np.float64
+                             else _to_float32(block, max_abs))
+            S[row0:row0 + rows.shape[0]] = rows
+            if on_rows is not None and rows.shape[0]:
+                on_rows(row0, rows)
+            row0 += rows.shape[0]
+    finally:
+        if cap is not None:
+            cap.close()
+    S.flush()
+    return fs, t, stft.freqs, S, ch_label
+
+def open_spectrogram(path: str):
+    """(t, f, S) of a saved spectrogram; S is memory-mapped read-only."""
+    with np.load(spectrogram_axes_path(path)) as axes:
+        t, f = axes["t"], axes["f"]
+    return t, f, np.load(path, mmap_mode="r")
+
+class SpectrogramImage:
+    """
+    imshow of a (time x frequency) stream, pooled to at most SPEC_DISPLAY
+    pixels. add_rows() averages new rows into their pixel columns and
+    updates the image with set_data; nothing is redrawn as lines and the
+    full-resolution rows are never held.
+    """
+    def __init__(self, ax, t: np.ndarray, f: np.ndarray,
+                 max_px: tuple[int, int] = SPEC_DISPLAY):
+        from matplotlib.ticker import FuncFormatter
+        n_rows = t.size
+        self.fpool = max(1, -(-f.size // max_px[0]))
+        self.tpool = max(1, -(-n_rows // max_px[1]))
+        self.fstarts = np.arange(0, f.size, self.fpool)
+        n_f, n_t = self.fstarts.size, -(-n_rows // self.tpool)
+        self.sum = np.zeros((n_f, n_t))
+        self.count = np.zeros(n_t)
+        self.img = ax.imshow(np.full((n_f, n_t), np.nan, dtype=np.float32), origin="lower",
+                             aspect="auto", interpolation="nearest", cmap="magma",
+                             extent=(t[0] if t.size else 0, t[-1] if t.size else 1, 0, n_f))
+        # Rows are pixel indices, so log-spaced bands display evenly; label in Hz
+        f_pix = f[self.fstarts]
+        ax.yaxis.set_major_formatter(FuncFormatter(
+            lambda y, _pos: f"{np.interp(y, np.arange(f_pix.size), f_pix):.3g}"))
+
+    def add_rows(self, row0: int, rows: np.ndarray):
+        P = np.add.reduceat(rows, self.fstarts, axis=1) if self.fpool > 1 else rows
+        cols = (row0 + np.arange(rows.shape[0])) // self.tpool
+        edges = np.flatnonzero(np.r_[True, cols[1:] != cols[:-1]])
+        self.sum[:, cols[edges]] += np.add.reduceat(P, edges, axis=0).T
+        self.count[cols[edges]] += np.diff(np.r_[edges, cols.size]) * self.fpool
+        with np.errstate(divide="ignore", invalid="ignore"):
+            db = 10 * np.log10(self.sum / self.count)
+        self.img.set_data(db)
+        finite = db[np.isfinite(db)]
+        if finite.size:
+            self.img.set_clim(*np.percentile(finite, (5, 99.8)))
+
+def compute_spectrogram_from_wav(
+    file_path: str,
+    channel_idx: int = 0,
+    output_file: str | None = None,
+    nperseg: int = SPEC_NPERSEG,
+    log_bands: int | None = None
+):
+    """
+    Spectrogram of one channel, shown while it is computed. The rows go to
+    output_file (.npy, axes in the _axes.npz sidecar) or to a temporary
+    file that is removed afterwards.
+    """
+    import tempfile
+    import matplotlib.pyplot as plt
+
+    out = output_file or tempfile.NamedTemporaryFile(suffix=".npy", delete=False).name
+    fig, ax = plt.subplots(figsize=(12, 6))
+    view = None
+
+    def on_start(t, f):
+        nonlocal view
+        view = SpectrogramImage(ax, t, f)
+        fig.colorbar(view.img, ax=ax, label="PSD (dB re 1/Hz)")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Frequency (Hz)")
+        ax.set_title(os.path.basename(file_path))
+        fig.tight_layout()
+        plt.show(block=False)
+
+    def on_rows(row0, rows):
+        view.add_rows(row0, rows)
+        fig.canvas.draw_idle()
+        fig.canvas.flush_events()
+
+    try:
+        *_, ch_label = stream_spectrogram_from_wav(file_path, out, channel_idx, nperseg,
+                                                   log_bands=log_bands, on_start=on_start,
+                                                   on_rows=on_rows)
+    finally:
+        if output_file is None:
+            for path in (out, spectrogram_axes_path(out)):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+    ax.set_title(f"{os.path.basename(file_path)} — {ch_label}")
+    if output_file:
+        print(f"Spectrogram saved to {output_file}")
+    plt.show()
+
 # --- Tkinter: pick WAV + channel ---
 
 def select_wav_and_channel():
+    from tkinter import Tk, filedialog, Button, Label, Entry
+    from tkinter.ttk import Combobox
+
     # Initialize Tkinter window
     root = Tk()
     root.withdraw()  # Hide initially
@@ -129,7 +622,7 @@ def select_wav_and_channel():
     # Step 1: Choose WAV
     file_path = filedialog.askopenfilename(
         title="Select a WAV file",
-        filetypes=[("WAV files", "*.wav")]
+        filetypes=[("WAV files", "*.wav"), ("Hall captures", "*.hcap")]
     )
     if not file_path:
         print("No file selected. Exiting.")
@@ -137,16 +630,19 @@ def select_wav_and_channel():
 
     # Peek to determine channel count
     try:
-        fs, data = wavfile.read(file_path)
+        if file_path.lower().endswith(".hcap"):
+            n_channels = len(Capture(file_path).columns)
+        else:
+            fs, data = wavfile.read(file_path, mmap=True)
+            n_channels = 1 if data.ndim == 1 else data.shape[1]
     except Exception as e:
         print(f"Could not read WAV: {e}")
         return
 
     # Build channel list
-    if data.ndim == 1:
+    if n_channels == 1:
         channel_options = ["Mono (0)"]
     else:
-        n_channels = data.shape[1]
         # Friendly names for first few channels; falls back to Ch N
         names = ["Left", "Right", "Center", "LFE", "Rear Left", "Rear Right"]
         channel_options = []
@@ -160,6 +656,9 @@ def select_wav_and_channel():
     channel_var = Combobox(root, values=channel_options, state="readonly")
     channel_var.set(channel_options[0])
     channel_var.pack(padx=10, pady=5)
+    Label(root, text="Zoom band Hz (optional, e.g. 10-20):").pack(padx=10, pady=(5, 0))
+    band_var = Entry(root)
+    band_var.pack(padx=10, pady=5)
 
     def on_submit():
         sel = channel_var.get()
@@ -168,12 +667,28 @@ def select_wav_and_channel():
         output_file = filedialog.asksaveasfilename(
             title="Save PSD Data",
             defaultextension=".xlsx",
-            filetypes=[("Excel file", "*.xlsx"), ("CSV file", "*.csv")]
+            filetypes=[("Excel file", "*.xlsx"), ("CSV file", "*.csv"), ("Hall capture", "*.hcap")]
+        )
+        streaming = os.path.getsize(file_path) > STREAM_THRESHOLD
+        text = band_var.get().strip()
+        band = tuple(float(v) for v in text.split("-")) if text else None
+        compute_psd_from_wav(file_path, channel_idx=idx, output_file=output_file,
+                             streaming=streaming, band=band)
+        root.destroy()
+
+    def on_spectrogram():
+        sel = channel_var.get()
+        idx = int(sel.split("(")[-1].rstrip(")"))
+        output_file = filedialog.asksaveasfilename(
+            title="Save Spectrogram (optional)",
+            defaultextension=".npy",
+            filetypes=[("NumPy array", "*.npy")]
         )
-        compute_psd_from_wav(file_path, channel_idx=idx, output_file=output_file)
+        compute_spectrogram_from_wav(file_path, channel_idx=idx, output_file=output_file or None)
         root.destroy()
 
-    Button(root, text="Generate PSD", command=on_submit).pack(padx=10, pady=10)
+    Button(root, text="Generate PSD", command=on_submit).pack(padx=10, pady=(10, 5))
+    Button(root, text="Spectrogram", command=on_spectrogram).pack(padx=10, pady=(0, 10))
     root.mainloop()
 
 # Run the selector